@@ -0,0 +1,82 @@
+"""Per-tick inference latency: per-thermostat calls vs one batched call.
+
+Run from the repository root:
+
+    python benchmarks/bench_batch_inference.py
+"""
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from custom_components.smart_heating_predictor.ml_engine import HeatingPredictor  # noqa: E402
+
+THERMOSTAT_COUNTS = [1, 5, 10, 25, 50, 100, 200]
+REPEATS = 20
+
+
+def trained_predictor():
+    """Return a predictor trained on synthetic samples."""
+    rng = np.random.default_rng(42)
+    predictor = HeatingPredictor(None, None)
+    now = datetime.now()
+    for _ in range(2000):
+        current = rng.uniform(14, 22)
+        data = {'current_temp': current}
+        target = current + rng.uniform(0, 5)
+        features = predictor.collect_features(data, rng.uniform(-10, 15), 60, target, now)
+        predictor.add_training_sample(features, (target - current) * 12 + rng.normal(0, 3))
+    predictor.train_model()
+    return predictor
+
+
+def thermostat_batch(count, rng):
+    """Return fake thermostat data for one tick."""
+    data = {}
+    for i in range(count):
+        current = float(rng.uniform(15, 21))
+        data[f"climate.room_{i}"] = {'current_temp': current, 'target_temp': current + 2}
+    return data
+
+
+def tick_per_thermostat(predictor, thermostat_data, now):
+    """Original path: one transform and one predict per thermostat."""
+    for data in thermostat_data.values():
+        features = predictor.collect_features(data, 5.0, 60.0, data['target_temp'], now)
+        predictor.predict_preheat_time(features)
+
+
+def tick_batched(predictor, thermostat_data, now):
+    """Batched path: one feature matrix, one transform, one predict."""
+    features = predictor.collect_feature_matrix(list(thermostat_data.values()), 5.0, 60.0, now)
+    predictor.predict_preheat_times(features)
+
+
+def median_ms(func, *args):
+    """Return the median wall time of func in milliseconds."""
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        func(*args)
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def main():
+    predictor = trained_predictor()
+    rng = np.random.default_rng(0)
+    now = datetime.now()
+    print(f"{'thermostats':>11} {'per-room ms':>12} {'batched ms':>11} {'speedup':>8}")
+    for count in THERMOSTAT_COUNTS:
+        thermostat_data = thermostat_batch(count, rng)
+        before = median_ms(tick_per_thermostat, predictor, thermostat_data, now)
+        after = median_ms(tick_batched, predictor, thermostat_data, now)
+        print(f"{count:>11} {before:>12.2f} {after:>11.2f} {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Compiled flat-array forest vs scikit-learn: prediction latency and cold load time.
+
+Run from the repository root:
+
+    python benchmarks/bench_compiled.py
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from custom_components.smart_heating_predictor.ml_engine import HeatingPredictor  # noqa: E402
+
+ROW_COUNTS = [1, 4, 16, 64, 256]
+REPEATS = 50
+
+# Cold start in a fresh interpreter: import the engine, load the directory, predict one row
+LOAD_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+from custom_components.smart_heating_predictor.ml_engine import HeatingPredictor
+predictor = HeatingPredictor(None, None)
+predictor.load_model({path!r})
+if {sklearn}:
+    predictor._ensure_estimators()
+predictor.predict_preheat_times(predictor.training_data.arrays()[0][:1])
+print(time.perf_counter() - start, 'sklearn' in sys.modules)
+"""
+
+
+def trained_predictor():
+    """Return a predictor trained on synthetic samples."""
+    rng = np.random.default_rng(42)
+    predictor = HeatingPredictor(None, None)
+    for _ in range(3000):
+        current = rng.uniform(14, 22)
+        target = current + rng.uniform(0, 5)
+        now = datetime(2025, 1, rng.integers(1, 29), rng.integers(0, 24))
+        features = predictor.collect_features({'current_temp': current}, rng.uniform(-10, 15), 60, target, now)
+        predictor.add_training_sample(features, (target - current) * 12 + rng.normal(0, 3))
+    predictor.train_model()
+    return predictor
+
+
+def timed(func, repeats=REPEATS):
+    """Return the mean seconds per call."""
+    func()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - start) / repeats
+
+
+def cold_load(path, sklearn):
+    """Return (seconds, sklearn imported) for a cold load in a subprocess."""
+    script = LOAD_SCRIPT.format(root=os.path.join(os.path.dirname(__file__), ".."), path=path, sklearn=sklearn)
+    seconds, imported = subprocess.check_output([sys.executable, "-c", script], text=True).split()
+    return float(seconds), imported == 'True'
+
+
+def main():
+    predictor = trained_predictor()
+    X, _, _, _ = predictor.training_data.arrays()
+    X = X.astype(float)
+    model, scaler, compiled = predictor.model, predictor.scaler, predictor.compiled
+
+    # scikit-learn compares float32-rounded scaled values, the compiled forest
+    # raw float64 ones; they can only disagree within an ulp of a threshold,
+    # which training rows themselves occasionally are
+    for label, rows in (("training", X), ("held-out", X + np.random.default_rng(0).normal(0, 0.05, X.shape))):
+        difference = np.abs(model.predict(scaler.transform(rows)) - compiled.predict(rows))
+        print(f"{label} rows: {np.count_nonzero(difference > 1e-9)} of {len(rows)} differ, "
+              f"max |sklearn - compiled| {difference.max():.2e} min")
+    print(f"{compiled.n_trees} trees, {len(compiled.feature)} nodes, depth {compiled.max_depth}\n")
+
+    print(f"{'rows':>6} {'sklearn ms':>12} {'compiled ms':>12} {'speedup':>8}")
+    for rows in ROW_COUNTS:
+        batch = X[:rows]
+        sklearn_s = timed(lambda: model.predict(scaler.transform(batch)))
+        compiled_s = timed(lambda: compiled.predict(batch), REPEATS * 10)
+        print(f"{rows:>6} {sklearn_s * 1000:>12.3f} {compiled_s * 1000:>12.3f} {sklearn_s / compiled_s:>7.0f}x")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "smart_heating_predictor")
+        predictor.save_model(path)
+        print()
+        for label, sklearn in (("compiled only", False), ("with sklearn estimators", True)):
+            seconds, imported = cold_load(path, sklearn)
+            print(f"Cold import + load + predict, {label}: {seconds * 1000:.0f} ms (sklearn imported: {imported})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Several config entries: independent refreshes vs the shared engine's coalesced tick.
+
+Every entry watches its own rooms and the same outdoor sensors and weather
+entity. "independent" gives each entry an engine of its own and refreshes
+them all at once, as separate coordinator timers would; "shared" registers
+every entry with one engine and runs its tick.
+
+Run from the repository root:
+
+    python benchmarks/bench_engine.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fake_hass import FakeConfigEntry, FakeHass  # noqa: E402
+
+from custom_components.smart_heating_predictor import engine as engine_module  # noqa: E402
+from custom_components.smart_heating_predictor.const import MODEL_STATE_READY  # noqa: E402
+from custom_components.smart_heating_predictor.coordinator import SmartHeatingCoordinator  # noqa: E402
+from custom_components.smart_heating_predictor.engine import EngineManager  # noqa: E402
+
+ENTRY_COUNTS = [1, 2, 4, 8]
+ROOMS_PER_ENTRY = 4
+PASSES = 30
+OUTDOOR_TEMP_SENSOR = "sensor.outdoor_temperature"
+OUTDOOR_HUMIDITY_SENSOR = "sensor.outdoor_humidity"
+WEATHER_ENTITY = "weather.home"
+
+
+class CountingStates:
+    """Wrap hass.states, counting reads."""
+
+    def __init__(self, states):
+        """Initialize."""
+        self._states = states
+        self.reads = 0
+
+    def get(self, entity_id):
+        """Return the state and count the read."""
+        self.reads += 1
+        return self._states.get(entity_id)
+
+    def set(self, *args):
+        """Set a state."""
+        return self._states.set(*args)
+
+
+def train(predictor, rng):
+    """Train a predictor on synthetic samples."""
+    now = datetime.now()
+    for _ in range(500):
+        current = rng.uniform(14, 22)
+        target = current + rng.uniform(0, 5)
+        features = predictor.collect_features({'current_temp': current}, rng.uniform(-10, 15), 60, target, now)
+        predictor.add_training_sample(features, (target - current) * 12 + rng.normal(0, 3))
+    predictor.train_model()
+    predictor.learning_mode = False
+
+
+def forecasts(data):
+    """Answer weather.get_forecasts with a flat hourly forecast."""
+    hour = datetime.now().replace(minute=0, second=0, microsecond=0)
+    forecast = [
+        {'datetime': (hour + timedelta(hours=lead)).astimezone().isoformat(), 'temperature': 5.0}
+        for lead in range(12)
+    ]
+    return {data['entity_id']: {'forecast': forecast}}
+
+
+def set_states(hass, entries, rng):
+    """Give every thermostat a fresh reading below its setpoint."""
+    now = datetime.now()
+    hass.states.set(OUTDOOR_TEMP_SENSOR, f"{rng.uniform(-5, 10):.1f}", {}, now)
+    hass.states.set(OUTDOOR_HUMIDITY_SENSOR, "70", {}, now)
+    for entry in range(entries):
+        for room in range(ROOMS_PER_ENTRY):
+            current = round(float(rng.uniform(15, 20)), 1)
+            hass.states.set(f"climate.entry_{entry}_room_{room}", 'heat', {
+                'current_temperature': current,
+                'temperature': current + 2,
+                'hvac_action': 'heating',
+            }, now)
+
+
+async def build(config_dir, entries, shared, rng):
+    """Return (hass, engines, coordinators) for a number of entries."""
+    hass = FakeHass(config_dir)
+    hass.states = CountingStates(hass.states)
+    hass.services.register("weather", "get_forecasts", forecasts)
+    engine = EngineManager(hass) if shared else None
+    engines = [engine] if shared else []
+    coordinators = []
+    for entry in range(entries):
+        config_entry = FakeConfigEntry({
+            'thermostats': [f"climate.entry_{entry}_room_{room}" for room in range(ROOMS_PER_ENTRY)],
+            'weather_entity': WEATHER_ENTITY,
+            'outdoor_temp_sensor': OUTDOOR_TEMP_SENSOR,
+            'outdoor_humidity_sensor': OUTDOOR_HUMIDITY_SENSOR,
+        }, entry_id=f"entry_{entry}")
+        coordinator = SmartHeatingCoordinator(hass, config_entry, engine)
+        await coordinator.async_load_model()
+        train(coordinator.predictor, rng)
+        coordinator.model_state = MODEL_STATE_READY
+        if shared:
+            engine.async_register(coordinator)
+        else:
+            engines.append(coordinator.engine)
+        coordinators.append(coordinator)
+    return hass, engines, coordinators
+
+
+async def run(entries, shared):
+    """Return (median ms per pass, state reads and executor jobs per pass, forecast fetches)."""
+    rng = np.random.default_rng(42)
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass, engines, coordinators = await build(config_dir, entries, shared, rng)
+        jobs = 0
+        for engine in engines:
+            run_job = engine.executor.async_run
+
+            async def counted(*args, run_job=run_job, **kwargs):
+                nonlocal jobs
+                jobs += 1
+                return await run_job(*args, **kwargs)
+
+            engine.executor.async_run = counted
+
+        timings = []
+        hass.states.reads = jobs = 0
+        for _ in range(PASSES):
+            set_states(hass, entries, rng)
+            start = time.perf_counter()
+            if shared:
+                await engines[0]._async_tick()
+            else:
+                await asyncio.gather(*(coordinator._async_update_data() for coordinator in coordinators))
+            timings.append((time.perf_counter() - start) * 1000)
+        # Forecast fetches since setup, all within one cache TTL
+        fetches = hass.services.calls["weather.get_forecasts"]
+        for engine in engines:
+            engine.executor.shutdown()
+        return float(np.median(timings)), hass.states.reads / PASSES, jobs / PASSES, fetches
+
+
+async def main():
+    # The benchmark runs the tick itself
+    engine_module.async_track_time_interval = lambda hass, action, interval: lambda: None
+    print(f"{ROOMS_PER_ENTRY} thermostats per entry, median of {PASSES} passes\n")
+    print(f"{'entries':>7} {'mode':>12} {'ms/pass':>8} {'reads/pass':>11} {'jobs/pass':>10} {'fetches':>8}")
+    for entries in ENTRY_COUNTS:
+        for shared in (False, True):
+            ms, reads, jobs, fetches = await run(entries, shared)
+            mode = "shared" if shared else "independent"
+            print(f"{entries:>7} {mode:>12} {ms:>8.2f} {reads:>11.1f} {jobs:>10.1f} {fetches:>8}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,73 @@
+"""On-disk sample history: append cost, disk size and training-set read time/memory vs history length.
+
+Run from the repository root:
+
+    python benchmarks/bench_history.py
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from custom_components.smart_heating_predictor.ml_engine import FEATURE_NAMES, HeatingPredictor  # noqa: E402
+from custom_components.smart_heating_predictor.model_store import (  # noqa: E402
+    SECONDS_PER_DAY,
+    ModelStore,
+    sample_dtype,
+)
+
+YEARS = [0.25, 1, 3, 10]
+SAMPLES_PER_DAY = 150
+START = 1_600_000_000
+
+
+def write_history(store, days, rng):
+    """Append days of synthetic samples in daily batches; return seconds per batch."""
+    history = store.history(sample_dtype(len(FEATURE_NAMES)))
+    seconds = []
+    for day in range(days):
+        records = np.zeros(SAMPLES_PER_DAY, dtype=history.dtype)
+        records['timestamp'] = START + day * SECONDS_PER_DAY + np.sort(rng.integers(0, SECONDS_PER_DAY, SAMPLES_PER_DAY))
+        records['thermostat_id'] = rng.integers(0, 8, SAMPLES_PER_DAY)
+        records['features'] = rng.normal(size=(SAMPLES_PER_DAY, len(FEATURE_NAMES)))
+        records['label'] = rng.uniform(5, 120, SAMPLES_PER_DAY)
+        start = time.perf_counter()
+        history.append(records, [f"climate.room_{i}" for i in range(8)])
+        seconds.append(time.perf_counter() - start)
+    return float(np.mean(seconds))
+
+
+def main():
+    rng = np.random.default_rng(42)
+    print(f"{SAMPLES_PER_DAY} samples per day\n")
+    print(f"{'years':>6} {'samples':>9} {'disk MiB':>9} {'append ms':>10} "
+          f"{'load ms':>8} {'train set ms':>13} {'train set rows':>15} {'peak MiB':>9}")
+    for years in YEARS:
+        days = int(years * 365)
+        with tempfile.TemporaryDirectory() as directory:
+            store = ModelStore(directory)
+            append_s = write_history(store, days, rng)
+            size = sum(os.path.getsize(os.path.join(root, name))
+                       for root, _, files in os.walk(directory) for name in files)
+
+            tracemalloc.start()
+            predictor = HeatingPredictor(None, None)
+            start = time.perf_counter()
+            predictor.load_model(directory)
+            load_s = time.perf_counter() - start
+            start = time.perf_counter()
+            X, _, _, _ = predictor._training_set()
+            train_set_s = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{years:>6} {days * SAMPLES_PER_DAY:>9} {size / 2**20:>9.1f} {append_s * 1000:>10.2f} "
+                  f"{load_s * 1000:>8.1f} {train_set_s * 1000:>13.1f} {len(X):>15} {peak / 2**20:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
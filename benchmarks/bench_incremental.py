@@ -0,0 +1,99 @@
+"""Full nightly refit vs incremental updates over a replayed heating season.
+
+Each simulated day is scored against the model as it stood before that
+day (prequential MAE), then folded in: the full path refits once per
+night, the incremental path updates every few ticks.
+
+Run from the repository root:
+
+    python benchmarks/bench_incremental.py
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from custom_components.smart_heating_predictor.ml_engine import HeatingPredictor  # noqa: E402
+from custom_components.smart_heating_predictor.const import (  # noqa: E402
+    INCREMENTAL_UPDATE_TICKS,
+    TRAINING_MODE_INCREMENTAL,
+)
+
+SEASON_DAYS = 120
+ROOMS = 4
+TICKS_PER_DAY = 48
+SEASON_START = datetime(2025, 10, 1)
+
+
+def season(seed=7):
+    """Yield (day, [(features, label, thermostat_id, timestamp), ...]) for each day."""
+    rng = np.random.default_rng(seed)
+    builder = HeatingPredictor(None, None)
+    room_gain = rng.uniform(8, 20, ROOMS)
+    for day in range(SEASON_DAYS):
+        # Outdoor temperature falls into winter, with day-to-day noise
+        base_outdoor = 12 - 14 * day / SEASON_DAYS + rng.normal(0, 3)
+        samples = []
+        for tick in range(TICKS_PER_DAY):
+            now = SEASON_START + timedelta(days=day, minutes=tick * 30)
+            outdoor = base_outdoor + 4 * np.sin(2 * np.pi * (now.hour - 9) / 24)
+            for room in range(ROOMS):
+                current = rng.uniform(15, 21)
+                target = current + rng.uniform(0.5, 4)
+                features = builder.collect_features(
+                    {'current_temp': current}, outdoor, 70, target, now
+                )
+                minutes = (target - current) * room_gain[room] * (1 + (15 - outdoor) / 25)
+                label = minutes + rng.normal(0, 3)
+                samples.append((features, label, f"climate.room_{room}", now.timestamp()))
+        yield day, samples
+
+
+def evaluate(predictor, samples):
+    """Return the MAE of the predictor on one day's samples."""
+    X = np.vstack([s[0] for s in samples])
+    y = np.array([s[1] for s in samples])
+    return float(np.mean(np.abs(predictor.predict_preheat_times(X) - np.clip(y, 5, 120))))
+
+
+def replay(incremental):
+    """Replay the season and return (update timings, daily MAE)."""
+    predictor = HeatingPredictor(None, None)
+    if incremental:
+        predictor.training_mode = TRAINING_MODE_INCREMENTAL
+    timings = []
+    errors = []
+    chunk = INCREMENTAL_UPDATE_TICKS * ROOMS
+    for day, samples in season():
+        if predictor.is_trained:
+            errors.append(evaluate(predictor, samples))
+        for i, (features, label, thermostat_id, timestamp) in enumerate(samples, 1):
+            predictor.add_training_sample(features, label, thermostat_id, timestamp)
+            if incremental and i % chunk == 0:
+                start = time.perf_counter()
+                predictor.update_incremental()
+                timings.append(time.perf_counter() - start)
+        if not incremental:
+            start = time.perf_counter()
+            predictor.train_model()
+            timings.append(time.perf_counter() - start)
+    return np.array(timings), np.array(errors)
+
+
+def main():
+    print(f"{'mode':>12} {'updates':>8} {'mean ms':>9} {'max ms':>9} {'total s':>8} {'MAE min':>8} {'MAE last 30d':>13}")
+    for incremental in (False, True):
+        timings, errors = replay(incremental)
+        name = "incremental" if incremental else "full"
+        print(
+            f"{name:>12} {len(timings):>8} {timings.mean() * 1000:>9.1f} {timings.max() * 1000:>9.1f} "
+            f"{timings.sum():>8.1f} {errors.mean():>8.2f} {errors[-30:].mean():>13.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Prediction intervals: per-estimator loop vs the compiled forest's single pass.
+
+"loop" asks every scikit-learn tree for its predictions in a Python loop
+and takes the quantiles of the stacked outputs; "compiled" gets the mean,
+spread and quantiles from one CompiledForest.predict_distribution call.
+Both agree except on rows within float32 rounding of a split (see
+bench_compiled.py); the last lines show how often a room would start late
+with the mean and with the p80 on held-out samples.
+
+Run from the repository root:
+
+    python benchmarks/bench_intervals.py
+"""
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from custom_components.smart_heating_predictor.ml_engine import (  # noqa: E402
+    PREDICTION_QUANTILES,
+    HeatingPredictor,
+)
+
+ROW_COUNTS = [1, 4, 16, 64, 256]
+REPEATS = 50
+TEST_SAMPLES = 2000
+
+
+def samples(predictor, count, rng):
+    """Return (features, minutes) of synthetic heating cycles."""
+    rows, labels = [], []
+    for _ in range(count):
+        current = rng.uniform(14, 22)
+        target = current + rng.uniform(0, 5)
+        outdoor = rng.uniform(-10, 15)
+        now = datetime(2025, 1, rng.integers(1, 29), rng.integers(0, 24))
+        rows.append(predictor.collect_features({'current_temp': current}, outdoor, 60, target, now))
+        labels.append((target - current) * 12 * (1 + (15 - outdoor) / 25) + rng.normal(0, 5))
+    return np.vstack(rows), np.array(labels)
+
+
+def loop_distribution(model, scaler, X):
+    """Return the mean, spread and quantiles by calling every estimator."""
+    scaled = scaler.transform(X)
+    trees = np.column_stack([estimator.predict(scaled) for estimator in model.estimators_])
+    return trees.mean(axis=1), trees.std(axis=1), np.quantile(trees, PREDICTION_QUANTILES, axis=1).T
+
+
+def timed(func, repeats=REPEATS):
+    """Return the mean seconds per call."""
+    func()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    rng = np.random.default_rng(42)
+    predictor = HeatingPredictor(None, None)
+    X, y = samples(predictor, 3000, rng)
+    for features, label in zip(X, y):
+        predictor.add_training_sample(features, label)
+    predictor.train_model()
+    model, scaler, compiled = predictor.model, predictor.scaler, predictor.compiled
+    X_test, y_test = samples(predictor, TEST_SAMPLES, rng)
+
+    expected = np.column_stack(loop_distribution(model, scaler, X_test))
+    actual = np.column_stack(compiled.predict_distribution(X_test, PREDICTION_QUANTILES))
+    differ = np.count_nonzero(np.abs(expected - actual).max(axis=1) > 1e-9)
+    print(f"{compiled.n_trees} trees, mean of {REPEATS} calls; {differ} of {TEST_SAMPLES} rows differ\n")
+    print(f"{'rows':>5} {'loop ms':>8} {'compiled ms':>12} {'speedup':>8}")
+    for rows in ROW_COUNTS:
+        batch = X_test[:rows]
+        loop = timed(lambda: loop_distribution(model, scaler, batch))
+        single = timed(lambda: compiled.predict_distribution(batch, PREDICTION_QUANTILES))
+        print(f"{rows:>5} {loop * 1000:>8.3f} {single * 1000:>12.3f} {loop / single:>7.1f}x")
+
+    # Cycles shorter than 5 minutes are not learned, the model predicts at least 5
+    y_test = np.clip(y_test, 5, 120)
+    intervals = predictor.predict_preheat_intervals(X_test)
+    print(f"\nOn {TEST_SAMPLES} held-out cycles:")
+    for name, minutes in (("mean", intervals.mean), ("p80", intervals.quantile(0.8))):
+        late = np.mean(minutes < y_test)
+        print(f"  {name:<5} late {late:.0%}, mean error {np.abs(minutes - y_test).mean():.1f} min")
+    inside = np.mean((intervals.quantile(0.1) <= y_test) & (y_test <= intervals.quantile(0.9)))
+    print(f"  p10-p90 covers {inside:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Model file size and load time: legacy pickle vs versioned model directory.
+
+Run from the repository root:
+
+    python benchmarks/bench_persistence.py
+"""
+import os
+import pickle
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from custom_components.smart_heating_predictor.ml_engine import HeatingPredictor  # noqa: E402
+
+SAMPLES = 10000
+REPEATS = 5
+
+
+def trained_predictor():
+    """Return a predictor with a full sample buffer and a trained model."""
+    rng = np.random.default_rng(42)
+    predictor = HeatingPredictor(None, None)
+    now = datetime.now()
+    for i in range(SAMPLES):
+        current = rng.uniform(14, 22)
+        target = current + rng.uniform(0, 5)
+        features = predictor.collect_features(
+            {'current_temp': current}, rng.uniform(-10, 15), rng.uniform(40, 90), target, now
+        )
+        predictor.add_training_sample(
+            features, (target - current) * 12 + rng.normal(0, 3), f"climate.room_{i % 8}", now.timestamp() + i
+        )
+    predictor.train_model()
+    return predictor
+
+
+def save_legacy(predictor, path):
+    """Write the single-pickle format used before versioned storage."""
+    X, y, timestamps, _ = predictor.training_data.ordered(last=1000)
+    model_data = {
+        'model': predictor.model,
+        'scaler': predictor.scaler,
+        'training_data': [
+            {'features': x, 'label': float(label), 'timestamp': datetime.fromtimestamp(ts), 'metadata': {}}
+            for x, label, ts in zip(X, y, timestamps)
+        ],
+        'is_trained': predictor.is_trained,
+    }
+    with open(path, 'wb') as f:
+        pickle.dump(model_data, f)
+
+
+def size(path):
+    """Return the size of a file or directory in bytes."""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+
+def load_ms(load):
+    """Return the median load time in milliseconds."""
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        load()
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def main():
+    predictor = trained_predictor()
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "smart_heating_model.pkl")
+        save_legacy(predictor, legacy_path)
+
+        exact_path = os.path.join(tmp, "exact")
+        predictor.float32_thresholds = False
+        predictor.save_model(exact_path)
+
+        compact_path = os.path.join(tmp, "compact")
+        predictor.float32_thresholds = True
+        predictor.save_model(compact_path)
+
+        rows = [
+            ("legacy pickle (1000 samples)", legacy_path,
+             lambda: HeatingPredictor(None, None).load_model(os.path.join(tmp, "missing"), legacy_path)),
+            (f"versioned ({SAMPLES} samples)", exact_path,
+             lambda: HeatingPredictor(None, None).load_model(exact_path)),
+            (f"versioned + float32 ({SAMPLES} samples)", compact_path,
+             lambda: HeatingPredictor(None, None).load_model(compact_path)),
+        ]
+        print(f"{'format':>38} {'size KiB':>9} {'load ms':>8}")
+        for name, path, load in rows:
+            print(f"{name:>38} {size(path) / 1024:>9.0f} {load_ms(load):>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
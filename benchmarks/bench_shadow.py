@@ -0,0 +1,97 @@
+"""Shadow evaluation: what the gate costs per retrain and what it keeps out.
+
+Trains a first model with one model per room, retrains on the same
+cycles and after importing older ones (nothing new to score on, so the
+gate is skipped), retrains on more clean cycles (accepted), then after a
+faulty thermostat logged a batch of nonsense cycles (rejected), and
+finally rolls back. Each step prints the training time, the gate's
+scores on the newest unseen cycles and the active model's error on a
+clean test set; the run stops if a step's outcome is wrong.
+
+Run from the repository root:
+
+    python benchmarks/bench_shadow.py
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from custom_components.smart_heating_predictor.ml_engine import HeatingPredictor  # noqa: E402
+
+ROOMS = 4
+START = datetime(2025, 11, 1)
+TEST_SAMPLES = 2000
+
+
+def cycles(count, rng, gain, first_minute, faulty=False):
+    """Return (features, minutes, thermostat ids, timestamps) of heating cycles after first_minute."""
+    builder = HeatingPredictor(None, None)
+    rooms = rng.integers(0, ROOMS, count)
+    outdoor = rng.uniform(-10, 15, count)
+    current = rng.uniform(15, 21, count)
+    target = current + rng.uniform(0.5, 4, count)
+    minutes = (target - current) * gain[rooms] * (1 + (15 - outdoor) / 25) + rng.normal(0, 3, count)
+    if faulty:
+        # A stuck sensor reports cycles of arbitrary length
+        minutes = rng.uniform(5, 120, count)
+    offsets = np.sort(rng.integers(0, 5 * 24 * 60, count)) + first_minute
+    times = [START + timedelta(minutes=int(m)) for m in offsets]
+    features = builder.collect_feature_rows(current, target, outdoor, 70.0, times)
+    ids = [f"climate.room_{room}" for room in rooms]
+    return features, minutes, ids, [t.timestamp() for t in times]
+
+
+def add(predictor, batch):
+    """Append a batch of cycles to the predictor's buffer."""
+    for features, label, thermostat_id, timestamp in zip(*batch):
+        predictor.add_training_sample(features, label, thermostat_id, timestamp)
+
+
+def step(name, predictor, run, X_test, y_test):
+    """Run one training step and print its timing, the gate's scores and the active model's test error."""
+    evaluation = predictor.last_evaluation
+    start = time.perf_counter()
+    result = run()
+    ms = (time.perf_counter() - start) * 1000
+    scores = predictor.last_evaluation if predictor.last_evaluation is not evaluation else None
+    mae = np.abs(predictor.predict_preheat_times(X_test) - y_test).mean()
+    gate = f"{scores['candidate_mae']:>9.1f} {scores['current_mae']:>9.1f}" if scores else f"{'-':>9} {'-':>9}"
+    print(f"{name:<22} {ms:>9.0f} {gate} {str(result):>9} {predictor.active.version:>7} {mae:>9.1f}")
+    return result, scores
+
+
+def main():
+    rng = np.random.default_rng(42)
+    gain = rng.uniform(8, 20, ROOMS)
+    predictor = HeatingPredictor(None, None)
+    predictor.shard_keys = {f"climate.room_{room}": f"climate.room_{room}" for room in range(ROOMS)}
+    predictor.training_workers = 1
+    X_test, y_test, _, _ = cycles(TEST_SAMPLES, rng, gain, 0)
+    y_test = np.clip(y_test, 5, 120)
+
+    print(f"{'step':<22} {'train ms':>9} {'candidate':>9} {'current':>9} {'result':>9} {'version':>7} {'test MAE':>9}")
+    add(predictor, cycles(2000, rng, gain, 0))
+    step("first model", predictor, predictor.train_model, X_test, y_test)
+    # Every held-out cycle would be one the active model learned
+    result, scores = step("back-to-back retrain", predictor, predictor.train_model, X_test, y_test)
+    assert result and scores is None, "a retrain on seen cycles must skip the gate"
+    add(predictor, cycles(1000, rng, gain, -5 * 24 * 60))
+    result, scores = step("older imported cycles", predictor, predictor.train_model, X_test, y_test)
+    assert result and scores is None, "imported cycles are older than the active model's"
+    add(predictor, cycles(1000, rng, gain, 5 * 24 * 60))
+    result, scores = step("clean cycles", predictor, predictor.train_model, X_test, y_test)
+    assert result and scores['accepted'], "a retrain on clean cycles must be accepted"
+    add(predictor, cycles(3000, rng, gain, 10 * 24 * 60, faulty=True))
+    add(predictor, cycles(500, rng, gain, 15 * 24 * 60))
+    result, scores = step("faulty sensor batch", predictor, predictor.train_model, X_test, y_test)
+    assert not result and not scores['accepted'], "a retrain on faulty cycles must be rejected"
+    step("rollback", predictor, predictor.rollback_model, X_test, y_test)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""RC thermal model vs forest: held-out error by sample count, and fit and prediction time.
+
+Run from the repository root:
+
+    python benchmarks/bench_thermal.py
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from custom_components.smart_heating_predictor.ml_engine import HeatingPredictor, fit_forest  # noqa: E402
+from custom_components.smart_heating_predictor.thermal_model import ThermalModel  # noqa: E402
+
+ROOMS = 4
+SAMPLE_COUNTS = [10, 25, 50, 100, 400, 2000]
+TEST_SAMPLES = 2000
+FIT_SAMPLES = 10000
+PREDICT_ROWS = [1, 8, 64, 512]
+REPEATS = 50
+
+
+def rc_samples(count, rng, gain, loss):
+    """Return (features, minutes, room ids) of heating cycles of first-order rooms with sensor noise."""
+    predictor = HeatingPredictor(None, None)
+    rooms = rng.integers(0, len(gain), count)
+    outdoor = rng.uniform(-10, 15, count)
+    start_temp = rng.uniform(15, 20, count)
+    target_temp = start_temp + rng.uniform(0.3, 4, count)
+    equilibrium = outdoor + gain[rooms] / loss[rooms]
+    minutes = np.log((equilibrium - start_temp) / (equilibrium - target_temp + 0.1)) / loss[rooms]
+    minutes = np.round(minutes + rng.normal(0, 3, count))
+    # Cycles that would never finish are abandoned by the tracker
+    valid = HeatingPredictor._valid_labels(minutes)
+    rooms, outdoor, start_temp, target_temp, minutes = (
+        column[valid] for column in (rooms, outdoor, start_temp, target_temp, minutes)
+    )
+    start = datetime(2025, 11, 1)
+    times = [start + timedelta(minutes=int(m)) for m in rng.integers(0, 90 * 24 * 60, len(minutes))]
+    features = predictor.collect_feature_rows(start_temp, target_temp, outdoor, 60.0, times)
+    return features, minutes, rooms
+
+
+def main():
+    rng = np.random.default_rng(42)
+    # Time constants of 10-30 hours, heaters of 1.5-4 °C/h
+    loss = 1 / rng.uniform(600, 1800, ROOMS)
+    gain = rng.uniform(0.025, 0.07, ROOMS)
+    names = [f"climate.room_{i}" for i in range(ROOMS)]
+    X_test, y_test, rooms_test = rc_samples(TEST_SAMPLES, rng, gain, loss)
+    ids_test = [names[i] for i in rooms_test]
+    y_test = np.clip(y_test, 5, 120)
+
+    print(f"Held-out MAE (minutes) on {TEST_SAMPLES} cycles of {ROOMS} rooms\n")
+    print(f"{'samples':>8} {'thermal':>8} {'forest':>8} {'heuristic':>10}")
+    heuristic = np.abs(HeatingPredictor.heuristic_preheat_times(X_test[:, 4]) - y_test).mean()
+    for count in SAMPLE_COUNTS:
+        X, y, rooms = rc_samples(count, rng, gain, loss)
+        thermal = ThermalModel()
+        thermal.fit(X[:, 3], X[:, 2], X[:, 0], y, rooms, names)
+        thermal_mae = np.abs(thermal.predict(X_test[:, 3], X_test[:, 2], X_test[:, 0], ids_test) - y_test).mean()
+        model, scaler = fit_forest(X, y)
+        forest_mae = np.abs(np.clip(model.predict(scaler.transform(X_test)), 5, 120) - y_test).mean()
+        print(f"{count:>8} {thermal_mae:>8.1f} {forest_mae:>8.1f} {heuristic:>10.1f}")
+
+    X, y, rooms = rc_samples(FIT_SAMPLES, rng, gain, loss)
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        ThermalModel().fit(X[:, 3], X[:, 2], X[:, 0], y, rooms, names)
+    print(f"\nFit on {FIT_SAMPLES} samples: {(time.perf_counter() - start) / REPEATS * 1000:.2f} ms")
+
+    thermal = ThermalModel()
+    thermal.fit(X[:, 3], X[:, 2], X[:, 0], y, rooms, names)
+    for rows in PREDICT_ROWS:
+        ids = ids_test[:rows]
+        start = time.perf_counter()
+        for _ in range(REPEATS):
+            thermal.predict(X_test[:rows, 3], X_test[:rows, 2], X_test[:rows, 0], ids)
+        print(f"Predict {rows:>4} rows: {(time.perf_counter() - start) / REPEATS * 1e6:8.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Forest hyperparameter search: cross-validated error vs inference cost and size per candidate.
+
+Run from the repository root:
+
+    python benchmarks/bench_tuning.py [--budget SECONDS] [--samples N]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from custom_components.smart_heating_predictor.ml_engine import HeatingPredictor  # noqa: E402
+from custom_components.smart_heating_predictor.tuning import pareto_front  # noqa: E402
+
+
+def seeded_predictor(samples):
+    """Return a predictor holding a season of synthetic, time-ordered samples."""
+    rng = np.random.default_rng(42)
+    predictor = HeatingPredictor(None, None)
+    start = datetime(2024, 10, 1)
+    for index in range(samples):
+        now = start + timedelta(minutes=index * 180 * 24 * 60 / samples)
+        outdoor = 8 - 10 * np.sin(np.pi * index / samples) + rng.normal(0, 3)
+        current = rng.uniform(14, 21)
+        target = current + rng.uniform(0.2, 4)
+        features = predictor.collect_features({'current_temp': current}, outdoor, rng.uniform(40, 95), target, now)
+        minutes = (target - current) * (10 + 0.6 * (15 - outdoor)) + rng.normal(0, 4)
+        predictor.add_training_sample(features, minutes, timestamp=now.timestamp())
+    return predictor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget", type=float, default=120, help="wall-clock budget in seconds")
+    parser.add_argument("--samples", type=int, default=4000)
+    args = parser.parse_args()
+
+    predictor = seeded_predictor(args.samples)
+    print(f"{args.samples} samples, {predictor.training_workers} workers, budget {args.budget:.0f} s")
+    start = time.perf_counter()
+    predictor.tune_model(args.budget)
+    print(f"Search took {time.perf_counter() - start:.1f} s, {len(predictor.tuning_results)} candidates\n")
+
+    front = pareto_front(predictor.tuning_results)
+    print(f"{'trees':>5} {'depth':>5} {'leaf':>4} {'MAE min':>8} {'steps':>6} {'nodes':>7} {'fit s':>6}")
+    for result in sorted(predictor.tuning_results, key=lambda r: r.mae):
+        params = result.params
+        marker = " *" if result.params == predictor.model_params else (" +" if result in front else "")
+        print(f"{params['n_estimators']:>5} {params['max_depth']:>5} {params['min_samples_leaf']:>4} "
+              f"{result.mae:>8.2f} {result.steps:>6} {result.nodes:>7} {result.fit_seconds:>6.1f}{marker}")
+    print("\n* chosen, + Pareto front")
+
+
+if __name__ == "__main__":
+    main()
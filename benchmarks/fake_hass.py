@@ -0,0 +1,212 @@
+"""Minimal Home Assistant stand-ins for driving the coordinator offline.
+
+Only what SmartHeatingCoordinator touches is provided: a state machine,
+the config directory, the shared executor, state-change events and the
+recorder's history queries. The simulated clock replaces ``datetime`` in
+the integration modules so that scheduling (nightly training, anomaly
+windows) follows simulated time.
+"""
+import asyncio
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from homeassistant.exceptions import HomeAssistantError
+
+
+class FakeState:
+    """State object with the attributes the coordinator reads."""
+
+    def __init__(self, entity_id, state, attributes, last_updated, last_changed=None):
+        """Initialize."""
+        self.entity_id = entity_id
+        self.state = state
+        self.attributes = attributes
+        self.last_updated = last_updated
+        self.last_changed = last_updated if last_changed is None else last_changed
+
+
+class FakeStates:
+    """Dictionary-backed replacement for ``hass.states``."""
+
+    def __init__(self):
+        """Initialize."""
+        self._states = {}
+
+    def get(self, entity_id):
+        """Return the current state of an entity, or None."""
+        return self._states.get(entity_id)
+
+    def set(self, entity_id, state, attributes, last_updated):
+        """Replace an entity's state and return (old_state, new_state)."""
+        old_state = self._states.get(entity_id)
+        # Like HA, an attribute-only update keeps last_changed
+        last_changed = old_state.last_changed if old_state is not None and old_state.state == state else None
+        new_state = self._states[entity_id] = FakeState(entity_id, state, attributes, last_updated, last_changed)
+        return old_state, new_state
+
+
+class FakeServices:
+    """Replacement for ``hass.services`` dispatching to plain functions."""
+
+    def __init__(self):
+        """Initialize."""
+        self._handlers = {}
+        self.calls = Counter()
+
+    def register(self, domain, service, handler):
+        """Register handler(data) for a service."""
+        self._handlers[(domain, service)] = handler
+
+    def has_service(self, domain, service):
+        """Return True if the service is registered."""
+        return (domain, service) in self._handlers
+
+    async def async_call(self, domain, service, data, blocking=False, return_response=False):
+        """Call a registered service, returning its response if asked to."""
+        handler = self._handlers.get((domain, service))
+        if handler is None:
+            raise HomeAssistantError(f"Service {domain}.{service} not found")
+        self.calls[f"{domain}.{service}"] += 1
+        response = handler(data)
+        return response if return_response else None
+
+
+class FakeConfig:
+    """Replacement for ``hass.config``."""
+
+    def __init__(self, config_dir):
+        """Initialize."""
+        self.config_dir = config_dir
+
+
+class FakeHass:
+    """Replacement for ``hass`` covering the coordinator's needs."""
+
+    def __init__(self, config_dir):
+        """Initialize."""
+        self.states = FakeStates()
+        self.services = FakeServices()
+        self.config = FakeConfig(config_dir)
+        self.data = {}
+
+    def async_create_task(self, target):
+        """Schedule a coroutine on the running loop."""
+        return asyncio.get_running_loop().create_task(target)
+
+    async def async_add_executor_job(self, func, *args):
+        """Run func in the default executor like Home Assistant's shared pool."""
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+
+class FakeConfigEntry:
+    """Config entry carrying options only."""
+
+    def __init__(self, options, entry_id="replay"):
+        """Initialize."""
+        self.entry_id = entry_id
+        self.options = options
+        self.data = {}
+        self.title = "Smart Heating Predictor"
+
+    def async_on_unload(self, func):
+        """Accept unload callbacks; the replay never unloads."""
+
+
+class FakeEvent:
+    """State-changed event as delivered to async_track_state_change_event callbacks."""
+
+    def __init__(self, entity_id, old_state, new_state):
+        """Initialize."""
+        self.data = {'entity_id': entity_id, 'old_state': old_state, 'new_state': new_state}
+
+
+class FakeRecorder:
+    """In-memory state history answering the integration's recorder queries.
+
+    Stands in for the recorder's history module, with the same filtering:
+    state_changes_during_period and significant-only reads outside the
+    significant domains drop attribute-only updates.
+    """
+
+    SIGNIFICANT_DOMAINS = {"climate", "device_tracker", "humidifier", "thermostat", "water_heater"}
+
+    def __init__(self):
+        """Initialize."""
+        self._times = defaultdict(list)
+        self._states = defaultdict(list)
+        self.queries = 0
+
+    def __len__(self):
+        """Return the number of recorded states."""
+        return sum(len(states) for states in self._states.values())
+
+    def record(self, state):
+        """Store a state; states of one entity must arrive in time order."""
+        states = self._states[state.entity_id]
+        if states and states[-1].state == state.state:
+            # Like HA, an attribute-only update keeps last_changed
+            state.last_changed = states[-1].last_changed
+        self._times[state.entity_id].append(state.last_updated.timestamp())
+        states.append(state)
+
+    def _read(self, entity_id, start, end, changes_only, include_start_time_state):
+        """Return states in [start, end), optionally led by the one in force at start."""
+        self.queries += 1
+        times = self._times[entity_id]
+        low = bisect_left(times, start.timestamp())
+        high = bisect_left(times, end.timestamp())
+        states = self._states[entity_id][low:high]
+        if changes_only:
+            states = [state for state in states if state.last_changed == state.last_updated]
+        if include_start_time_state and low > 0:
+            previous = self._states[entity_id][low - 1]
+            states = [FakeState(entity_id, previous.state, previous.attributes, start), *states]
+        return states
+
+    def get_significant_states(self, hass, start_time, end_time=None, entity_ids=None, filters=None,
+                               include_start_time_state=True, significant_changes_only=True,
+                               minimal_response=False, no_attributes=False, compressed_state_format=False):
+        """Return {entity id: states} like history.get_significant_states."""
+        return {
+            entity_id: self._read(
+                entity_id, start_time, end_time,
+                significant_changes_only and entity_id.split(".")[0] not in self.SIGNIFICANT_DOMAINS,
+                include_start_time_state,
+            )
+            for entity_id in entity_ids
+        }
+
+    def state_changes_during_period(self, hass, start_time, end_time=None, entity_id=None, no_attributes=False,
+                                    descending=False, limit=None, include_start_time_state=True):
+        """Return {entity id: states} like history.state_changes_during_period."""
+        return {entity_id: self._read(entity_id, start_time, end_time, True, include_start_time_state)}
+
+    def install(self, module):
+        """Serve recorder_import's database reads from this history."""
+        async def recorder_job(hass, func, *args):
+            return await hass.async_add_executor_job(func, *args)
+
+        module._recorder_history = lambda: self
+        module._async_recorder_job = recorder_job
+
+
+class SimulatedClock:
+    """Clock whose ``datetime.now()`` returns simulated time."""
+
+    def __init__(self, start):
+        """Initialize."""
+        self.now = start
+        clock = self
+
+        class _SimulatedDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return clock.now if tz is None else clock.now.astimezone(tz)
+
+        self.datetime = _SimulatedDatetime
+
+    def install(self, *modules):
+        """Make the given modules read this clock instead of the wall clock."""
+        for module in modules:
+            module.datetime = self.datetime
@@ -0,0 +1,407 @@
+"""Replay simulated months through SmartHeatingCoordinator.
+
+Thermostat and weather traces from the simulator are written into a
+fake ``hass.states`` every simulated minute, with state-change events
+delivered to the coordinator's listener, and ``_async_update_data`` runs
+on the coordinator's five-minute interval under a simulated clock. The
+first ``--learning-days`` collect samples and train nightly; the rest run
+in operation mode and score predictions against the simulator's exact
+time-to-target. With ``--import-days``, that many days before the start
+are simulated into a fake recorder and imported before the replay begins.
+
+Run from the repository root:
+
+    python benchmarks/replay.py                    # 60 days, 4 rooms
+    python benchmarks/replay.py --days 120 --rooms 12 --json baseline.json
+
+Compare the JSON of two runs to catch regressions in the training and
+inference paths; a fixed --seed replays the identical trace.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fake_hass import FakeConfigEntry, FakeEvent, FakeHass, FakeRecorder, FakeState, SimulatedClock  # noqa: E402
+from simulator import RoomSimulator, WeatherSimulator, minutes, season_start  # noqa: E402
+
+from custom_components.smart_heating_predictor import anomaly, coordinator, ml_engine, recorder_import  # noqa: E402
+from custom_components.smart_heating_predictor.const import (  # noqa: E402
+    CONF_MODEL_SHARDING,
+    CONF_MODEL_TUNING,
+    CONF_PREHEAT_POLICY,
+    CONF_ROOM_PREDICTOR,
+    CONF_TRAINING_MAX_LOAD,
+    CONF_TRAINING_MIN_NEW_SAMPLES,
+    CONF_TRAINING_MODE,
+    MODEL_SHARDINGS,
+    PREDICTORS,
+    PREHEAT_POLICIES,
+    TRAINING_MODES,
+)
+
+OUTDOOR_TEMP_SENSOR = "sensor.outdoor_temperature"
+OUTDOOR_HUMIDITY_SENSOR = "sensor.outdoor_humidity"
+WEATHER_ENTITY = "weather.home"
+FORECAST_HOURS = 48
+TICK_MINUTES = 5
+
+
+def parse_args(argv=None):
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=60, help="simulated days (default 60)")
+    parser.add_argument("--learning-days", type=int, default=30, help="days in learning mode (default 30)")
+    parser.add_argument("--rooms", type=int, default=4, help="number of thermostats (default 4)")
+    parser.add_argument("--seed", type=int, default=1, help="trace seed (default 1)")
+    parser.add_argument("--training-mode", choices=TRAINING_MODES, default=TRAINING_MODES[0])
+    parser.add_argument("--model-sharding", choices=MODEL_SHARDINGS, default=MODEL_SHARDINGS[0])
+    parser.add_argument("--import-days", type=int, default=0,
+                        help="import this many simulated days of recorder history first (default 0)")
+    parser.add_argument("--predictor", choices=PREDICTORS, default=PREDICTORS[0],
+                        help="preheat predictor of every room (default forest)")
+    parser.add_argument("--preheat-policy", choices=PREHEAT_POLICIES, default=PREHEAT_POLICIES[0],
+                        help="preheat time used: the mean or the p80 of the trees (default mean)")
+    parser.add_argument("--min-new-samples", type=int, default=0,
+                        help="also train once this many new samples arrived (default 0, nightly only)")
+    parser.add_argument("--tuning", action="store_true", help="search forest settings at the nightly slot")
+    parser.add_argument("--window-rate", type=float, default=1 / (10 * 24 * 60),
+                        help="per-room, per-minute chance of an open window (default one per 10 days)")
+    parser.add_argument("--no-forecast", action="store_true",
+                        help="don't offer an hourly forecast on the weather entity")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="also report the tracemalloc peak (slows the replay down)")
+    parser.add_argument("--config-dir", help="keep the model here instead of a temporary directory")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="show the integration's log output")
+    return parser.parse_args(argv)
+
+
+class Timed:
+    """Wrap a predictor method and record how long each call takes."""
+
+    def __init__(self, func, successful_only=False):
+        """Initialize."""
+        self.func = func
+        self.__name__ = func.__name__
+        self.successful_only = successful_only
+        self.seconds = []
+
+    def __call__(self, *args, **kwargs):
+        """Call the wrapped method."""
+        start = time.perf_counter()
+        result = self.func(*args, **kwargs)
+        # Training returns False when there is too little data; don't count those
+        if result or not self.successful_only:
+            self.seconds.append(time.perf_counter() - start)
+        return result
+
+
+def directory_size(path):
+    """Return the total size in bytes of the files under path."""
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+def percentiles(values):
+    """Return p50/p95/p99/max of values in milliseconds."""
+    if not values:
+        return {}
+    ms = np.asarray(values) * 1000
+    return {
+        'p50': float(np.percentile(ms, 50)),
+        'p95': float(np.percentile(ms, 95)),
+        'p99': float(np.percentile(ms, 99)),
+        'max': float(ms.max()),
+    }
+
+
+def weather_trace(rng, start, days):
+    """Return per-minute outdoor (temperature, humidity) arrays, with a forecast's worth of margin."""
+    weather = WeatherSimulator(rng)
+    trace = [weather.step(now) for now in minutes(start, days + FORECAST_HOURS // 24 + 1)]
+    return np.array([t for t, _ in trace]), np.array([h for _, h in trace])
+
+
+def forecast_service(clock, start, outdoor, rng):
+    """Return a weather.get_forecasts handler serving the true trace plus lead-time noise."""
+    def get_forecasts(data):
+        hour = clock.now.replace(minute=0, second=0, microsecond=0)
+        forecast = []
+        for lead in range(FORECAST_HOURS):
+            when = hour + timedelta(hours=lead)
+            minute = min(int((when - start).total_seconds() // 60), len(outdoor) - 1)
+            forecast.append({
+                'datetime': when.astimezone().isoformat(),
+                'temperature': round(float(outdoor[minute] + rng.normal(0, 0.3 * np.sqrt(lead))), 1),
+            })
+        return {data['entity_id']: {'forecast': forecast}}
+    return get_forecasts
+
+
+def record_history(recorder, rooms, rng, start, days, window_rate):
+    """Simulate the days before start into the recorder, storing only state changes."""
+    history_start = start - timedelta(days=days)
+    outdoor, humidity = weather_trace(rng, history_start, days)
+    last_values = {}
+    last_readings = np.full(rooms.rooms, np.nan)
+    last_targets = np.full(rooms.rooms, np.nan)
+    last_heating = np.zeros(rooms.rooms, dtype=bool)
+    for minute, now in enumerate(minutes(history_start, days)):
+        targets = rooms.step(now, outdoor[minute], window_rate=window_rate)
+        readings = rooms.readings()
+        for entity_id, value in ((OUTDOOR_TEMP_SENSOR, f"{outdoor[minute]:.1f}"),
+                                 (OUTDOOR_HUMIDITY_SENSOR, f"{humidity[minute]:.0f}")):
+            if last_values.get(entity_id) != value:
+                recorder.record(FakeState(entity_id, value, {}, now))
+                last_values[entity_id] = value
+        changed = (readings != last_readings) | (targets != last_targets) | (rooms.heating != last_heating)
+        for room in np.flatnonzero(changed):
+            recorder.record(FakeState(rooms.entity_ids[room], 'heat', {
+                'current_temperature': float(readings[room]),
+                'temperature': float(targets[room]),
+                'hvac_action': 'heating' if rooms.heating[room] else 'idle',
+            }, now))
+        last_readings = readings
+        last_targets = targets
+        last_heating = rooms.heating.copy()
+
+
+async def replay(args, config_dir):
+    """Run the replay and return the results dict."""
+    rng = np.random.default_rng(args.seed)
+    rooms = RoomSimulator(args.rooms, rng)
+    start = season_start()
+    outdoor, humidity = weather_trace(rng, start, args.days)
+    clock = SimulatedClock(start)
+    clock.install(coordinator, ml_engine, anomaly)
+
+    hass = FakeHass(config_dir)
+    if not args.no_forecast:
+        hass.services.register(
+            "weather", "get_forecasts", forecast_service(clock, start, outdoor, np.random.default_rng(args.seed))
+        )
+    entry = FakeConfigEntry({
+        'thermostats': rooms.entity_ids,
+        'weather_entity': WEATHER_ENTITY,
+        'outdoor_temp_sensor': OUTDOOR_TEMP_SENSOR,
+        'outdoor_humidity_sensor': OUTDOOR_HUMIDITY_SENSOR,
+        CONF_TRAINING_MODE: args.training_mode,
+        CONF_MODEL_SHARDING: args.model_sharding,
+        CONF_MODEL_TUNING: args.tuning,
+        CONF_ROOM_PREDICTOR: args.predictor,
+        CONF_PREHEAT_POLICY: args.preheat_policy,
+        CONF_TRAINING_MIN_NEW_SAMPLES: args.min_new_samples,
+        # Training must not depend on the benchmark machine's load
+        CONF_TRAINING_MAX_LOAD: 0,
+    })
+    smart_heating = coordinator.SmartHeatingCoordinator(hass, entry)
+    predictor = smart_heating.predictor
+    predictor.train_model = train_timer = Timed(predictor.train_model, successful_only=True)
+    predictor.update_incremental = incremental_timer = Timed(predictor.update_incremental)
+    predictor.save_model = save_timer = Timed(predictor.save_model)
+    predictor.tune_model = tuning_timer = Timed(predictor.tune_model, successful_only=True)
+    smart_heating.anomalies.add = anomaly_counter = Timed(smart_heating.anomalies.add)
+    await smart_heating.async_load_model()
+
+    recorder = FakeRecorder()
+    recorder.install(recorder_import)
+    import_seconds = None
+    if args.import_days:
+        record_history(recorder, rooms, np.random.default_rng(args.seed + 1), start, args.import_days,
+                       args.window_rate)
+        import_start = time.perf_counter()
+        await smart_heating.async_import_history(args.import_days)
+        import_seconds = time.perf_counter() - import_start
+    imported_samples = len(predictor.training_data)
+
+    learning_until = start + timedelta(days=args.learning_days)
+    tick_seconds = []
+    errors = []
+    # Whether each scored truth fell inside the prediction's p10-p90 interval
+    covered = []
+    events = 0
+    last_readings = np.full(args.rooms, np.nan)
+    last_targets = np.full(args.rooms, np.nan)
+    last_heating = np.zeros(args.rooms, dtype=bool)
+    replay_start = time.perf_counter()
+
+    for minute, now in enumerate(minutes(start, args.days)):
+        clock.now = now
+        outdoor_temp, outdoor_humidity = outdoor[minute], humidity[minute]
+        targets = rooms.step(now, outdoor_temp, window_rate=args.window_rate)
+        readings = rooms.readings()
+
+        hass.states.set(OUTDOOR_TEMP_SENSOR, f"{outdoor_temp:.1f}", {}, now)
+        hass.states.set(OUTDOOR_HUMIDITY_SENSOR, f"{outdoor_humidity:.0f}", {}, now)
+
+        # Thermostats only report when their reading, setpoint or action changes
+        changed = (readings != last_readings) | (targets != last_targets) | (rooms.heating != last_heating)
+        for room in np.flatnonzero(changed):
+            entity_id = rooms.entity_ids[room]
+            old_state, new_state = hass.states.set(entity_id, 'heat', {
+                'current_temperature': float(readings[room]),
+                'temperature': float(targets[room]),
+                'hvac_action': 'heating' if rooms.heating[room] else 'idle',
+            }, now)
+            smart_heating._async_thermostat_changed(FakeEvent(entity_id, old_state, new_state))
+            events += 1
+        last_readings = readings
+        last_targets = targets
+        last_heating = rooms.heating.copy()
+
+        if now.minute % TICK_MINUTES:
+            continue
+        predictor.learning_mode = now < learning_until
+
+        tick_start = time.perf_counter()
+        data = await smart_heating._async_update_data()
+        tick_seconds.append(time.perf_counter() - tick_start)
+        # Training runs in the background; finishing it before simulated time
+        # moves on keeps runs reproducible
+        await smart_heating.scheduler.async_join()
+
+        if not predictor.learning_mode:
+            predictions = data['predictions']
+            truth = rooms.true_preheat_minutes(readings, targets, outdoor_temp)
+            for room, entity_id in enumerate(rooms.entity_ids):
+                if targets[room] > readings[room] and entity_id in predictions:
+                    # The model's output range is 5-120 minutes
+                    prediction = predictions[entity_id]
+                    expected = np.clip(truth[room], 5, 120)
+                    errors.append(prediction['preheat_time'] - expected)
+                    covered.append(prediction['preheat_p10'] <= expected <= prediction['preheat_p90'])
+
+    replay_seconds = time.perf_counter() - replay_start
+    smart_heating.executor.shutdown()
+    late = float(np.mean(np.array(errors) < 0)) if errors else None
+    errors = np.abs(errors) if errors else np.zeros(0)
+
+    return {
+        'days': args.days,
+        'learning_days': args.learning_days,
+        'rooms': args.rooms,
+        'seed': args.seed,
+        'training_mode': args.training_mode,
+        'model_sharding': args.model_sharding,
+        'predictor': args.predictor,
+        'preheat_policy': args.preheat_policy,
+        'import_days': args.import_days,
+        'recorded_states': len(recorder),
+        'recorder_queries': recorder.queries,
+        'import_seconds': import_seconds,
+        'imported_samples': imported_samples,
+        'ticks': len(tick_seconds),
+        'state_events': events,
+        'replay_seconds': replay_seconds,
+        'tick_ms': percentiles(tick_seconds),
+        'loop_block_max_ms': smart_heating.loop_block_ms['max'],
+        'stage_ms': {
+            stage: {'p50': stats['p50_ms'], 'p95': stats['p95_ms'], 'max': stats['max_ms']}
+            for stage, stats in smart_heating.timers.summary().items()
+        },
+        'train_ms': percentiles(train_timer.seconds),
+        'trainings': len(train_timer.seconds),
+        'incremental_ms': percentiles(incremental_timer.seconds),
+        'save_ms': percentiles(save_timer.seconds),
+        'tuning_ms': percentiles(tuning_timer.seconds),
+        'model_params': predictor.model_params,
+        'model_bytes': directory_size(smart_heating._model_path),
+        'training_samples': len(predictor.training_data),
+        'anomalies': len(anomaly_counter.seconds),
+        'forecast_fetches': hass.services.calls['weather.get_forecasts'],
+        'prediction_cache_hits': predictor.cache_hits,
+        'prediction_cache_misses': predictor.cache_misses,
+        'prediction_mae': float(errors.mean()) if len(errors) else None,
+        'prediction_p90_error': float(np.percentile(errors, 90)) if len(errors) else None,
+        'predictions_scored': len(errors),
+        # Share of predictions shorter than the true preheat time (a late start)
+        'predictions_late': late,
+        'interval_coverage': float(np.mean(covered)) if covered else None,
+    }
+
+
+def report(results):
+    """Print the results as a table."""
+    def row(label, value):
+        print(f"  {label:<24}{value}")
+
+    def timings(label, stats):
+        if stats:
+            row(label, "  ".join(f"{name} {value:8.2f}" for name, value in stats.items()))
+
+    print(f"Replayed {results['days']} days ({results['learning_days']} learning), "
+          f"{results['rooms']} rooms, {results['training_mode']} training, "
+          f"{results['model_sharding']} sharding, {results['predictor']} predictor, {results['preheat_policy']} preheat, seed {results['seed']}")
+    row("wall time", f"{results['replay_seconds']:.1f} s for {results['ticks']} ticks, "
+                     f"{results['state_events']} state events")
+    if results['import_seconds'] is not None:
+        row("history import", f"{results['import_seconds']:.1f} s for {results['recorded_states']} states "
+                              f"({results['recorder_queries']} queries), {results['imported_samples']} samples")
+    timings("tick latency (ms)", results['tick_ms'])
+    row("max loop block (ms)", f"{results['loop_block_max_ms']:.2f}")
+    for stage, stats in results['stage_ms'].items():
+        timings(f"  {stage} (ms)", stats)
+    timings("training (ms)", results['train_ms'])
+    timings("incremental (ms)", results['incremental_ms'])
+    timings("save (ms)", results['save_ms'])
+    timings("tuning (ms)", results['tuning_ms'])
+    row("trainings", results['trainings'])
+    row("training samples", results['training_samples'])
+    row("model parameters", ", ".join(f"{name} {value}" for name, value in results['model_params'].items()))
+    row("model size", f"{results['model_bytes'] / 1024:.1f} KiB")
+    row("peak RSS", f"{results['peak_rss_mib']:.1f} MiB")
+    if 'tracemalloc_peak_mib' in results:
+        row("tracemalloc peak", f"{results['tracemalloc_peak_mib']:.1f} MiB")
+    row("anomalies", results['anomalies'])
+    row("forecast fetches", results['forecast_fetches'])
+    lookups = results['prediction_cache_hits'] + results['prediction_cache_misses']
+    if lookups:
+        row("prediction cache", f"{results['prediction_cache_hits'] / lookups:.0%} hits of {lookups} rows")
+    if results['prediction_mae'] is not None:
+        row("prediction MAE", f"{results['prediction_mae']:.1f} min "
+                              f"(p90 {results['prediction_p90_error']:.1f}, n={results['predictions_scored']})")
+        row("late starts", f"{results['predictions_late']:.0%} of predictions, "
+                           f"p10-p90 interval covers {results['interval_coverage']:.0%}")
+
+
+def main(argv=None):
+    """Run the replay from the command line."""
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.ERROR)
+    if args.trace_memory:
+        tracemalloc.start()
+
+    if args.config_dir:
+        results = asyncio.run(replay(args, args.config_dir))
+    else:
+        with tempfile.TemporaryDirectory() as config_dir:
+            results = asyncio.run(replay(args, config_dir))
+
+    # ru_maxrss is in KiB on Linux
+    results['peak_rss_mib'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    if args.trace_memory:
+        results['tracemalloc_peak_mib'] = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+
+    report(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
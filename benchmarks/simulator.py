@@ -0,0 +1,112 @@
+"""Thermal room and weather simulator for offline benchmarks.
+
+Rooms follow a first-order model,
+
+    dT/dt = -loss * (T - T_outdoor) + gain * heating
+
+with a hysteresis thermostat tracking a comfort/eco schedule. Weather is
+a seasonal + diurnal outdoor temperature with AR(1) noise. Everything is
+vectorized across rooms and seeded, so runs are reproducible.
+"""
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+
+HYSTERESIS = 0.2
+SENSOR_RESOLUTION = 0.1
+MAX_PREHEAT_MINUTES = 240
+
+
+class WeatherSimulator:
+    """Outdoor temperature and humidity with seasonal and daily cycles."""
+
+    def __init__(self, rng, annual_mean=8.0, annual_amplitude=10.0, daily_amplitude=4.0):
+        """Initialize."""
+        self.rng = rng
+        self.annual_mean = annual_mean
+        self.annual_amplitude = annual_amplitude
+        self.daily_amplitude = daily_amplitude
+        self._noise = 0.0
+
+    def step(self, now, minutes=1):
+        """Advance by minutes and return (temperature, humidity)."""
+        day_of_year = now.timetuple().tm_yday
+        seasonal = self.annual_mean - self.annual_amplitude * math.cos(2 * math.pi * (day_of_year - 20) / 365)
+        daily = self.daily_amplitude * math.sin(2 * math.pi * (now.hour + now.minute / 60 - 9) / 24)
+        # AR(1) noise with a time constant of about half a day
+        decay = math.exp(-minutes / 720)
+        self._noise = decay * self._noise + math.sqrt(1 - decay * decay) * self.rng.normal(0, 3)
+        temperature = seasonal + daily + self._noise
+        humidity = float(np.clip(75 - 1.5 * (daily + self._noise) + self.rng.normal(0, 3), 20, 100))
+        return temperature, humidity
+
+
+class RoomSimulator:
+    """A set of rooms with their own loss, heater gain and schedule."""
+
+    def __init__(self, rooms, rng, comfort_temp=21.0, eco_temp=17.0):
+        """Initialize."""
+        self.rng = rng
+        self.rooms = rooms
+        self.entity_ids = [f"climate.room_{i}" for i in range(rooms)]
+        # Time constants between 10 and 30 hours, heaters 1.5-4 °C/h at 20 °C above outdoors
+        self.loss = 1 / rng.uniform(600, 1800, rooms)
+        self.gain = rng.uniform(0.025, 0.07, rooms)
+        self.comfort_temp = comfort_temp
+        self.eco_temp = eco_temp
+        self.morning_start = rng.integers(5, 8, rooms)
+        self.evening_start = rng.integers(15, 18, rooms)
+        self.temperature = np.full(rooms, eco_temp)
+        self.heating = np.zeros(rooms, dtype=bool)
+        self.window_open_until = np.zeros(rooms)
+
+    def setpoints(self, now):
+        """Return each room's scheduled target temperature."""
+        hour = now.hour
+        comfort = ((hour >= self.morning_start) & (hour < self.morning_start + 2)) | (
+            (hour >= self.evening_start) & (hour < 23)
+        )
+        return np.where(comfort, self.comfort_temp, self.eco_temp)
+
+    def step(self, now, outdoor_temp, minutes=1, window_rate=0.0):
+        """Advance every room by minutes (explicit Euler, one-minute steps)."""
+        target = self.setpoints(now)
+        minute = now.timestamp() / 60
+        # Occasionally a window opens for 10-20 minutes and multiplies losses
+        opened = self.rng.random(self.rooms) < window_rate * minutes
+        self.window_open_until[opened] = minute + self.rng.uniform(10, 20, opened.sum())
+        loss = np.where(self.window_open_until > minute, self.loss * 25, self.loss)
+        for _ in range(minutes):
+            self.heating = np.where(
+                self.temperature < target - HYSTERESIS, True,
+                np.where(self.temperature > target + HYSTERESIS, False, self.heating),
+            )
+            self.temperature += -loss * (self.temperature - outdoor_temp) + self.gain * self.heating
+        return target
+
+    def readings(self):
+        """Return temperatures as a thermostat would report them."""
+        return np.round(self.temperature / SENSOR_RESOLUTION) * SENSOR_RESOLUTION
+
+    def true_preheat_minutes(self, current_temp, target_temp, outdoor_temp):
+        """Minutes of continuous heating to go from current to target at a fixed outdoor temperature."""
+        equilibrium = outdoor_temp + self.gain / self.loss
+        current_temp = np.asarray(current_temp, dtype=float)
+        target_temp = np.asarray(target_temp, dtype=float)
+        reachable = target_temp < equilibrium
+        with np.errstate(divide='ignore', invalid='ignore'):
+            minutes = np.log((equilibrium - current_temp) / (equilibrium - target_temp)) / self.loss
+        minutes = np.where(reachable, minutes, MAX_PREHEAT_MINUTES)
+        return np.clip(np.where(target_temp > current_temp, minutes, 0.0), 0, MAX_PREHEAT_MINUTES)
+
+
+def season_start(year=2025, month=11, day=1):
+    """Return the default simulation start."""
+    return datetime(year, month, day)
+
+
+def minutes(start, days):
+    """Yield every simulated minute from start for the given number of days."""
+    for minute in range(days * 24 * 60):
+        yield start + timedelta(minutes=minute)
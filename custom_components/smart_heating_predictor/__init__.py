@@ -1,13 +1,18 @@
 """Smart Heating Predictor Integration for Home Assistant"""
 import logging
+import time
 from datetime import timedelta
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import entity_registry as er
 from homeassistant.helpers.typing import ConfigType
 
-from .const import DOMAIN
+from .const import DATA_ENGINE, DOMAIN, MODEL_STATE_UNTRAINED, TRAINING_REASON_MANUAL
 from .coordinator import SmartHeatingCoordinator
+from .engine import EngineManager
+from .instrumentation import PROFILE_CPROFILE, PROFILE_MODES
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -17,34 +22,74 @@ PLATFORMS = ["sensor", "binary_sensor", "select", "number"]
 async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     """Set up the Smart Heating Predictor component."""
     hass.data.setdefault(DOMAIN, {})
+    
+    # Services are registered once and act on every entry, or on one via entry_id
+    await async_setup_services(hass)
     return True
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up Smart Heating Predictor from a config entry."""
-    coordinator = SmartHeatingCoordinator(hass, entry)
+    setup_start = time.perf_counter()
+    hass.data.setdefault(DOMAIN, {})
+    
+    # One engine refreshes and trains every entry
+    engine = hass.data.get(DATA_ENGINE)
+    if engine is None:
+        engine = hass.data[DATA_ENGINE] = EngineManager(hass)
+    coordinator = SmartHeatingCoordinator(hass, entry, engine)
     await coordinator.async_config_entry_first_refresh()
     
+    # Anomalies and heating cycles follow thermostat state changes; the
+    # preheat plan fires its own timers between refreshes
+    entry.async_on_unload(coordinator.async_start_listeners())
+    
+    # Load the saved model after the first (heuristic) refresh so boot never waits on it
+    hass.async_create_task(coordinator.async_load_model())
+    
     hass.data[DOMAIN][entry.entry_id] = coordinator
+    engine.async_register(coordinator)
+    
+    # Unique ids carry the entry id so several entries can coexist; entities
+    # registered before keep their history under the new id
+    await er.async_migrate_entries(hass, entry.entry_id, _unique_id_migration(entry))
     
     # Setup platforms
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
     
-    # Register services
-    await async_setup_services(hass, coordinator)
-    
     # Register reload service
     entry.async_on_unload(entry.add_update_listener(async_reload_entry))
     
+    _LOGGER.debug(f"Setup finished in {(time.perf_counter() - setup_start) * 1000:.1f} ms")
     return True
 
 
+def _unique_id_migration(entry: ConfigEntry):
+    """Return an entity registry migration adding the entry id to unique ids without one."""
+    prefix = f"{DOMAIN}_{entry.entry_id}_"
+    
+    @callback
+    def migrate(entity_entry):
+        unique_id = entity_entry.unique_id
+        if unique_id.startswith(prefix) or not unique_id.startswith(f"{DOMAIN}_"):
+            return None
+        return {"new_unique_id": prefix + unique_id[len(DOMAIN) + 1:]}
+    
+    return migrate
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     
     if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id)
+        coordinator = hass.data[DOMAIN].pop(entry.entry_id)
+        # A training run must not save into an unloaded entry's directory
+        if coordinator.scheduler.async_cancel():
+            await coordinator.scheduler.async_join()
+        # The last entry out shuts the shared engine down
+        if await coordinator.engine.async_unregister(coordinator):
+            hass.data.pop(DATA_ENGINE, None)
     
     return unload_ok
 
@@ -55,7 +100,20 @@ async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
     await async_setup_entry(hass, entry)
 
 
-async def async_setup_services(hass: HomeAssistant, coordinator: SmartHeatingCoordinator) -> None:
+def _coordinators(hass: HomeAssistant, call) -> list:
+    """Return the coordinator of the call's entry_id, or of every entry without one."""
+    coordinators = hass.data.get(DOMAIN, {})
+    entry_id = call.data.get("entry_id")
+    if entry_id is None:
+        if not coordinators:
+            raise HomeAssistantError("Smart Heating Predictor has no loaded entry")
+        return list(coordinators.values())
+    if entry_id not in coordinators:
+        raise HomeAssistantError(f"No loaded Smart Heating Predictor entry {entry_id}")
+    return [coordinators[entry_id]]
+
+
+async def async_setup_services(hass: HomeAssistant) -> None:
     """Register integration services."""
     
     async def set_schedule_slot(call):
@@ -66,35 +124,87 @@ async def async_setup_services(hass: HomeAssistant, coordinator: SmartHeatingCoo
         room = call.data.get("room", "default")
         
         key = f"{day}_{hour}_{room}"
-        coordinator.schedule[key] = target_temp
-        await coordinator.async_request_refresh()
+        for coordinator in _coordinators(hass, call):
+            coordinator.schedule[key] = target_temp
+            await coordinator.async_replan()
+            await coordinator.async_request_refresh()
         
         _LOGGER.info(f"Schedule slot set: {key} = {target_temp}°C")
     
     async def set_learning_mode(call):
         """Set learning mode."""
         mode = call.data.get("mode")
-        coordinator.predictor.learning_mode = mode
-        await coordinator.async_request_refresh()
+        for coordinator in _coordinators(hass, call):
+            coordinator.predictor.learning_mode = mode
+            await coordinator.async_replan()
+            await coordinator.async_request_refresh()
         
         _LOGGER.info(f"Learning mode set to: {mode}")
     
     async def trigger_training(call):
         """Trigger immediate model training."""
-        await hass.async_add_executor_job(coordinator.predictor.train_model)
-        await coordinator.async_request_refresh()
+        for coordinator in _coordinators(hass, call):
+            # Queued behind any other entry's training on the shared engine
+            await coordinator.async_train_now(TRAINING_REASON_MANUAL)
+            await coordinator.async_request_refresh()
         
         _LOGGER.info("Manual training triggered")
     
+    async def cancel_training(call):
+        """Stop a queued or running training run; the current model is kept."""
+        cancelled = [coordinator.scheduler.async_cancel() for coordinator in _coordinators(hass, call)]
+        if not any(cancelled):
+            raise HomeAssistantError("No training run is in progress")
+    
+    async def rollback_model(call):
+        """Make the model active before the last retrain current again."""
+        for coordinator in _coordinators(hass, call):
+            version = await coordinator.async_rollback()
+            _LOGGER.info(f"Rolled back to model version {version}")
+            await coordinator.async_request_refresh()
+    
     async def clear_training_data(call):
-        """Clear all training data."""
-        coordinator.predictor.training_data = []
-        coordinator.predictor.is_trained = False
-        await coordinator.async_request_refresh()
+        """Clear all training data, including the sample history on disk."""
+        coordinators = _coordinators(hass, call)
+        if any(coordinator.scheduler.running for coordinator in coordinators):
+            raise HomeAssistantError("A training run is in progress, cancel it first")
+        for coordinator in coordinators:
+            # On the predictor executor, so it cannot interleave with sample collection
+            await coordinator.executor.async_run(coordinator.predictor.clear_training_data, timeout=None)
+            coordinator.scheduler.trained_samples = coordinator.predictor.training_data.total_appended
+            coordinator.predictor.is_trained = False
+            coordinator.model_state = MODEL_STATE_UNTRAINED
+            await coordinator.async_replan()
+            await coordinator.async_request_refresh()
         
         _LOGGER.info("Training data cleared")
     
+    async def import_history(call):
+        """Train on heating cycles rebuilt from the recorder's history."""
+        days = call.data.get("days", 90)
+        for coordinator in _coordinators(hass, call):
+            if await coordinator.async_import_history(days):
+                _LOGGER.info(f"Model trained from {days} days of recorder history")
+            await coordinator.async_request_refresh()
+    
+    async def profile(call):
+        """Profile the next coordinator ticks into a report in the config directory."""
+        mode = call.data.get("mode", PROFILE_CPROFILE)
+        if mode not in PROFILE_MODES:
+            raise HomeAssistantError(f"Unknown profile mode {mode}, expected one of {PROFILE_MODES}")
+        ticks = call.data.get("ticks", 3)
+        coordinators = _coordinators(hass, call)
+        # Only one cProfile profiler can be active at a time
+        if len(coordinators) > 1:
+            raise HomeAssistantError("Several entries are loaded, pass the entry_id to profile")
+        path = coordinators[0].async_start_profile(mode, ticks)
+        _LOGGER.info(f"Profiling the next {ticks} ticks into {path}")
+    
     hass.services.async_register(DOMAIN, "set_schedule_slot", set_schedule_slot)
     hass.services.async_register(DOMAIN, "set_learning_mode", set_learning_mode)
     hass.services.async_register(DOMAIN, "trigger_training", trigger_training)
+    hass.services.async_register(DOMAIN, "cancel_training", cancel_training)
+    hass.services.async_register(DOMAIN, "rollback_model", rollback_model)
     hass.services.async_register(DOMAIN, "clear_training_data", clear_training_data)
+    hass.services.async_register(DOMAIN, "import_history", import_history)
+    hass.services.async_register(DOMAIN, "profile", profile)
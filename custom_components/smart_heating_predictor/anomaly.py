@@ -0,0 +1,251 @@
+"""Anomaly detection helpers for Smart Heating Predictor"""
+import math
+from bisect import bisect_right
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+# Rates are expressed per this many seconds, matching the °C/5min threshold
+RATE_PERIOD = 300
+
+# Outdoor temperature bin edges (°C) used to condition rate statistics
+OUTDOOR_BIN_EDGES = (0.0, 8.0, 15.0)
+
+
+class RateTracker:
+    """Per-thermostat smoothed temperature change rate, updated in O(1).
+
+    Each reading updates an exponentially weighted rate whose weight grows
+    with the time since the previous reading, so a single sensor step a few
+    seconds after the last one barely moves it while a sustained drop
+    (open window) or rise (cooking) shows up within a minute or two.
+    """
+
+    def __init__(self, time_constant=60, min_interval=30):
+        """Initialize."""
+        self.time_constant = time_constant
+        self.min_interval = min_interval
+        # thermostat id -> [last temperature, last timestamp, smoothed rate]
+        self._state = {}
+
+    def observe(self, thermostat_id, temperature, timestamp):
+        """Add a reading and return the smoothed rate, or None without enough history."""
+        state = self._state.get(thermostat_id)
+        if state is None:
+            self._state[thermostat_id] = [temperature, timestamp, 0.0]
+            return None
+
+        elapsed = timestamp - state[1]
+        if elapsed < self.min_interval:
+            # Too close to the last reading; keep measuring from the older one
+            return None
+
+        rate = (temperature - state[0]) / elapsed * RATE_PERIOD
+        weight = 1 - math.exp(-elapsed / self.time_constant)
+        state[2] += weight * (rate - state[2])
+        state[0] = temperature
+        state[1] = timestamp
+        return state[2]
+
+    def rate(self, thermostat_id):
+        """Return the current smoothed rate for a thermostat."""
+        state = self._state.get(thermostat_id)
+        return state[2] if state else 0.0
+
+    def forget(self, thermostat_id):
+        """Drop the history of a thermostat."""
+        self._state.pop(thermostat_id, None)
+
+
+class AnomalyEngine:
+    """Streaming per-thermostat baselines of the temperature change rate.
+
+    For every thermostat, heating state (idle / heating) and outdoor
+    temperature bin, an EWMA mean and variance of the rate is kept in
+    fixed-size arrays. A reading is an outlier when its z-score against
+    that baseline exceeds z_threshold; until a cell has seen
+    warmup_samples readings the caller falls back to a fixed threshold.
+    """
+
+    def __init__(self, capacity=16, alpha=0.05, z_threshold=4.0, warmup_samples=30, min_rate=0.5):
+        """Initialize."""
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.warmup_samples = warmup_samples
+        self.min_rate = min_rate
+        self._slots = {}
+        shape = (capacity, 2, len(OUTDOOR_BIN_EDGES) + 1)
+        self.mean = np.zeros(shape)
+        self.var = np.zeros(shape)
+        self.count = np.zeros(shape, dtype=np.int64)
+
+    def _slot(self, thermostat_id):
+        slot = self._slots.get(thermostat_id)
+        if slot is None:
+            slot = self._slots[thermostat_id] = len(self._slots)
+            if slot >= len(self.mean):
+                # Double the arrays; only happens when thermostats are added
+                self.mean = np.concatenate([self.mean, np.zeros_like(self.mean)])
+                self.var = np.concatenate([self.var, np.zeros_like(self.var)])
+                self.count = np.concatenate([self.count, np.zeros_like(self.count)])
+        return slot
+
+    @staticmethod
+    def _outdoor_bin(outdoor_temp):
+        if outdoor_temp is None:
+            return len(OUTDOOR_BIN_EDGES) // 2
+        return sum(outdoor_temp >= edge for edge in OUTDOOR_BIN_EDGES)
+
+    def update(self, thermostat_id, rate, heating, outdoor_temp):
+        """Score a rate against its baseline, then fold it in.
+
+        Returns the z-score, or None while the baseline is still warming up.
+        """
+        cell = (self._slot(thermostat_id), int(bool(heating)), self._outdoor_bin(outdoor_temp))
+        mean = self.mean[cell]
+        var = self.var[cell]
+        count = self.count[cell]
+
+        z = None
+        if count >= self.warmup_samples:
+            z = (rate - mean) / math.sqrt(var + 1e-6)
+
+        # Outliers are clipped before updating so they don't widen the baseline
+        value = rate
+        if z is not None and abs(z) > self.z_threshold:
+            value = mean + math.copysign(self.z_threshold * math.sqrt(var), z)
+        if count == 0:
+            self.mean[cell] = value
+        else:
+            # First samples use a plain average so the EWMA starts unbiased
+            alpha = max(self.alpha, 1.0 / (count + 1))
+            delta = value - mean
+            self.mean[cell] = mean + alpha * delta
+            self.var[cell] = (1 - alpha) * (var + alpha * delta * delta)
+        self.count[cell] = count + 1
+        return z
+
+    def is_outlier(self, z, rate):
+        """Return True if a scored rate should be reported."""
+        return abs(z) > self.z_threshold and abs(rate) > self.min_rate
+
+
+class _TimeIndex:
+    """Ascending timestamps with O(1) head expiry and bisect window counts."""
+
+    def __init__(self):
+        self._times = []
+        self._head = 0
+
+    def __len__(self):
+        return len(self._times) - self._head
+
+    def append(self, timestamp):
+        self._times.append(timestamp)
+
+    def expire(self, cutoff):
+        """Drop timestamps at or before cutoff."""
+        times = self._times
+        while self._head < len(times) and times[self._head] <= cutoff:
+            self._head += 1
+        # Compact once most of the list is expired
+        if self._head > 64 and self._head * 2 > len(times):
+            del times[:self._head]
+            self._head = 0
+
+    def count_since(self, start):
+        """Return the number of timestamps after start."""
+        return len(self._times) - max(self._head, bisect_right(self._times, start, self._head))
+
+
+class AnomalyLog:
+    """Time-ordered anomaly log with per-thermostat and per-type indexes.
+
+    Entries must be added in time order. Expiry pops from the head and
+    window counts bisect an index, so nothing rescans the history.
+    """
+
+    def __init__(self, retention=86400):
+        """Initialize."""
+        self.retention = retention
+        # (timestamp, thermostat id, type, change rate)
+        self._entries = deque()
+        # (thermostat id or None, type or None) -> timestamps
+        self._index = {}
+
+    def __len__(self):
+        """Return number of retained anomalies."""
+        return len(self._entries)
+
+    def add(self, timestamp, thermostat_id, anomaly_type, change_rate):
+        """Record an anomaly."""
+        if self._entries and timestamp < self._entries[-1][0]:
+            # Keep the log ordered if an event arrives slightly late
+            timestamp = self._entries[-1][0]
+        self._entries.append((timestamp, thermostat_id, anomaly_type, change_rate))
+        for key in (
+            (None, None),
+            (thermostat_id, None),
+            (None, anomaly_type),
+            (thermostat_id, anomaly_type),
+        ):
+            index = self._index.get(key)
+            if index is None:
+                index = self._index[key] = _TimeIndex()
+            index.append(timestamp)
+
+    def expire(self, now):
+        """Drop anomalies older than the retention window."""
+        cutoff = now - self.retention
+        entries = self._entries
+        if not entries or entries[0][0] > cutoff:
+            return
+        while entries and entries[0][0] <= cutoff:
+            entries.popleft()
+        for key in list(self._index):
+            index = self._index[key]
+            index.expire(cutoff)
+            if not index:
+                del self._index[key]
+
+    def count(self, thermostat_id=None, anomaly_type=None, window=None, now=None):
+        """Count anomalies, optionally for one thermostat/type and within the last window seconds."""
+        index = self._index.get((thermostat_id, anomaly_type))
+        if index is None:
+            return 0
+        if window is None:
+            return len(index)
+        if now is None:
+            now = datetime.now().timestamp()
+        return index.count_since(now - window)
+
+    def counts_by_thermostat(self, window=None, now=None):
+        """Return {thermostat id: count} for thermostats with anomalies."""
+        counts = {}
+        for thermostat_id, anomaly_type in list(self._index):
+            if thermostat_id is not None and anomaly_type is None:
+                count = self.count(thermostat_id, window=window, now=now)
+                if count:
+                    counts[thermostat_id] = count
+        return counts
+
+    def latest(self):
+        """Return the newest anomaly as a dict, or None."""
+        if not self._entries:
+            return None
+        return self._as_dict(self._entries[-1])
+
+    def as_list(self):
+        """Return retained anomalies as dicts, oldest first."""
+        return [self._as_dict(entry) for entry in self._entries]
+
+    @staticmethod
+    def _as_dict(entry):
+        timestamp, thermostat_id, anomaly_type, change_rate = entry
+        return {
+            'thermostat_id': thermostat_id,
+            'time': datetime.fromtimestamp(timestamp).isoformat(),
+            'change_rate': change_rate,
+            'type': anomaly_type
+        }
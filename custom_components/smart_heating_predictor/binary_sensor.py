@@ -19,7 +19,7 @@ class AnomalyDetectedSensor(CoordinatorEntity, BinarySensorEntity):
         super().__init__(coordinator)
         self.coordinator = coordinator
         self._attr_name = "Smart Heating Anomaly Detected"
-        self._attr_unique_id = f"{DOMAIN}_anomaly_detected"
+        self._attr_unique_id = f"{DOMAIN}_{coordinator.config_entry.entry_id}_anomaly_detected"
         self._attr_device_class = "problem"
         self._attr_icon = "mdi:alert-circle"
     
@@ -27,6 +27,16 @@ class AnomalyDetectedSensor(CoordinatorEntity, BinarySensorEntity):
     def is_on(self):
         """Return true if anomaly detected recently."""
         return len(self.coordinator.anomalies) > 0
+    
+    @property
+    def extra_state_attributes(self):
+        """Return anomaly counts per thermostat."""
+        anomalies = self.coordinator.anomalies
+        return {
+            'last_hour': anomalies.count(window=3600),
+            'last_24h_by_thermostat': anomalies.counts_by_thermostat(),
+            'latest': anomalies.latest(),
+        }
 
 class ModelTrainedSensor(CoordinatorEntity, BinarySensorEntity):
     """Model trained status binary sensor."""
@@ -36,7 +46,7 @@ class ModelTrainedSensor(CoordinatorEntity, BinarySensorEntity):
         super().__init__(coordinator)
         self.coordinator = coordinator
         self._attr_name = "Smart Heating Model Trained"
-        self._attr_unique_id = f"{DOMAIN}_model_trained"
+        self._attr_unique_id = f"{DOMAIN}_{coordinator.config_entry.entry_id}_model_trained"
         self._attr_icon = "mdi:check-circle"
     
     @property
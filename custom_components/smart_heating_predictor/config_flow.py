@@ -6,7 +6,26 @@ from homeassistant.core import callback
 import voluptuous as vol
 from homeassistant.helpers import config_validation as cv
 
-from .const import DOMAIN
+from .const import (
+    DOMAIN,
+    CONF_MODEL_SHARDING,
+    CONF_MODEL_TUNING,
+    CONF_PREHEAT_POLICY,
+    CONF_ROOM_PREDICTOR,
+    CONF_TRAINING_MAX_LOAD,
+    CONF_TRAINING_MIN_NEW_SAMPLES,
+    CONF_TRAINING_MODE,
+    CONF_TRAINING_WINDOW,
+    DEFAULT_TRAINING_WINDOW,
+    MODEL_SHARDING_GLOBAL,
+    MODEL_SHARDINGS,
+    PREDICTOR_FOREST,
+    PREDICTORS,
+    PREHEAT_POLICIES,
+    PREHEAT_POLICY_MEAN,
+    TRAINING_MODE_FULL,
+    TRAINING_MODES,
+)
 
 class SmartHeatingConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow for Smart Heating Predictor."""
@@ -127,7 +146,23 @@ class SmartHeatingOptionsFlow(config_entries.OptionsFlow):
                     vol.All(vol.Coerce(int), vol.Range(min=7, max=60)),
                 vol.Optional("training_hour", default=self.config_entry.options.get("training_hour", 3)): 
                     vol.All(vol.Coerce(int), vol.Range(min=0, max=23)),
+                vol.Optional(CONF_TRAINING_WINDOW, default=self.config_entry.options.get(CONF_TRAINING_WINDOW, DEFAULT_TRAINING_WINDOW)): 
+                    vol.All(vol.Coerce(int), vol.Range(min=1, max=12)),
+                vol.Optional(CONF_TRAINING_MIN_NEW_SAMPLES, default=self.config_entry.options.get(CONF_TRAINING_MIN_NEW_SAMPLES, 0)): 
+                    vol.All(vol.Coerce(int), vol.Range(min=0, max=10000)),
+                vol.Optional(CONF_TRAINING_MAX_LOAD, default=self.config_entry.options.get(CONF_TRAINING_MAX_LOAD, 1.0)): 
+                    vol.All(vol.Coerce(float), vol.Range(min=0.0, max=8.0)),
                 vol.Optional("anomaly_threshold", default=self.config_entry.options.get("anomaly_threshold", 2.5)): 
                     vol.All(vol.Coerce(float), vol.Range(min=0.5, max=5.0)),
+                vol.Optional(CONF_TRAINING_MODE, default=self.config_entry.options.get(CONF_TRAINING_MODE, TRAINING_MODE_FULL)): 
+                    vol.In(TRAINING_MODES),
+                vol.Optional(CONF_MODEL_SHARDING, default=self.config_entry.options.get(CONF_MODEL_SHARDING, MODEL_SHARDING_GLOBAL)): 
+                    vol.In(MODEL_SHARDINGS),
+                vol.Optional(CONF_MODEL_TUNING, default=self.config_entry.options.get(CONF_MODEL_TUNING, False)): 
+                    bool,
+                vol.Optional(CONF_ROOM_PREDICTOR, default=self.config_entry.options.get(CONF_ROOM_PREDICTOR, PREDICTOR_FOREST)): 
+                    vol.In(PREDICTORS),
+                vol.Optional(CONF_PREHEAT_POLICY, default=self.config_entry.options.get(CONF_PREHEAT_POLICY, PREHEAT_POLICY_MEAN)): 
+                    vol.In(PREHEAT_POLICIES),
             })
         )
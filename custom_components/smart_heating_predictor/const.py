@@ -2,6 +2,8 @@
 # Author: prezes9732
 
 DOMAIN = "smart_heating_predictor"
+# hass.data key of the EngineManager shared by all entries
+DATA_ENGINE = f"{DOMAIN}_engine"
 CONF_THERMOSTATS = "thermostats"
 CONF_WEATHER_ENTITY = "weather_entity"
 CONF_OUTDOOR_TEMP = "outdoor_temp_sensor"
@@ -16,5 +18,95 @@ CONF_MONITORED_ATTRIBUTES = "monitored_attributes"
 CONF_DEFAULT_COMFORT_TEMP = "default_comfort_temp"
 CONF_DEFAULT_ECO_TEMP = "default_eco_temp"
 CONF_SCHEDULE_ENABLED = "schedule_enabled"
+CONF_TRAINING_MODE = "training_mode"
+CONF_MODEL_SHARDING = "model_sharding"
+CONF_MODEL_TUNING = "model_tuning"
+CONF_ROOM_PREDICTOR = "room_predictor"
+CONF_TRAINING_WINDOW = "training_window"
+CONF_TRAINING_MIN_NEW_SAMPLES = "training_min_new_samples"
+CONF_TRAINING_MAX_LOAD = "training_max_load"
+CONF_PREHEAT_POLICY = "preheat_policy"
+
+TRAINING_MODE_FULL = "full"
+TRAINING_MODE_INCREMENTAL = "incremental"
+TRAINING_MODES = [TRAINING_MODE_FULL, TRAINING_MODE_INCREMENTAL]
+
+# Per-room models, trained by the full refit next to the global model
+MODEL_SHARDING_GLOBAL = "global"
+MODEL_SHARDING_THERMOSTAT = "thermostat"
+MODEL_SHARDING_AREA = "area"
+MODEL_SHARDINGS = [MODEL_SHARDING_GLOBAL, MODEL_SHARDING_THERMOSTAT, MODEL_SHARDING_AREA]
+
+# Preheat predictor of a room: the forest, the RC thermal model, or the
+# forest blended with the thermal model as its prior
+PREDICTOR_FOREST = "forest"
+PREDICTOR_THERMAL = "thermal"
+PREDICTOR_BLEND = "blend"
+PREDICTORS = [PREDICTOR_FOREST, PREDICTOR_THERMAL, PREDICTOR_BLEND]
+
+# When preheating starts: after the mean predicted time, or after the time
+# the trees' predictions stay below in 80% of cases, so a room is rarely late
+PREHEAT_POLICY_MEAN = "mean"
+PREHEAT_POLICY_P80 = "p80"
+PREHEAT_POLICY_QUANTILES = {PREHEAT_POLICY_MEAN: None, PREHEAT_POLICY_P80: 0.8}
+PREHEAT_POLICIES = list(PREHEAT_POLICY_QUANTILES)
 
 DEFAULT_NAME = "Smart Heating Predictor"
+
+MODEL_STATE_LOADING = "loading"
+MODEL_STATE_READY = "ready"
+MODEL_STATE_UNTRAINED = "untrained"
+
+ANOMALY_RAPID_CHANGE = "rapid_change"
+ANOMALY_RATE_OUTLIER = "rate_outlier"
+
+# Seconds before the same thermostat can raise another anomaly
+ANOMALY_COOLDOWN = 900
+
+# Predictor executor limits (seconds / jobs)
+INFERENCE_TIMEOUT = 5.0
+EXECUTOR_MAX_PENDING = 4
+
+# Incremental training: fold new samples in every N coordinator ticks
+INCREMENTAL_UPDATE_TICKS = 6
+
+# Preheat planner: plan this far ahead, and replan at least this often (hours)
+PLAN_HORIZON_HOURS = 24
+PLAN_REFRESH_HOURS = 6
+
+# Seconds an hourly weather forecast is reused before it is fetched again
+FORECAST_TTL = 1800
+
+# Model tuning at the nightly training slot: wall-clock budget (seconds)
+# and days between searches
+TUNING_BUDGET = 600
+TUNING_INTERVAL_DAYS = 7
+
+# Training scheduler: hours of the nightly window from the training hour,
+# and the most an entry's start is spread into it (minutes)
+DEFAULT_TRAINING_WINDOW = 2
+TRAINING_JITTER_MINUTES = 30
+
+# Training scheduler states, and outcomes of a finished run
+TRAINING_IDLE = "idle"
+TRAINING_DEFERRED = "deferred"
+TRAINING_QUEUED = "queued"
+TRAINING_TUNING = "tuning"
+TRAINING_FITTING = "training"
+TRAINING_SAVING = "saving"
+TRAINING_STATES = [
+    TRAINING_IDLE, TRAINING_DEFERRED, TRAINING_QUEUED, TRAINING_TUNING, TRAINING_FITTING, TRAINING_SAVING
+]
+TRAINING_TRAINED = "trained"
+TRAINING_FAILED = "failed"
+TRAINING_CANCELLED = "cancelled"
+# The retrained model did worse on the newest samples and was not swapped in
+TRAINING_REJECTED = "rejected"
+
+# Why a training run started
+TRAINING_REASON_WINDOW = "window"
+TRAINING_REASON_SAMPLES = "samples"
+TRAINING_REASON_MANUAL = "manual"
+TRAINING_REASON_IMPORT = "import"
+# Incremental mode folding new samples in between scheduled runs
+TRAINING_REASON_INCREMENTAL = "incremental"
@@ -1,104 +1,621 @@
 """Data coordinator for Smart Heating Predictor"""
+from collections import deque
 from datetime import timedelta, datetime
+from homeassistant.core import callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import device_registry as dr, entity_registry as er
+from homeassistant.helpers.event import async_track_state_change_event, async_track_time_interval
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+from homeassistant.util import dt as dt_util
 import logging
 import os
-from .ml_engine import HeatingPredictor
-from .const import DOMAIN
+import time
+import numpy as np
+from .anomaly import AnomalyEngine, AnomalyLog, RateTracker
+from .cycles import CycleTracker, is_heating
+from .engine import EngineManager
+from .instrumentation import StageTimers, TickProfiler
+from .ml_engine import FORECAST_HORIZONS, HeatingPredictor, PreheatIntervals
+from .model_store import LEGACY_MODEL_FILE, claim_shared_store
+from .planner import PreheatPlanner, build_plan, upcoming_slots
+from .recorder_import import async_import_cycles
+from .scheduler import TrainingScheduler
+from .const import (
+    DOMAIN,
+    ANOMALY_COOLDOWN,
+    ANOMALY_RAPID_CHANGE,
+    ANOMALY_RATE_OUTLIER,
+    CONF_MODEL_SHARDING,
+    CONF_MODEL_TUNING,
+    CONF_PREHEAT_POLICY,
+    CONF_ROOM_PREDICTOR,
+    CONF_TRAINING_HOUR,
+    CONF_TRAINING_MAX_LOAD,
+    CONF_TRAINING_MIN_NEW_SAMPLES,
+    CONF_TRAINING_MODE,
+    CONF_TRAINING_WINDOW,
+    DEFAULT_TRAINING_WINDOW,
+    FORECAST_TTL,
+    INCREMENTAL_UPDATE_TICKS,
+    INFERENCE_TIMEOUT,
+    MODEL_STATE_LOADING,
+    MODEL_STATE_READY,
+    MODEL_STATE_UNTRAINED,
+    MODEL_SHARDING_AREA,
+    MODEL_SHARDING_GLOBAL,
+    MODEL_SHARDING_THERMOSTAT,
+    PLAN_HORIZON_HOURS,
+    PLAN_REFRESH_HOURS,
+    PREDICTOR_FOREST,
+    PREHEAT_POLICY_MEAN,
+    PREHEAT_POLICY_QUANTILES,
+    TRAINING_FITTING,
+    TRAINING_MODE_FULL,
+    TRAINING_MODE_INCREMENTAL,
+    TRAINING_REASON_IMPORT,
+    TRAINING_REASON_INCREMENTAL,
+    TRAINING_REASON_MANUAL,
+    TRAINING_REASON_WINDOW,
+    TRAINING_REJECTED,
+    TRAINING_SAVING,
+    TRAINING_TUNING,
+    TUNING_BUDGET,
+    TUNING_INTERVAL_DAYS,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
 class SmartHeatingCoordinator(DataUpdateCoordinator):
     """Coordinator to manage Smart Heating Predictor data."""
     
-    def __init__(self, hass, config_entry):
+    def __init__(self, hass, config_entry, engine=None):
         """Initialize coordinator."""
+        # Periodic refreshes come from the engine's coalesced tick
         super().__init__(
             hass,
             _LOGGER,
             name="Smart Heating Predictor",
-            update_interval=timedelta(minutes=5),
+            update_interval=None,
         )
         self.config_entry = config_entry
+        # Standalone coordinators (benchmarks) get an engine of their own
+        self.engine = engine if engine is not None else EngineManager(hass)
         
-        # Initialize ML predictor
-        model_path = os.path.join(hass.config.config_dir, "smart_heating_model.pkl")
+        # Initialize ML predictor; the saved model is loaded in the background
         self.predictor = HeatingPredictor(hass, hass.config.config_dir)
-        self.predictor.load_model(model_path)
-        self._model_path = model_path
-        self._last_training = None
+        self.predictor.training_pool = self.engine.training_pool
+        # Each entry has its own model directory
+        self._store_root = os.path.join(hass.config.config_dir, "smart_heating_predictor")
+        self._model_path = os.path.join(self._store_root, config_entry.entry_id)
+        self._legacy_model_path = os.path.join(hass.config.config_dir, "smart_heating_model.pkl")
+        self.model_state = MODEL_STATE_LOADING
+        self.predictor.training_mode = config_entry.options.get(CONF_TRAINING_MODE, TRAINING_MODE_FULL)
+        self.tuning_enabled = config_entry.options.get(CONF_MODEL_TUNING, False)
+        # Per-room choices are restored by the predictor select entities
+        self.predictor.default_predictor = config_entry.options.get(CONF_ROOM_PREDICTOR, PREDICTOR_FOREST)
+        self.predictor.preheat_quantile = PREHEAT_POLICY_QUANTILES[
+            config_entry.options.get(CONF_PREHEAT_POLICY, PREHEAT_POLICY_MEAN)
+        ]
+        self._ticks = 0
+        # Training runs in the background when due, never inside a refresh
+        self.scheduler = TrainingScheduler(
+            hass,
+            config_entry.entry_id,
+            self._async_train,
+            self.async_update_listeners,
+            hour=config_entry.options.get(CONF_TRAINING_HOUR, 3),
+            window=config_entry.options.get(CONF_TRAINING_WINDOW, DEFAULT_TRAINING_WINDOW),
+            min_new_samples=config_entry.options.get(CONF_TRAINING_MIN_NEW_SAMPLES, 0),
+            max_load=config_entry.options.get(CONF_TRAINING_MAX_LOAD, 1.0),
+        )
+        self.predictor.training_cancel = self.scheduler.cancel_event
+        
+        # CPU-bound model work runs on the engine's executor, never on the event loop
+        self.executor = self.engine.executor
+        self.loop_block_ms = {'last': 0.0, 'max': 0.0}
+        self._tick_offloaded = 0.0
+        # Rolling per-stage durations, read by diagnostics and the timing sensors
+        self.timers = StageTimers()
+        self.profiler = None
         
         self.schedule = {}
+        self.planner = PreheatPlanner(hass)
         self.thermostats = config_entry.options.get("thermostats", [])
         self.weather_entity = config_entry.options.get("weather_entity")
         self.outdoor_temp_sensor = config_entry.options.get("outdoor_temp_sensor")
         self.outdoor_humidity_sensor = config_entry.options.get("outdoor_humidity_sensor")
-        self.anomalies = []
-        self.last_temps = {}
+        self.forecast = self.engine.forecast_cache(self.weather_entity, FORECAST_TTL)
+        self.anomalies = AnomalyLog()
+        self.rate_tracker = RateTracker()
+        self.anomaly_engine = AnomalyEngine(capacity=max(len(config_entry.options.get("thermostats", [])), 1))
+        self._outdoor_temp = None
+        self._outdoor_humidity = None
+        self._outdoor_forecast_temps = None
+        self._last_anomaly = {}
+        # Completed heating cycles waiting to become training samples
+        self.cycle_tracker = CycleTracker()
+        self._completed_cycles = deque(maxlen=1000)
         self.predictions = {}
         self.anomaly_detection_enabled = True
+        self.predictor.shard_keys = self._shard_keys(
+            config_entry.options.get(CONF_MODEL_SHARDING, MODEL_SHARDING_GLOBAL)
+        )
+    
+    def _shard_keys(self, sharding):
+        """Map each thermostat to the per-room model it trains and predicts with."""
+        if sharding == MODEL_SHARDING_THERMOSTAT:
+            return {thermostat_id: thermostat_id for thermostat_id in self.thermostats}
+        if sharding != MODEL_SHARDING_AREA:
+            return {}
+        
+        entity_registry = er.async_get(self.hass)
+        device_registry = dr.async_get(self.hass)
+        keys = {}
+        for thermostat_id in self.thermostats:
+            area_id = None
+            entity = entity_registry.async_get(thermostat_id)
+            if entity:
+                area_id = entity.area_id
+                if area_id is None and entity.device_id:
+                    device = device_registry.async_get(entity.device_id)
+                    area_id = device.area_id if device else None
+            # Thermostats without an area get a model of their own
+            keys[thermostat_id] = area_id or thermostat_id
+        return keys
+    
+    @callback
+    def async_start_listeners(self):
+        """Follow thermostat state changes and keep the preheat plan current; returns the unsubscribe callable."""
+        unsubscribers = [
+            async_track_state_change_event(self.hass, self.thermostats, self._async_thermostat_changed),
+            async_track_time_interval(
+                self.hass, self._async_replan_interval, timedelta(hours=PLAN_REFRESH_HOURS)
+            ),
+            self.planner.async_cancel,
+            self._async_cancel_profile,
+        ]
+        
+        @callback
+        def unsubscribe():
+            for unsub in unsubscribers:
+                unsub()
+        
+        return unsubscribe
+    
+    async def _async_replan_interval(self, now):
+        """Roll the plan forward over the horizon."""
+        await self.async_replan()
+    
+    async def async_replan(self):
+        """Precompute preheat starts for every schedule slot within the horizon.
         
+        Called after training, model loading, schedule and mode changes;
+        the per-tick path reads the resulting timeline without model calls.
+        """
+        now = dt_util.now()
+        slots = upcoming_slots(self.schedule, self.thermostats, now, timedelta(hours=PLAN_HORIZON_HOURS))
+        weather_data = await self._get_weather_data()
+        current_temps = {}
+        for thermostat_id in self.thermostats:
+            state = self.hass.states.get(thermostat_id)
+            try:
+                current_temps[thermostat_id] = float(state.attributes['current_temperature'])
+            except (AttributeError, KeyError, TypeError, ValueError):
+                continue
+        
+        plan_start = time.perf_counter()
+        plan = await self.executor.async_run(
+            build_plan,
+            self.predictor,
+            slots,
+            current_temps,
+            lambda times: self._outdoor_forecast(times, weather_data),
+            weather_data['outdoor_humidity'],
+            now,
+            # In learning mode targets change on the hour, so observed cycles start from the slot
+            not self.predictor.learning_mode,
+            timeout=INFERENCE_TIMEOUT,
+            fallback=lambda: None
+        )
+        self.timers.record('plan', time.perf_counter() - plan_start)
+        if plan is None:
+            _LOGGER.warning("Preheat planning timed out, keeping the previous plan")
+        else:
+            self.planner.async_set_timeline(plan, now)
+            _LOGGER.debug(f"Planned {len(plan)} schedule slots over the next {PLAN_HORIZON_HOURS} h")
+        self.async_update_listeners()
+    
+    def _outdoor_forecast(self, times, weather_data):
+        """Expected outdoor temperature at each time; the current reading without a forecast."""
+        temperatures = self.forecast.temperatures_at([t.timestamp() for t in times])
+        if temperatures is None:
+            return np.full(len(times), float(weather_data['outdoor_temp']))
+        return temperatures
+    
+    @callback
+    def _async_thermostat_changed(self, event):
+        """Update the rate estimate and heating cycle of a thermostat as soon as it reports."""
+        new_state = event.data.get("new_state")
+        if new_state is None:
+            return
+        try:
+            current_temp = float(new_state.attributes['current_temperature'])
+        except (KeyError, TypeError, ValueError):
+            return
+        thermostat_id = event.data["entity_id"]
+        heating = is_heating(new_state.state, new_state.attributes.get('hvac_action'))
+        try:
+            target_temp = float(new_state.attributes['temperature'])
+        except (KeyError, TypeError, ValueError):
+            pass
+        else:
+            self._observe_cycle(
+                thermostat_id, current_temp, target_temp, heating, new_state.state, new_state.last_updated
+            )
+        if (self.anomaly_detection_enabled
+                and self._observe_temperature(thermostat_id, current_temp, heating, new_state.last_updated)):
+            self.async_update_listeners()
+    
+    async def async_load_model(self):
+        """Load the saved model off the event loop; heuristics are served meanwhile."""
+        # Queued on the predictor executor, so it cannot interleave with sample
+        # collection or inference; ticks that time out behind it fall back.
+        # Loads of all entries run there one by one, so only one of them can
+        # take over the files saved before entries had their own directory
+        try:
+            await self.executor.async_run(self._load_model, timeout=None)
+        except Exception as e:
+            # Serve heuristics as untrained rather than stay loading for good
+            _LOGGER.error(f"Failed to load model: {e}")
+        self.model_state = MODEL_STATE_READY if self.predictor.is_trained else MODEL_STATE_UNTRAINED
+        if self.predictor.is_trained:
+            # The loaded model has seen every restored sample
+            self.scheduler.trained_samples = self.predictor.training_data.total_appended
+        _LOGGER.debug(f"Model state: {self.model_state}")
+        await self.async_replan()
+    
+    def _load_model(self):
+        """Claim any pre-entry model files, then load the entry's model (runs in the predictor executor)."""
+        claim_shared_store(self._store_root, self._model_path, self._legacy_model_path)
+        self.predictor.load_model(self._model_path, os.path.join(self._model_path, LEGACY_MODEL_FILE))
+    
+    def entity_ids(self):
+        """Return every entity a tick reads."""
+        entity_ids = list(self.thermostats)
+        # The weather entity's state is only the fallback for a missing outdoor sensor
+        weather_entity = None if self.outdoor_temp_sensor else self.weather_entity
+        for entity_id in (self.outdoor_temp_sensor, self.outdoor_humidity_sensor, weather_entity):
+            if entity_id:
+                entity_ids.append(entity_id)
+        return entity_ids
+    
+    def _get_state(self, entity_id, states):
+        """Return an entity's state from the tick's snapshot, or the state machine without one."""
+        if states is None:
+            return self.hass.states.get(entity_id)
+        return states.get(entity_id)
+    
+    async def async_import_history(self, days):
+        """Rebuild samples from the recorder's history before the oldest collected sample, then train."""
+        if self.model_state == MODEL_STATE_LOADING:
+            raise HomeAssistantError("The saved model is still loading, try again shortly")
+        if self.scheduler.running:
+            raise HomeAssistantError("A training run is in progress, try again once it has finished")
+        oldest = await self.hass.async_add_executor_job(self.predictor.oldest_sample_time)
+        end = datetime.now() if oldest is None else datetime.fromtimestamp(oldest)
+        end = end.astimezone()
+        start = end - timedelta(days=days)
+        
+        # Same sources, and precedence, as _get_weather_data
+        if self.outdoor_temp_sensor:
+            outdoor_source = (self.outdoor_temp_sensor, None)
+        elif self.weather_entity:
+            outdoor_source = (self.weather_entity, 'temperature')
+        else:
+            outdoor_source = None
+        if self.outdoor_humidity_sensor:
+            humidity_source = (self.outdoor_humidity_sensor, None)
+        elif not self.outdoor_temp_sensor and self.weather_entity:
+            humidity_source = (self.weather_entity, 'humidity')
+        else:
+            humidity_source = None
+        
+        with self.timers.measure('import'):
+            cycles = await async_import_cycles(
+                self.hass, self.thermostats, outdoor_source, humidity_source, start, end
+            )
+        if not cycles:
+            _LOGGER.warning(f"No heating cycles found in the recorder history since {start:%Y-%m-%d}")
+            return False
+        # Queued behind sample collection so the buffer is not reloaded under it
+        await self.executor.async_run(self._import_cycles, cycles, timeout=None)
+        return await self.async_train_now(TRAINING_REASON_IMPORT)
+    
+    def _import_cycles(self, cycles):
+        """Add the samples of imported heating cycles (runs in the predictor executor)."""
+        features = self.predictor.collect_feature_rows(
+            np.array([cycle.start_temp for cycle in cycles]),
+            np.array([cycle.target_temp for cycle in cycles]),
+            np.array([cycle.outdoor_temp for cycle in cycles]),
+            np.array([cycle.outdoor_humidity for cycle in cycles], dtype=object),
+            [datetime.fromtimestamp(cycle.start) for cycle in cycles],
+            np.array([cycle.outdoor_forecast for cycle in cycles]),
+        )
+        self.predictor.import_samples(
+            features,
+            [cycle.minutes for cycle in cycles],
+            [cycle.start for cycle in cycles],
+            [cycle.thermostat_id for cycle in cycles],
+        )
+        _LOGGER.info(f"Imported {len(cycles)} samples from the recorder history")
+    
     async def _async_update_data(self):
-        """Update data."""
-        current_time = datetime.now()
+        """Refresh this entry alone (first refresh and requested refreshes)."""
+        tick = await self.async_begin_tick(datetime.now())
+        result = None
+        if tick['job']:
+            start = time.perf_counter()
+            result = await self.executor.async_run(
+                self.tick_job, tick, timeout=INFERENCE_TIMEOUT, fallback=tick['fallback']
+            )
+            tick['offloaded'] += time.perf_counter() - start
+        return await self.async_finish_tick(tick, result)
+    
+    async def async_begin_tick(self, current_time, states=None):
+        """Read thermostats and weather and advance cycles and anomalies; return the tick state.
+        
+        states is the engine's snapshot of this tick's entities. The tick's
+        executor work (tick_job) is run by the caller, batched with other
+        entries by the engine, and handed to async_finish_tick.
+        """
+        begin_start = time.perf_counter()
+        self._tick_offloaded = 0.0
+        if self.profiler is not None:
+            self.profiler.tick_started()
+        
+        # Training data and training need the saved model and samples in place first
+        model_loaded = self.model_state != MODEL_STATE_LOADING
         
         # Collect thermostat data
-        thermostat_data = await self._collect_thermostat_data()
+        with self.timers.measure('thermostats'):
+            thermostat_data = await self._collect_thermostat_data(states)
         
         # Get weather data
-        weather_data = await self._get_weather_data()
+        with self.timers.measure('weather'):
+            weather_data = await self._get_weather_data(states)
+        self._outdoor_temp = weather_data['outdoor_temp']
+        self._outdoor_humidity = weather_data['outdoor_humidity']
+        self._outdoor_forecast_temps = weather_data['outdoor_forecast']
+        
+        # Ticks also advance heating cycles, in case state events were missed
+        for thermostat_id, data in thermostat_data.items():
+            heating = is_heating(data['state'], data['hvac_action'])
+            self._observe_cycle(
+                thermostat_id, data['current_temp'], data['target_temp'], heating, data['state'], current_time
+            )
         
         # Check for anomalies if enabled
         if self.anomaly_detection_enabled:
-            await self._check_anomalies(thermostat_data)
+            with self.timers.measure('anomalies'):
+                await self._check_anomalies(thermostat_data, weather_data)
         
-        # In learning mode, collect training data
-        if self.predictor.learning_mode:
-            await self._collect_training_data(thermostat_data, weather_data)
+        tick = {
+            'time': current_time,
+            'thermostat_data': thermostat_data,
+            'weather_data': weather_data,
+            'model_loaded': model_loaded,
+            'learning': self.predictor.learning_mode,
+            'unplanned': {},
+            'offloaded': 0.0,
+        }
+        if tick['learning']:
+            # In learning mode, completed heating cycles become training data;
+            # they wait in the queue while a training run reads the samples
+            tick['job'] = model_loaded and bool(self._completed_cycles) and not self.scheduler.running
+            tick['fallback'] = lambda: None
         else:
-            # In operation mode, make predictions
-            await self._execute_predictions(thermostat_data, weather_data)
-        
-        # Train model at night (3:00-4:00) if in learning mode
-        training_hour = 3
-        if (current_time.hour == training_hour and self.predictor.learning_mode and 
-            (self._last_training is None or (current_time - self._last_training).days >= 1)):
-            success = await self.hass.async_add_executor_job(self.predictor.train_model)
-            if success:
-                await self.hass.async_add_executor_job(self.predictor.save_model, self._model_path)
-                self._last_training = current_time
+            # In operation mode, thermostats without a planned slot are predicted
+            tick['unplanned'] = self._apply_plan(thermostat_data, weather_data)
+            tick['job'] = bool(tick['unplanned'])
+            rows = list(tick['unplanned'].values())
+            
+            # Heuristic answer if the model misses its deadline
+            def fallback():
+                return PreheatIntervals.point(
+                    self.predictor.heuristic_preheat_times([row['temp_delta'] for row in rows])
+                )
+            
+            tick['fallback'] = fallback
+        tick['seconds'] = time.perf_counter() - begin_start
+        return tick
+    
+    def tick_job(self, tick):
+        """Build training samples or predict unplanned thermostats (runs in the predictor executor)."""
+        if tick['learning']:
+            self._build_training_samples()
+            return None
+        thermostat_ids = list(tick['unplanned'])
+        rows = list(tick['unplanned'].values())
+        return self._predict_batch(thermostat_ids, rows, tick['weather_data'], tick['time'])
+    
+    async def async_finish_tick(self, tick, result):
+        """Store the tick's predictions, run due training and return the coordinator data."""
+        finish_start = time.perf_counter()
+        current_time = tick['time']
+        model_loaded = tick['model_loaded']
+        weather_data = tick['weather_data']
+        if tick['unplanned']:
+            self._store_predictions(tick['unplanned'], weather_data, result)
+        
+        incremental = self.predictor.training_mode == TRAINING_MODE_INCREMENTAL
+        self._ticks += 1
+        
+        # Incremental mode folds new samples in every few ticks, in the
+        # background like training, unless that would queue behind a
+        # training run of this or another entry
+        if (incremental and model_loaded and self.predictor.learning_mode
+                and self._ticks % INCREMENTAL_UPDATE_TICKS == 0
+                and not self.scheduler.running and not self.engine.training_busy):
+            self.scheduler.async_start(
+                current_time, self.predictor.training_data.total_appended, TRAINING_REASON_INCREMENTAL
+            )
+        
+        # Due training starts in the background; the refresh never waits for it
+        self.scheduler.async_check(
+            current_time,
+            self.predictor.training_data.total_appended,
+            enabled=model_loaded and self.predictor.learning_mode,
+        )
+        
+        # Whatever was not spent awaiting an executor or the weather service ran on the event loop
+        tick_seconds = tick['seconds'] + tick['offloaded'] + time.perf_counter() - finish_start
+        self._record_loop_block(tick_seconds - tick['offloaded'] - self._tick_offloaded)
+        self.timers.record('tick', tick_seconds)
+        if self.profiler is not None:
+            self.profiler.tick_finished()
+            if self.profiler.done:
+                self.hass.async_create_task(self.hass.async_add_executor_job(self.profiler.write))
+                self.profiler = None
         
         return {
-            'thermostat_data': thermostat_data,
+            'thermostat_data': tick['thermostat_data'],
             'weather_data': weather_data,
             'anomalies': self.anomalies,
             'learning_mode': self.predictor.learning_mode,
             'is_trained': self.predictor.is_trained,
-            'predictions': self.predictions
+            'predictions': self.predictions,
+            'model_state': self.model_state,
+            'loop_block_ms': dict(self.loop_block_ms),
+            'prediction_cache': {
+                'hits': self.predictor.cache_hits,
+                'misses': self.predictor.cache_misses,
+                'size': len(self.predictor._prediction_cache),
+            }
         }
     
-    async def _collect_thermostat_data(self):
+    def _tuning_due(self, current_time):
+        """Return True if the nightly slot should search forest settings first."""
+        if not self.tuning_enabled:
+            return False
+        tuned_at = self.predictor.tuned_at
+        return tuned_at is None or (current_time - tuned_at).days >= TUNING_INTERVAL_DAYS
+    
+    async def async_train_now(self, reason):
+        """Start a training run and wait for it; returns True if a model was trained and saved."""
+        if self.model_state == MODEL_STATE_LOADING:
+            raise HomeAssistantError("The saved model is still loading, try again shortly")
+        if self.scheduler.running:
+            raise HomeAssistantError("A training run is already in progress")
+        self.scheduler.async_start(datetime.now(), self.predictor.training_data.total_appended, reason)
+        return await self.scheduler.async_join()
+    
+    async def _async_train(self, scheduler):
+        """Tune, train and save the model in the engine's training turn (run by the scheduler)."""
+        cancelled = scheduler.cancel_event
+        # Incremental mode keeps its forest current between runs, so its
+        # scheduled runs only persist it
+        full = (self.predictor.training_mode != TRAINING_MODE_INCREMENTAL
+                or scheduler.reason in (TRAINING_REASON_MANUAL, TRAINING_REASON_IMPORT))
+        async with self.engine.async_training_turn():
+            if scheduler.reason == TRAINING_REASON_INCREMENTAL:
+                trained = self.predictor.is_trained
+                scheduler.set_stage(TRAINING_FITTING)
+                success = await self._run_training_job('incremental', self.predictor.update_incremental)
+                if trained:
+                    # The updated forest is saved by the next scheduled run
+                    return success
+                # Otherwise the first model was fitted: save it like a full run
+            elif full:
+                if scheduler.reason == TRAINING_REASON_WINDOW and self._tuning_due(scheduler.started_at):
+                    scheduler.set_stage(TRAINING_TUNING)
+                    await self._run_training_job('tuning', self.predictor.tune_model, TUNING_BUDGET)
+                if cancelled.is_set():
+                    return False
+                scheduler.set_stage(TRAINING_FITTING)
+                evaluation = self.predictor.last_evaluation
+                success = await self._run_training_job('training', self.predictor.train_model)
+                if (not success and self.predictor.last_evaluation is not evaluation
+                        and not self.predictor.last_evaluation['accepted']):
+                    # The active model is kept; the new scores are saved with it
+                    scheduler.outcome = TRAINING_REJECTED
+                    await self._run_training_job('persistence', self.predictor.save_model, self._model_path)
+                    return False
+            else:
+                success = self.predictor.is_trained
+            if not success or cancelled.is_set():
+                return False
+            scheduler.set_stage(TRAINING_SAVING)
+            await self._run_training_job('persistence', self.predictor.save_model, self._model_path)
+        self.model_state = MODEL_STATE_READY
+        await self.async_replan()
+        return True
+    
+    async def async_rollback(self):
+        """Make the previous model active again and save; returns its version."""
+        if self.scheduler.running:
+            raise HomeAssistantError("A training run is in progress, cancel it first")
+        async with self.engine.async_training_turn():
+            version = await self._run_training_job('rollback', self.predictor.rollback_model)
+            if version is None:
+                raise HomeAssistantError("There is no previous model to roll back to")
+            await self._run_training_job('persistence', self.predictor.save_model, self._model_path)
+        self.model_state = MODEL_STATE_READY
+        await self.async_replan()
+        return version
+    
+    async def _run_training_job(self, stage, func, *args):
+        """Run training work on the executor, timing it; the caller holds the engine's training turn."""
+        with self.timers.measure(stage):
+            return await self.hass.async_add_executor_job(func, *args)
+    
+    @callback
+    def _async_cancel_profile(self):
+        """Drop an unfinished profile, stopping any tracing it started."""
+        if self.profiler is not None:
+            self.profiler.cancel()
+            self.profiler = None
+    
+    @callback
+    def async_start_profile(self, mode, ticks):
+        """Profile the next ticks and return the path the report will be written to."""
+        if self.profiler is not None:
+            raise HomeAssistantError("A profile is already being captured")
+        path = os.path.join(
+            self.hass.config.config_dir, f"smart_heating_predictor_{self.config_entry.entry_id}_{mode}_{datetime.now():%Y%m%d_%H%M%S}.txt"
+        )
+        self.profiler = TickProfiler(mode, ticks, path)
+        self.profiler.start()
+        return path
+    
+    def _record_loop_block(self, seconds):
+        """Record how long the last tick held the event loop."""
+        blocked_ms = max(0.0, seconds * 1000)
+        self.loop_block_ms['last'] = blocked_ms
+        self.loop_block_ms['max'] = max(self.loop_block_ms['max'], blocked_ms)
+    
+    async def _collect_thermostat_data(self, states=None):
         """Collect data from thermostats."""
         data = {}
         for thermostat_id in self.thermostats:
-            state = self.hass.states.get(thermostat_id)
+            state = self._get_state(thermostat_id, states)
             if state:
                 data[thermostat_id] = {
                     'current_temp': float(state.attributes.get('current_temperature', 20)),
                     'target_temp': float(state.attributes.get('temperature', 20)),
                     'temp_delta': float(state.attributes.get('temperature', 20)) - float(state.attributes.get('current_temperature', 20)),
-                    'state': state.state
+                    'state': state.state,
+                    'hvac_action': state.attributes.get('hvac_action')
                 }
         return data
     
-    async def _get_weather_data(self):
+    async def _get_weather_data(self, states=None):
         """Get weather data from sensors or weather entity."""
         outdoor_temp = 15.0
         outdoor_humidity = 50.0
         
         # Try outdoor temperature sensor first
         if self.outdoor_temp_sensor:
-            temp_state = self.hass.states.get(self.outdoor_temp_sensor)
+            temp_state = self._get_state(self.outdoor_temp_sensor, states)
             if temp_state:
                 try:
                     outdoor_temp = float(temp_state.state)
@@ -107,7 +624,7 @@ class SmartHeatingCoordinator(DataUpdateCoordinator):
         
         # Try outdoor humidity sensor
         if self.outdoor_humidity_sensor:
-            humidity_state = self.hass.states.get(self.outdoor_humidity_sensor)
+            humidity_state = self._get_state(self.outdoor_humidity_sensor, states)
             if humidity_state:
                 try:
                     outdoor_humidity = float(humidity_state.state)
@@ -116,85 +633,140 @@ class SmartHeatingCoordinator(DataUpdateCoordinator):
         
         # Fallback to weather entity if sensors not configured
         if not self.outdoor_temp_sensor and self.weather_entity:
-            weather_state = self.hass.states.get(self.weather_entity)
+            weather_state = self._get_state(self.weather_entity, states)
             if weather_state:
                 outdoor_temp = float(weather_state.attributes.get('temperature', outdoor_temp))
                 outdoor_humidity = float(weather_state.attributes.get('humidity', outdoor_humidity))
         
+        # Hourly forecast of the weather entity, fetched at most once per TTL
+        now = datetime.now().timestamp()
+        fetch_start = time.perf_counter()
+        await self.forecast.async_refresh(now)
+        # Waiting on the weather service leaves the event loop free
+        self._tick_offloaded += time.perf_counter() - fetch_start
+        outdoor_forecast = self.forecast.temperatures_at([now + hours * 3600 for hours in FORECAST_HORIZONS])
+        if outdoor_forecast is not None:
+            outdoor_forecast = outdoor_forecast.tolist()
+        
         return {
             'outdoor_temp': outdoor_temp,
-            'outdoor_humidity': outdoor_humidity
+            'outdoor_humidity': outdoor_humidity,
+            'outdoor_forecast': outdoor_forecast
         }
     
-    async def _check_anomalies(self, thermostat_data):
+    async def _check_anomalies(self, thermostat_data, weather_data):
         """Check for anomalies in temperature changes."""
+        # A few float operations per thermostat: runs on the loop, where the
+        # state-change listener updates the same rate tracker
         current_time = datetime.now()
-        
         for thermostat_id, data in thermostat_data.items():
-            current_temp = data['current_temp']
-            
-            # Check if we have previous temperature data
-            if thermostat_id in self.last_temps:
-                last_temp, last_time = self.last_temps[thermostat_id]
-                time_diff = (current_time - last_time).total_seconds() / 60  # minutes
-                
-                if time_diff > 0:
-                    temp_change_rate = (current_temp - last_temp) / time_diff
-                    
-                    # Detect anomaly
-                    if abs(temp_change_rate) > self.predictor.anomaly_threshold:
-                        self.anomalies.append({
-                            'thermostat_id': thermostat_id,
-                            'time': current_time.isoformat(),
-                            'change_rate': temp_change_rate,
-                            'type': 'rapid_change'
-                        })
-            
-            # Update last temperature
-            self.last_temps[thermostat_id] = (current_temp, current_time)
+            heating = is_heating(data['state'], data['hvac_action'])
+            self._observe_temperature(thermostat_id, data['current_temp'], heating, current_time)
         
         # Keep only recent anomalies (last 24 hours)
-        cutoff_time = current_time - timedelta(hours=24)
-        self.anomalies = [
-            a for a in self.anomalies 
-            if datetime.fromisoformat(a['time']) > cutoff_time
-        ]
+        self.anomalies.expire(current_time.timestamp())
     
-    async def _collect_training_data(self, thermostat_data, weather_data):
-        """Collect training data in learning mode."""
-        current_time = datetime.now()
+    def _observe_temperature(self, thermostat_id, current_temp, heating, observed_at):
+        """Feed one reading to the rate tracker; return True if it raised an anomaly."""
+        timestamp = observed_at.timestamp()
+        temp_change_rate = self.rate_tracker.observe(thermostat_id, current_temp, timestamp)
+        if temp_change_rate is None:
+            return False
         
-        for thermostat_id, data in thermostat_data.items():
-            features = self.predictor.collect_features(
-                data,
-                weather_data['outdoor_temp'],
-                weather_data['outdoor_humidity'],
-                data['target_temp'],
-                current_time
+        # Learned per-room baseline; the global threshold only applies while it warms up
+        z_score = self.anomaly_engine.update(thermostat_id, temp_change_rate, heating, self._outdoor_temp)
+        if z_score is None:
+            if abs(temp_change_rate) <= self.predictor.anomaly_threshold:
+                return False
+            anomaly_type = ANOMALY_RAPID_CHANGE
+        elif self.anomaly_engine.is_outlier(z_score, temp_change_rate):
+            anomaly_type = ANOMALY_RATE_OUTLIER
+        else:
+            return False
+        
+        # One report per episode rather than one per reading
+        if timestamp - self._last_anomaly.get(thermostat_id, 0) < ANOMALY_COOLDOWN:
+            return False
+        self._last_anomaly[thermostat_id] = timestamp
+        
+        self.anomalies.add(timestamp, thermostat_id, anomaly_type, temp_change_rate)
+        _LOGGER.info(f"Anomaly on {thermostat_id}: {temp_change_rate:+.1f}°C/5min")
+        return True
+    
+    def _observe_cycle(self, thermostat_id, current_temp, target_temp, heating, state, observed_at):
+        """Advance a thermostat's heating cycle; queue it as a sample once it completes."""
+        cycle = self.cycle_tracker.observe(
+            thermostat_id, observed_at.timestamp(), current_temp, target_temp, heating, state != 'off',
+            self._outdoor_temp, self._outdoor_humidity, self._outdoor_forecast_temps
+        )
+        if cycle is not None and self.predictor.learning_mode:
+            _LOGGER.debug(
+                f"{thermostat_id} heated {cycle.start_temp}->{cycle.target_temp}°C in {cycle.minutes:.0f} min"
             )
-            
-            # Calculate actual heat-on time (simplified)
-            if data['temp_delta'] > 0:
-                estimated_time = abs(data['temp_delta']) * 10  # rough estimate
-                self.predictor.add_training_sample(features, estimated_time)
+            self._completed_cycles.append(cycle)
     
-    async def _execute_predictions(self, thermostat_data, weather_data):
-        """Execute predictions in operation mode."""
-        current_time = datetime.now()
-        
-        for thermostat_id, data in thermostat_data.items():
+    def _build_training_samples(self):
+        """Turn completed heating cycles into samples (runs in the predictor executor)."""
+        # Cycles left queued if this job is skipped are picked up by the next tick
+        while self._completed_cycles:
+            cycle = self._completed_cycles.popleft()
+            # Features describe the room when heating started; the label is the real time taken
             features = self.predictor.collect_features(
-                data,
-                weather_data['outdoor_temp'],
-                weather_data['outdoor_humidity'],
-                data['target_temp'],
-                current_time
+                {'current_temp': cycle.start_temp},
+                cycle.outdoor_temp,
+                cycle.outdoor_humidity,
+                cycle.target_temp,
+                datetime.fromtimestamp(cycle.start),
+                cycle.outdoor_forecast
             )
-            
-            preheat_time = self.predictor.predict_preheat_time(features)
+            self.predictor.score_sample(features, cycle.minutes, cycle.thermostat_id)
+            self.predictor.add_training_sample(features, cycle.minutes, cycle.thermostat_id, cycle.start)
+        # One append per tick keeps the on-disk history current between nightly saves
+        self.predictor.append_history()
+        # The thermal model is cheap enough to follow every new sample
+        self.predictor.fit_thermal()
+    
+    def _apply_plan(self, thermostat_data, weather_data):
+        """Serve scheduled thermostats from the precomputed plan; return the data of the others."""
+        unplanned = {}
+        for thermostat_id, data in thermostat_data.items():
+            entry = self.planner.next_entry(thermostat_id)
+            if entry is None:
+                unplanned[thermostat_id] = data
+                continue
             self.predictions[thermostat_id] = {
-                'preheat_time': preheat_time,
+                'preheat_time': entry.preheat_minutes,
+                'preheat_start': entry.start.isoformat(),
+                'next_slot': entry.slot.isoformat(),
+                'current_temp': data['current_temp'],
+                'target_temp': entry.target_temp,
+                'outdoor_temp': weather_data['outdoor_temp'],
+                **entry.interval
+            }
+        return unplanned
+    
+    def _store_predictions(self, thermostat_data, weather_data, intervals):
+        """Record the predictions of unplanned thermostats."""
+        preheat_times = self.predictor.preheat_times(intervals)
+        for index, thermostat_id in enumerate(thermostat_data):
+            data = thermostat_data[thermostat_id]
+            self.predictions[thermostat_id] = {
+                'preheat_time': float(preheat_times[index]),
                 'current_temp': data['current_temp'],
                 'target_temp': data['target_temp'],
-                'outdoor_temp': weather_data['outdoor_temp']
+                'outdoor_temp': weather_data['outdoor_temp'],
+                **intervals.attributes(index)
             }
+    
+    def _predict_batch(self, thermostat_ids, rows, weather_data, current_time):
+        """Build one feature matrix and predict it (runs in the predictor executor)."""
+        with self.timers.measure('features'):
+            features = self.predictor.collect_feature_matrix(
+                rows,
+                weather_data['outdoor_temp'],
+                weather_data['outdoor_humidity'],
+                current_time,
+                weather_data['outdoor_forecast']
+            )
+        with self.timers.measure('inference'):
+            return self.predictor.predict_preheat_intervals(features, thermostat_ids)
@@ -0,0 +1,92 @@
+"""Heating cycle tracking for Smart Heating Predictor"""
+from collections import namedtuple
+
+# A completed cycle: the conditions when heating towards the target started
+# and the minutes it took to get there
+HeatingCycle = namedtuple(
+    'HeatingCycle',
+    ['thermostat_id', 'start', 'start_temp', 'target_temp', 'outdoor_temp', 'outdoor_humidity',
+     'outdoor_forecast', 'minutes'],
+)
+
+
+def is_heating(state, hvac_action):
+    """Return True if a climate entity is actively heating."""
+    if hvac_action is not None:
+        return hvac_action == 'heating'
+    return state == 'heat'
+
+
+class CycleTracker:
+    """Per-thermostat state machines turning readings into heat-on-time labels.
+
+    A cycle starts when the setpoint rises, or heating switches on, with
+    the room at least min_rise below the target. It completes when the
+    room gets within tolerance of the target, yielding the minutes taken.
+    Cycles are dropped when the setpoint is lowered, the thermostat is
+    switched off, readings stop for max_gap seconds, or the cycle runs past
+    max_minutes (longer labels are filtered out by training anyway). Only
+    the open cycle and last reading are kept per thermostat.
+    """
+
+    def __init__(self, min_rise=0.2, tolerance=0.1, max_minutes=180, max_gap=1800):
+        """Initialize."""
+        self.min_rise = min_rise
+        self.tolerance = tolerance
+        self.max_minutes = max_minutes
+        self.max_gap = max_gap
+        # thermostat id -> [last timestamp, last target, last heating, open cycle or None]
+        self._state = {}
+        self.completed = 0
+        self.abandoned = 0
+
+    def observe(self, thermostat_id, timestamp, current_temp, target_temp, heating, active,
+                outdoor_temp, outdoor_humidity, outdoor_forecast=None):
+        """Feed one reading; return a HeatingCycle when it completes one, else None.
+
+        active is False while the thermostat is switched off; the weather
+        arguments are only kept when the reading starts a cycle.
+        """
+        state = self._state.get(thermostat_id)
+        if state is None:
+            self._state[thermostat_id] = [timestamp, target_temp, heating, None]
+            return None
+
+        last_timestamp, last_target, last_heating, cycle = state
+        if timestamp < last_timestamp:
+            # Late tick or event; the newer reading already moved the machine on
+            return None
+        state[0] = timestamp
+        state[1] = target_temp
+        state[2] = heating
+
+        if cycle is not None:
+            if (not active or target_temp < cycle[2] - self.tolerance
+                    or timestamp - last_timestamp > self.max_gap
+                    or timestamp - cycle[0] > self.max_minutes * 60):
+                state[3] = None
+                self.abandoned += 1
+                return None
+            if target_temp > cycle[2]:
+                # Setpoint raised again mid-cycle: keep the start, chase the new target
+                cycle[2] = target_temp
+            if current_temp >= cycle[2] - self.tolerance:
+                state[3] = None
+                self.completed += 1
+                return HeatingCycle(
+                    thermostat_id, cycle[0], cycle[1], cycle[2], cycle[3], cycle[4], cycle[5],
+                    (timestamp - cycle[0]) / 60,
+                )
+            return None
+
+        started = target_temp > last_target or (heating and not last_heating)
+        if (active and started and outdoor_temp is not None
+                and round(target_temp - current_temp, 2) >= self.min_rise):
+            # [start timestamp, start temperature, target, outdoor temp, outdoor humidity, forecast]
+            state[3] = [timestamp, current_temp, target_temp, outdoor_temp, outdoor_humidity, outdoor_forecast]
+        return None
+
+    def forget(self, thermostat_id):
+        """Drop the state of a thermostat."""
+        self._state.pop(thermostat_id, None)
+
@@ -0,0 +1,106 @@
+"""Diagnostics support for Smart Heating Predictor"""
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+
+
+def _history_stats(history):
+    """Return day count, records and bytes of the sample history (reads the directory)."""
+    if history is None:
+        return {'days': 0, 'samples': 0, 'bytes': 0}
+    return {'days': len(history.days()), 'samples': len(history), 'bytes': history.nbytes}
+
+
+def _thermal_coefficients(pair):
+    """Return a (gain, loss) pair in heater °C/h and time-constant hours."""
+    if pair is None:
+        return None
+    gain, loss = pair
+    return {'gain_c_per_hour': gain * 60, 'time_constant_hours': 1 / (loss * 60) if loss > 0 else None}
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict:
+    """Return timings, model and storage details of a config entry."""
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    predictor = coordinator.predictor
+    executor = coordinator.executor
+    compiled = predictor.compiled
+    return {
+        'options': dict(entry.options),
+        'timings_ms': coordinator.timers.summary(),
+        'loop_block_ms': dict(coordinator.loop_block_ms),
+        'executor': {
+            'pending': executor.pending,
+            'timeouts': executor.timeouts,
+            'rejected': executor.rejected,
+        },
+        'engine': {
+            'entries': len(coordinator.engine.coordinators),
+            'ticks': coordinator.engine.ticks,
+            'training_pool_running': coordinator.engine.training_pool.running,
+            'training_pool_starts': coordinator.engine.training_pool.started,
+        },
+        'model': {
+            'state': coordinator.model_state,
+            'is_trained': predictor.is_trained,
+            'learning_mode': predictor.learning_mode,
+            'training_mode': predictor.training_mode,
+            'params': predictor.model_params,
+            'tuned_at': predictor.tuned_at.isoformat() if predictor.tuned_at else None,
+            'trees': compiled.n_trees if compiled else 0,
+            'nodes': len(compiled.feature) if compiled else 0,
+            'max_depth': compiled.max_depth if compiled else 0,
+            'room_models': sorted(predictor.compiled_shards),
+            'version': predictor.active.version if predictor.active else None,
+            'previous_version': predictor.previous.version if predictor.previous else None,
+            'last_evaluation': predictor.last_evaluation,
+            'bytes': predictor.model_bytes,
+        },
+        'training': {
+            'state': coordinator.scheduler.state,
+            'reason': coordinator.scheduler.reason,
+            'jitter_minutes': coordinator.scheduler.jitter.total_seconds() / 60,
+            'new_samples': coordinator.scheduler.new_samples,
+            'load': coordinator.scheduler.load,
+            'last_run': coordinator.scheduler.last_run.isoformat() if coordinator.scheduler.last_run else None,
+            'last_result': coordinator.scheduler.last_result,
+            'last_duration_s': coordinator.scheduler.last_duration,
+        },
+        'thermal': {
+            'pooled': _thermal_coefficients(predictor.thermal.pooled),
+            'rooms': {
+                room: {**_thermal_coefficients(pair), 'samples': predictor.thermal.samples.get(room, 0)}
+                for room, pair in predictor.thermal.rooms.items()
+            },
+            'default_predictor': predictor.default_predictor,
+            'room_predictors': dict(predictor.room_predictors),
+            'blend_errors': dict(predictor.blend_errors),
+        },
+        'samples': {
+            'buffered': len(predictor.training_data),
+            'capacity': predictor.training_data.capacity,
+            'buffer_bytes': predictor.training_data.nbytes,
+            'history': await hass.async_add_executor_job(_history_stats, predictor.history),
+        },
+        'prediction_cache': {
+            'hits': predictor.cache_hits,
+            'misses': predictor.cache_misses,
+            'size': len(predictor._prediction_cache),
+        },
+        'cycles': {
+            'completed': coordinator.cycle_tracker.completed,
+            'abandoned': coordinator.cycle_tracker.abandoned,
+            'queued': len(coordinator._completed_cycles),
+        },
+        'forecast': {
+            'fetches': coordinator.forecast.fetches,
+            'failures': coordinator.forecast.failures,
+            'hours': len(coordinator.forecast.times),
+        },
+        'plan': {
+            'entries': len(coordinator.planner.timeline),
+            'planned_at': coordinator.planner.planned_at.isoformat() if coordinator.planner.planned_at else None,
+        },
+        'anomalies': len(coordinator.anomalies),
+    }
@@ -0,0 +1,190 @@
+"""Engine shared by every Smart Heating Predictor config entry"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_track_time_interval
+
+from .const import EXECUTOR_MAX_PENDING, INFERENCE_TIMEOUT
+from .executor import PredictorExecutor
+from .forecast import ForecastCache
+
+_LOGGER = logging.getLogger(__name__)
+
+# One coalesced refresh of every entry per interval
+TICK_INTERVAL = timedelta(minutes=5)
+
+
+class TrainingPool:
+    """Spawned worker processes shared by the training jobs of every entry.
+
+    Started on first use. EngineManager shuts it down once no training job
+    needs it, so the workers don't hold memory between nightly passes.
+    """
+
+    def __init__(self, workers):
+        """Initialize."""
+        self.workers = workers
+        self.started = 0
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        """Return True while worker processes exist."""
+        return self._pool is not None
+
+    def get(self):
+        """Return the process pool, starting it if needed (called from training threads)."""
+        with self._lock:
+            if self._pool is None:
+                context = multiprocessing.get_context("spawn")
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+                self.started += 1
+            return self._pool
+
+    def shutdown(self):
+        """Stop the workers (runs in the executor)."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+
+class EngineManager:
+    """Predictor executor, training pool, forecasts and refresh timer of all entries.
+
+    Each entry keeps its own coordinator, predictor and model directory.
+    Every TICK_INTERVAL the engine refreshes all of them in one pass: each
+    entity is read from the state machine once, each entry prepares its
+    tick, one executor job builds the samples and predictions of every
+    entry, and each entry then finishes its tick and notifies its
+    entities. Training of all entries takes turns, sharing the training
+    pool.
+    """
+
+    def __init__(self, hass):
+        """Initialize."""
+        self.hass = hass
+        self.coordinators = {}
+        self.executor = PredictorExecutor(max_pending=EXECUTOR_MAX_PENDING)
+        self.training_pool = TrainingPool(os.cpu_count() or 1)
+        self.forecasts = {}
+        self.ticks = 0
+        self._training_lock = asyncio.Lock()
+        self._training_users = 0
+        self._unsub_tick = None
+
+    def forecast_cache(self, weather_entity, ttl):
+        """Return the forecast cache of a weather entity, shared by the entries using it."""
+        cache = self.forecasts.get(weather_entity)
+        if cache is None:
+            cache = self.forecasts[weather_entity] = ForecastCache(self.hass, weather_entity, ttl=ttl)
+        return cache
+
+    @callback
+    def async_register(self, coordinator):
+        """Add an entry's coordinator to the coalesced refresh."""
+        self.coordinators[coordinator.config_entry.entry_id] = coordinator
+        self.executor.max_pending = EXECUTOR_MAX_PENDING * len(self.coordinators)
+        if self._unsub_tick is None:
+            self._unsub_tick = async_track_time_interval(self.hass, self._async_tick, TICK_INTERVAL)
+
+    async def async_unregister(self, coordinator):
+        """Remove an entry; returns True once no entry is left and everything was shut down."""
+        self.coordinators.pop(coordinator.config_entry.entry_id, None)
+        if self.coordinators:
+            self.executor.max_pending = EXECUTOR_MAX_PENDING * len(self.coordinators)
+            return False
+        if self._unsub_tick is not None:
+            self._unsub_tick()
+            self._unsub_tick = None
+        self.executor.shutdown()
+        if self.training_pool.running:
+            await self.hass.async_add_executor_job(self.training_pool.shutdown)
+        return True
+
+    @asynccontextmanager
+    async def _training_session(self):
+        """Keep the training pool up while any holder may train; stop it after the last one."""
+        self._training_users += 1
+        try:
+            yield
+        finally:
+            self._training_users -= 1
+            if not self._training_users and self.training_pool.running:
+                await self.hass.async_add_executor_job(self.training_pool.shutdown)
+
+    @property
+    def training_busy(self):
+        """Return True while some entry holds the training turn."""
+        return self._training_lock.locked()
+
+    @asynccontextmanager
+    async def async_training_turn(self):
+        """Wait for the training turn; training work of one entry at a time runs inside it."""
+        async with self._training_session():
+            async with self._training_lock:
+                yield
+
+    def _read_states(self, coordinators):
+        """Read every entity any entry needs once."""
+        entity_ids = set()
+        for coordinator in coordinators:
+            entity_ids.update(coordinator.entity_ids())
+        return {entity_id: self.hass.states.get(entity_id) for entity_id in entity_ids}
+
+    @staticmethod
+    def _run_tick_jobs(jobs):
+        """Run the executor part of every entry's tick (runs in the predictor executor)."""
+        results = []
+        for coordinator, tick in jobs:
+            try:
+                results.append(coordinator.tick_job(tick))
+            except Exception as e:
+                _LOGGER.error(f"Tick of {coordinator.config_entry.entry_id} failed: {e}")
+                results.append(tick['fallback']())
+        return results
+
+    async def _async_tick(self, now=None):
+        """Refresh every entry in one pass."""
+        self.ticks += 1
+        coordinators = list(self.coordinators.values())
+        states = self._read_states(coordinators)
+        current_time = datetime.now()
+
+        ticks = []
+        for coordinator in coordinators:
+            try:
+                ticks.append((coordinator, await coordinator.async_begin_tick(current_time, states)))
+            except Exception as e:
+                coordinator.async_set_update_error(e)
+
+        jobs = [(coordinator, tick) for coordinator, tick in ticks if tick['job']]
+        results = {}
+        if jobs:
+            start = time.perf_counter()
+            outcomes = await self.executor.async_run(
+                self._run_tick_jobs, jobs,
+                timeout=INFERENCE_TIMEOUT,
+                fallback=lambda: [tick['fallback']() for _, tick in jobs]
+            )
+            waited = time.perf_counter() - start
+            for (coordinator, tick), outcome in zip(jobs, outcomes):
+                tick['offloaded'] += waited
+                results[coordinator.config_entry.entry_id] = outcome
+
+        for coordinator, tick in ticks:
+            try:
+                data = await coordinator.async_finish_tick(tick, results.get(coordinator.config_entry.entry_id))
+            except Exception as e:
+                coordinator.async_set_update_error(e)
+                continue
+            coordinator.async_set_updated_data(data)
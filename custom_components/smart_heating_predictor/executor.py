@@ -0,0 +1,66 @@
+"""Bounded executor for CPU-bound predictor work"""
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class PredictorExecutor:
+    """Dedicated thread pool with per-call timeouts and a pending-job limit.
+
+    Keeps forest evaluation, feature building and anomaly scoring off the
+    event loop and out of Home Assistant's shared executor. A call that
+    misses its deadline, or finds the pool saturated, returns the caller's
+    fallback instead. Untimed calls are jobs the caller cannot do without
+    (model load, history import), so they queue behind the rest instead.
+    """
+
+    def __init__(self, max_workers=1, max_pending=4):
+        """Initialize."""
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="smart_heating_predictor"
+        )
+        self.max_pending = max_pending
+        self.pending = 0
+        self.timeouts = 0
+        self.rejected = 0
+
+    async def async_run(self, func, *args, timeout, fallback=None):
+        """Run func(*args) in the pool, returning fallback() on timeout or overload.
+
+        A timeout of None waits for the job however long it takes, and is
+        queued even when the pool is saturated.
+        """
+        if timeout is not None and self.pending >= self.max_pending:
+            self.rejected += 1
+            _LOGGER.warning(f"Predictor executor saturated, skipping {func.__name__}")
+            return self._fallback(fallback, func)
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, func, *args)
+        self.pending += 1
+        future.add_done_callback(self._job_done)
+
+        try:
+            # Shield so a timed-out job keeps counting as pending until its thread finishes
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            _LOGGER.warning(f"{func.__name__} missed its {timeout}s deadline")
+            return self._fallback(fallback, func)
+
+    def _job_done(self, future):
+        self.pending -= 1
+        if not future.cancelled() and future.exception() is not None:
+            _LOGGER.debug(f"Predictor job failed: {future.exception()}")
+
+    @staticmethod
+    def _fallback(fallback, func):
+        if fallback is None:
+            raise TimeoutError(f"{func.__name__} did not complete")
+        return fallback()
+
+    def shutdown(self):
+        """Stop the pool without waiting for running jobs."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,93 @@
+"""Weather forecast cache for Smart Heating Predictor"""
+import asyncio
+import logging
+
+import numpy as np
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.util import dt as dt_util
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ForecastCache:
+    """Hourly outdoor temperature forecast of a weather entity, refreshed at most once per ttl.
+
+    The forecast is kept as two arrays (epoch seconds, °C) and interpolated
+    onto any times with np.interp; times past either end take the nearest
+    forecast value. Entries sharing the cache while a fetch is in flight
+    wait for that fetch instead of starting another.
+    """
+
+    def __init__(self, hass, weather_entity, ttl=1800):
+        """Initialize."""
+        self.hass = hass
+        self.weather_entity = weather_entity
+        self.ttl = ttl
+        self.times = np.zeros(0)
+        self.temperatures = np.zeros(0)
+        self.fetched_at = None
+        self._pending = None
+        self.fetches = 0
+        self.failures = 0
+
+    def __bool__(self):
+        """Return True if a forecast is available."""
+        return len(self.times) > 0
+
+    async def async_refresh(self, now):
+        """Fetch the hourly forecast if the cached one is older than the ttl at now (epoch seconds)."""
+        if not self.weather_entity:
+            return
+        if self._pending is None:
+            if self.fetched_at is not None and now - self.fetched_at < self.ttl:
+                return
+            self._pending = self.hass.async_create_task(self._async_update(now))
+        # Shielded: a cancelled caller must not cancel the fetch others wait for
+        await asyncio.shield(self._pending)
+
+    async def _async_update(self, now):
+        """Fetch and store the forecast; fetched_at is only set once the attempt is over."""
+        try:
+            forecast = await self._async_fetch()
+        except HomeAssistantError as e:
+            self.failures += 1
+            _LOGGER.debug(f"Forecast for {self.weather_entity} unavailable: {e}")
+            # Failed fetches also wait for the ttl so a broken entity isn't polled every tick
+            self.fetched_at = now
+            return
+        finally:
+            self._pending = None
+        self.fetches += 1
+        self.fetched_at = now
+
+        times = []
+        temperatures = []
+        for item in forecast or []:
+            when = dt_util.parse_datetime(str(item.get('datetime')))
+            temperature = item.get('temperature')
+            if when is None or temperature is None:
+                continue
+            times.append(when.timestamp())
+            temperatures.append(float(temperature))
+        order = np.argsort(times)
+        self.times = np.asarray(times, dtype=float)[order]
+        self.temperatures = np.asarray(temperatures, dtype=float)[order]
+
+    async def _async_fetch(self):
+        """Return the list of hourly forecast dicts."""
+        if self.hass.services.has_service("weather", "get_forecasts"):
+            response = await self.hass.services.async_call(
+                "weather", "get_forecasts",
+                {"entity_id": self.weather_entity, "type": "hourly"},
+                blocking=True, return_response=True,
+            )
+            return response.get(self.weather_entity, {}).get('forecast')
+        # Older Home Assistant versions expose the forecast as an attribute
+        state = self.hass.states.get(self.weather_entity)
+        return state.attributes.get('forecast') if state else None
+
+    def temperatures_at(self, timestamps):
+        """Interpolate the forecast onto epoch timestamps; None without a forecast."""
+        if not self:
+            return None
+        return np.interp(timestamps, self.times, self.temperatures)
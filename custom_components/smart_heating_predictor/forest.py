@@ -0,0 +1,96 @@
+"""Flat-array random forest inference for Smart Heating Predictor"""
+import numpy as np
+
+
+class CompiledForest:
+    """A fitted forest exported to flat NumPy arrays, with the scaler folded in.
+
+    Nodes of all trees are stored back to back; leaves point to themselves,
+    so every row walks max_depth steps through every tree in one vectorized
+    loop. Thresholds are moved into raw feature space
+    (x_scaled <= t  <=>  x <= t * scale + mean), so prediction needs
+    neither the scaler nor scikit-learn.
+    """
+
+    ARRAYS = ('feature', 'threshold', 'left', 'right', 'value', 'roots', 'max_depth')
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth):
+        """Initialize."""
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+
+    @classmethod
+    def from_estimator(cls, model, scaler=None):
+        """Export a fitted RandomForestRegressor (and the StandardScaler feeding it)."""
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            nodes = np.arange(tree.node_count)
+            leaf = tree.children_left < 0
+            feature = np.where(leaf, 0, tree.feature).astype(np.int32)
+            threshold = np.where(leaf, 0.0, tree.threshold)
+            if scaler is not None:
+                threshold = np.where(
+                    leaf, 0.0, threshold * scaler.scale_[feature] + scaler.mean_[feature]
+                )
+            features.append(feature)
+            thresholds.append(threshold)
+            lefts.append(np.where(leaf, nodes, tree.children_left) + offset)
+            rights.append(np.where(leaf, nodes, tree.children_right) + offset)
+            values.append(tree.value[:, 0, 0])
+            roots.append(offset)
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+        return cls(
+            np.concatenate(features),
+            np.concatenate(thresholds),
+            np.concatenate(lefts).astype(np.int32),
+            np.concatenate(rights).astype(np.int32),
+            np.concatenate(values),
+            np.array(roots, dtype=np.int32),
+            max_depth,
+        )
+
+    @property
+    def n_trees(self):
+        """Return the number of trees."""
+        return len(self.roots)
+
+    def tree_predictions(self, X):
+        """Return every tree's prediction for every row, shape (rows, trees)."""
+        X = np.asarray(X, dtype=np.float64)
+        nodes = np.repeat(self.roots[None, :], len(X), axis=0)
+        rows = np.arange(len(X))[:, None]
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return self.value[nodes]
+
+    def predict(self, X):
+        """Return the forest's mean prediction per row."""
+        return self.tree_predictions(X).mean(axis=1)
+
+    def predict_distribution(self, X, quantiles):
+        """Return the mean, standard deviation and quantiles of the trees' predictions per row.
+
+        All three come from one tree_predictions pass; quantiles has shape
+        (rows, len(quantiles)).
+        """
+        trees = self.tree_predictions(X)
+        return trees.mean(axis=1), trees.std(axis=1), np.quantile(trees, quantiles, axis=1).T
+
+    def to_arrays(self):
+        """Return the arrays to persist, by name."""
+        return {name: np.asarray(getattr(self, name)) for name in self.ARRAYS}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Rebuild a forest from to_arrays() output."""
+        return cls(*(arrays[name] for name in cls.ARRAYS))
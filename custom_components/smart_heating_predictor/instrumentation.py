@@ -0,0 +1,158 @@
+"""Timing and profiling instrumentation for Smart Heating Predictor"""
+import cProfile
+import io
+import logging
+import os
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+
+_LOGGER = logging.getLogger(__name__)
+
+PROFILE_CPROFILE = "cprofile"
+PROFILE_TRACEMALLOC = "tracemalloc"
+PROFILE_MODES = [PROFILE_CPROFILE, PROFILE_TRACEMALLOC]
+
+# Lines of the text reports
+PROFILE_TOP = 40
+
+
+class StageTimers:
+    """Rolling window of the most recent durations of each named stage.
+
+    Recording is one array write, cheap enough for the per-tick path;
+    percentiles are only computed when a summary is read.
+    """
+
+    def __init__(self, window=288):
+        """Initialize."""
+        self.window = window
+        self._durations = {}
+        self._counts = {}
+
+    def record(self, stage, seconds):
+        """Add one duration of a stage."""
+        durations = self._durations.get(stage)
+        if durations is None:
+            durations = self._durations[stage] = np.zeros(self.window)
+            self._counts[stage] = 0
+        durations[self._counts[stage] % self.window] = seconds
+        self._counts[stage] += 1
+
+    @contextmanager
+    def measure(self, stage):
+        """Record how long the with-block takes as one duration of stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def _window(self, stage):
+        count = self._counts.get(stage, 0)
+        return self._durations[stage][:min(count, self.window)] if count else np.zeros(0)
+
+    def last_ms(self, stage):
+        """Return the latest duration of a stage in milliseconds, or None."""
+        count = self._counts.get(stage, 0)
+        if not count:
+            return None
+        return float(self._durations[stage][(count - 1) % self.window] * 1000)
+
+    def percentile_ms(self, stage, q):
+        """Return the q-th percentile over the window in milliseconds, or None."""
+        durations = self._window(stage)
+        return float(np.percentile(durations, q) * 1000) if len(durations) else None
+
+    def summary(self):
+        """Return {stage: count, last/p50/p95/max in ms} for every recorded stage."""
+        summary = {}
+        for stage in sorted(self._durations):
+            durations = self._window(stage) * 1000
+            summary[stage] = {
+                'count': self._counts[stage],
+                'last_ms': self.last_ms(stage),
+                'p50_ms': float(np.percentile(durations, 50)),
+                'p95_ms': float(np.percentile(durations, 95)),
+                'max_ms': float(durations.max()),
+            }
+        return summary
+
+
+class TickProfiler:
+    """Profile of the next few coordinator ticks, written as a text report.
+
+    cProfile mode profiles the event-loop side of each tick only, so work
+    handed to executors shows up as time spent awaiting it. tracemalloc
+    mode traces every allocation from start to the last tick and reports
+    the allocations still alive and the peak.
+    """
+
+    def __init__(self, mode, ticks, path):
+        """Initialize."""
+        self.mode = mode
+        self.ticks = ticks
+        self.path = path
+        self.ticks_seen = 0
+        self._profile = None
+        self._started_tracing = False
+        self._snapshot = None
+        self._peak = 0
+
+    @property
+    def done(self):
+        """Return True once every requested tick was captured."""
+        return self.ticks_seen >= self.ticks
+
+    def start(self):
+        """Start capturing."""
+        if self.mode == PROFILE_CPROFILE:
+            self._profile = cProfile.Profile()
+        elif not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+            self._started_tracing = True
+
+    def tick_started(self):
+        """Mark the start of a tick."""
+        if self._profile is not None:
+            self._profile.enable()
+
+    def tick_finished(self):
+        """Mark the end of a tick; the last one takes the tracemalloc snapshot."""
+        if self._profile is not None:
+            self._profile.disable()
+        self.ticks_seen += 1
+        if self.done and self.mode == PROFILE_TRACEMALLOC:
+            self._snapshot = tracemalloc.take_snapshot()
+            self._peak = tracemalloc.get_traced_memory()[1]
+            if self._started_tracing:
+                tracemalloc.stop()
+
+    def cancel(self):
+        """Stop capturing without writing a report."""
+        if self._profile is not None:
+            self._profile.disable()
+        if self._started_tracing and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def write(self):
+        """Write the report (and the raw .prof for cProfile); runs in the executor."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        report = io.StringIO()
+        report.write(f"Smart Heating Predictor {self.mode} profile of {self.ticks_seen} ticks\n\n")
+        if self._profile is not None:
+            self._profile.dump_stats(f"{os.path.splitext(self.path)[0]}.prof")
+            stats = pstats.Stats(self._profile, stream=report)
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(PROFILE_TOP)
+        else:
+            statistics = self._snapshot.statistics('lineno')
+            report.write(f"Traced now: {sum(s.size for s in statistics) / 2**20:.1f} MiB, "
+                         f"peak: {self._peak / 2**20:.1f} MiB\n\n")
+            for statistic in statistics[:PROFILE_TOP]:
+                report.write(f"{statistic}\n")
+        with open(self.path, 'w') as f:
+            f.write(report.getvalue())
+        _LOGGER.info(f"Profile written to {self.path}")
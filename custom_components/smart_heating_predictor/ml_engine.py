@@ -1,28 +1,254 @@
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.preprocessing import StandardScaler
 import pickle
 import logging
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
 from datetime import datetime
 
+from .const import PREDICTOR_BLEND, PREDICTOR_FOREST, PREDICTOR_THERMAL, TRAINING_MODE_FULL
+from .forest import CompiledForest
+from .model_store import (
+    HISTORY_DIR,
+    PREVIOUS_DIR,
+    ModelStore,
+    quantize_thresholds,
+    sample_dtype,
+)
+from .sample_buffer import SampleBuffer
+from .thermal_model import ThermalModel
+from .tuning import choose_parameters, search_parameters
+
 _LOGGER = logging.getLogger(__name__)
 
+FEATURE_NAMES = [
+    'outdoor_temp',
+    'outdoor_humidity',
+    'target_temp',
+    'current_temp',
+    'temp_delta',
+    'hour',
+    'weekday',
+    'month',
+    'is_daytime',
+    'outdoor_temp_1h',
+    'outdoor_temp_2h',
+]
+# Hours ahead of the outdoor_temp_{h}h forecast features
+FORECAST_HORIZONS = (1, 2)
+
+# Prediction cache: rows are rounded to these steps (in feature units, 1
+# for unlisted features) and predicted from the rounded values, so rows
+# that only differ below sensor resolution share one cache entry
+FEATURE_QUANTUM = {
+    'outdoor_temp': 1.0,
+    'outdoor_humidity': 10,
+    'target_temp': 0.1,
+    'current_temp': 0.1,
+    'temp_delta': 0.1,
+    'outdoor_temp_1h': 1.0,
+    'outdoor_temp_2h': 1.0,
+}
+PREDICTION_CACHE_SIZE = 4096
+
+# Quantiles of the trees' predictions computed, and cached, with every
+# forest prediction
+PREDICTION_QUANTILES = (0.1, 0.5, 0.8, 0.9)
+MAX_TRAINING_SAMPLES = 10000
+
+# Full refits read the on-disk history: up to this many samples drawn
+# uniformly from this many days back from the newest sample
+HISTORY_TRAINING_DAYS = 365
+HISTORY_TRAINING_SAMPLES = 20000
+
+# Forest settings until a tuning run picks others
+DEFAULT_MODEL_PARAMS = {'n_estimators': 50, 'max_depth': 10, 'min_samples_leaf': 1}
+
+# Tuning needs enough samples for every time-ordered fold to be meaningful
+TUNING_MIN_SAMPLES = 200
+
+# Incremental mode: each update adds a few trees fitted on the new samples
+# plus a replay sample of older ones, and drops the oldest trees
+INCREMENTAL_TREES_PER_UPDATE = 5
+INCREMENTAL_MIN_NEW_SAMPLES = 20
+INCREMENTAL_WINDOW_SAMPLES = 2000
+
+# Per-room models: shards need this many valid samples, otherwise the
+# room is served by the global model
+SHARD_MIN_SAMPLES = 50
+
+# Blended rooms weigh the forest and the thermal model by the inverse of
+# their mean squared errors on the room's newest heating cycles, each
+# scored before it is learned (exponential average with this weight)
+BLEND_ERROR_WEIGHT = 0.05
+
+# Shadow evaluation: a retrained model is first fitted without the newest
+# samples the active model has not learned (this fraction of all samples,
+# within the bounds) and only replaces the active one if its error on them
+# is within SWAP_TOLERANCE of the active one's. With fewer unseen samples
+# than HOLDOUT_MIN_SAMPLES there is nothing fair to compare on.
+HOLDOUT_FRACTION = 0.1
+HOLDOUT_MIN_SAMPLES = 30
+HOLDOUT_MAX_SAMPLES = 2000
+SWAP_TOLERANCE = 0.02
+
+
+class PreheatIntervals(namedtuple('PreheatIntervals', ['mean', 'spread', 'quantiles'])):
+    """Preheat minutes per row: the mean, the spread (standard deviation) of
+    the trees' predictions and their PREDICTION_QUANTILES, shape (rows, quantiles)."""
+
+    __slots__ = ()
+
+    def quantile(self, level):
+        """Return the minutes of one of PREDICTION_QUANTILES per row."""
+        return self.quantiles[:, PREDICTION_QUANTILES.index(level)]
+
+    def attributes(self, index):
+        """Return one row as preheat_mean, preheat_spread and preheat_p10... entries."""
+        attributes = {
+            'preheat_mean': round(float(self.mean[index]), 1),
+            'preheat_spread': round(float(self.spread[index]), 1),
+        }
+        for level, minutes in zip(PREDICTION_QUANTILES, self.quantiles[index]):
+            attributes[f"preheat_p{round(level * 100)}"] = round(float(minutes), 1)
+        return attributes
+
+    @classmethod
+    def point(cls, minutes):
+        """Return intervals of zero width around point predictions."""
+        minutes = np.asarray(minutes, dtype=float)
+        return cls(minutes, np.zeros(len(minutes)), np.repeat(minutes[:, None], len(PREDICTION_QUANTILES), axis=1))
+
+
+# A trained model and everything predictions need from it. Training,
+# rollback and loading replace the whole version in one assignment, so a
+# prediction never mixes one version's forest with another's scaler or
+# room models. estimator_store is set while only the compiled forests are
+# loaded; the scikit-learn estimators are read from it once needed.
+# seen_until is the timestamp of the newest sample the version learned.
+ModelVersion = namedtuple('ModelVersion', [
+    'version', 'model', 'scaler', 'shards', 'compiled', 'compiled_shards', 'estimator_store',
+    'trained_at', 'holdout_mae', 'seen_until',
+])
+
+
+def _new_scaler():
+    # scikit-learn is imported on first use, from an executor thread
+    from sklearn.preprocessing import StandardScaler
+    return StandardScaler()
+
+
+def fit_forest(X, y, params=None):
+    """Fit a scaler and forest on one sample set; runs in training worker processes."""
+    scaler = _new_scaler()
+    model = HeatingPredictor._new_model(params)
+    model.fit(scaler.fit_transform(X), y)
+    return model, scaler
+
+
 class HeatingPredictor:
     def __init__(self, hass, data_dir):
         self.hass = hass
         self.data_dir = data_dir
-        self.model = RandomForestRegressor(n_estimators=50, max_depth=10, random_state=42)
-        self.scaler = StandardScaler()
-        self.training_data = []
+        self.training_data = SampleBuffer(len(FEATURE_NAMES), MAX_TRAINING_SAMPLES)
         self.is_trained = False
         self.learning_mode = True
         self.anomaly_threshold = 2.5
+        self.training_mode = TRAINING_MODE_FULL
+        # Forest settings used by every fit, replaced by tune_model
+        self.model_params = dict(DEFAULT_MODEL_PARAMS)
+        self.tuned_at = None
+        self.tuning_results = []
+        self._incremental_seen = 0
+        self._incremental_round = 0
+        # Append-only sample history of the model directory, set by load/save
+        self.history = None
+        self._history_appended = 0
+        # Size of the saved model files, updated by save and load
+        self.model_bytes = 0
+        self._history_lock = threading.Lock()
+        self.float32_thresholds = True
+        # Per-room models: thermostat id -> shard key (empty = global model only)
+        self.shard_keys = {}
+        # Created by training or loading (sklearn is not imported until then):
+        # the ModelVersion predictions use, and the one it replaced, kept
+        # for rollback
+        self.active = None
+        self.previous = None
+        # Highest version id handed out, and the id of the model saved in
+        # the model directory
+        self.model_version = 0
+        self._saved_version = None
+        # Scores of the last shadow evaluation
+        self.last_evaluation = None
+        # RC thermal model, refitted on the buffer whenever samples arrive;
+        # rooms pick the forest, the thermal model or a blend of both
+        self.thermal = ThermalModel()
+        self.default_predictor = PREDICTOR_FOREST
+        self.room_predictors = {}
+        # thermostat id -> [forest, thermal] mean squared error, for blends
+        self.blend_errors = {}
+        # Preheat starts use this quantile of PREDICTION_QUANTILES, or the
+        # mean when None
+        self.preheat_quantile = None
+        self.training_workers = os.cpu_count() or 1
+        # Worker processes shared with other entries (see TrainingPool), or
+        # None to start a pool for each training
+        self.training_pool = None
+        # Set to stop tuning and throw away a fit in progress (see TrainingScheduler)
+        self.training_cancel = threading.Event()
+        self._quantum = np.array([FEATURE_QUANTUM.get(name, 1) for name in FEATURE_NAMES])
+        self._prediction_cache = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @property
+    def model(self):
+        """Return the active scikit-learn forest, or None."""
+        return self.active.model if self.active else None
+
+    @property
+    def scaler(self):
+        """Return the active scaler, or None."""
+        return self.active.scaler if self.active else None
+
+    @property
+    def shards(self):
+        """Return the active per-room (model, scaler) pairs."""
+        return self.active.shards if self.active else {}
+
+    @property
+    def compiled(self):
+        """Return the active flat-array forest used for every prediction, or None."""
+        return self.active.compiled if self.active else None
 
-    def collect_features(self, thermostat_data, outdoor_temp, outdoor_humidity, target_temp, current_time):
+    @property
+    def compiled_shards(self):
+        """Return the active flat-array per-room forests."""
+        return self.active.compiled_shards if self.active else {}
+
+    @property
+    def _estimator_store(self):
+        return self.active.estimator_store if self.active else None
+
+    @staticmethod
+    def _new_model(params=None):
+        from sklearn.ensemble import RandomForestRegressor
+        return RandomForestRegressor(**{**DEFAULT_MODEL_PARAMS, **(params or {})}, random_state=42)
+
+    def collect_features(self, thermostat_data, outdoor_temp, outdoor_humidity, target_temp, current_time,
+                         outdoor_forecast=None):
         current_temp = thermostat_data.get('current_temp', 20)
         temp_delta = target_temp - current_temp
+        outdoor_temp = outdoor_temp if outdoor_temp is not None else 0
+        # Without a forecast the outdoor temperature is assumed to hold
+        if outdoor_forecast is None:
+            outdoor_forecast = [outdoor_temp] * len(FORECAST_HORIZONS)
         features = [
-            outdoor_temp if outdoor_temp is not None else 0,
+            outdoor_temp,
             outdoor_humidity if outdoor_humidity is not None else 50,
             target_temp,
             current_temp,
@@ -31,71 +257,806 @@ class HeatingPredictor:
             current_time.weekday(),
             current_time.month,
             int(current_time.hour >= 6 and current_time.hour <= 22),
+            *outdoor_forecast,
         ]
         return np.array(features).reshape(1, -1)
 
-    def add_training_sample(self, features, heat_on_time, metadata=None):
-        self.training_data.append({
-            'features': features.flatten(),
-            'label': heat_on_time,
-            'timestamp': datetime.now(),
-            'metadata': metadata or {}
-        })
-        # Rotation for memory management
-        if len(self.training_data) > 10000:
-            self.training_data = self.training_data[-10000:]
+    def collect_feature_matrix(self, thermostat_data, outdoor_temp, outdoor_humidity, current_time,
+                               outdoor_forecast=None):
+        """Build one feature row per thermostat data dict in a single array."""
+        current_temp = np.array([d.get('current_temp', 20) for d in thermostat_data], dtype=float)
+        target_temp = np.array([d['target_temp'] for d in thermostat_data], dtype=float)
+        return self.collect_feature_rows(
+            current_temp, target_temp, outdoor_temp, outdoor_humidity, [current_time] * len(thermostat_data),
+            outdoor_forecast
+        )
+
+    def collect_feature_rows(self, current_temp, target_temp, outdoor_temp, outdoor_humidity, times,
+                             outdoor_forecast=None):
+        """Build feature rows from per-row arrays (or scalars) and one datetime per row.
+
+        outdoor_forecast holds the temperature FORECAST_HORIZONS hours ahead,
+        per row (n, horizons) or shared (horizons,); None repeats outdoor_temp.
+        """
+        features = np.empty((len(times), len(FEATURE_NAMES)))
+        hours = np.array([t.hour for t in times])
+        features[:, 0] = np.where(np.equal(outdoor_temp, None), 0, outdoor_temp).astype(float)
+        features[:, 1] = np.where(np.equal(outdoor_humidity, None), 50, outdoor_humidity).astype(float)
+        features[:, 2] = target_temp
+        features[:, 3] = current_temp
+        features[:, 4] = np.asarray(target_temp, dtype=float) - np.asarray(current_temp, dtype=float)
+        features[:, 5] = hours
+        features[:, 6] = [t.weekday() for t in times]
+        features[:, 7] = [t.month for t in times]
+        features[:, 8] = (hours >= 6) & (hours <= 22)
+        forecast = features[:, 9:9 + len(FORECAST_HORIZONS)]
+        forecast[:] = features[:, [0]] if outdoor_forecast is None else outdoor_forecast
+        return features
+
+    def add_training_sample(self, features, heat_on_time, thermostat_id=None, timestamp=None):
+        if timestamp is None:
+            timestamp = datetime.now().timestamp()
+        # Ring buffer overwrites the oldest sample once full
+        self.training_data.append(features, heat_on_time, timestamp, thermostat_id)
 
     def train_model(self):
-        if len(self.training_data) < 100:
+        X, y, timestamps, thermostat_ids = self._training_set()
+        if len(X) < 100:
             _LOGGER.warning("Not enough data to train model!")
             return False
         
-        X = np.vstack([d['features'] for d in self.training_data])
-        y = np.array([d['label'] for d in self.training_data])
-        
         # Filter outliers
-        valid = ~np.isnan(y) & (y >= 0) & (y <= 180)
-        X = X[valid]
-        y = y[valid]
+        valid = self._valid_labels(y)
+        if not valid.all():
+            X = X[valid]
+            y = y[valid]
+            timestamps = timestamps[valid]
+            thermostat_ids = thermostat_ids[valid]
         
         if len(X) < 50:
             _LOGGER.warning("Too little valid samples after filtering.")
             return False
         
-        X_scaled = self.scaler.fit_transform(X)
-        self.model.fit(X_scaled, y)
+        accepted, holdout_mae = self._evaluate_candidate(X, y, timestamps, thermostat_ids)
+        if not accepted:
+            return False
+        
+        shard_data = self._shard_training_sets(X, y, thermostat_ids)
+        workers = min(len(shard_data), self.training_workers)
+        if workers > 1:
+            # Shards train in worker processes while this thread fits the global model
+            if self.training_pool is not None:
+                pool_context = nullcontext(self.training_pool.get())
+            else:
+                context = multiprocessing.get_context("spawn")
+                pool_context = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+            with pool_context as pool:
+                futures = {
+                    key: pool.submit(fit_forest, *data, self.model_params) for key, data in shard_data.items()
+                }
+                model, scaler = fit_forest(X, y, self.model_params)
+                if self.training_cancel.is_set():
+                    for future in futures.values():
+                        future.cancel()
+                    futures = {}
+                shards = {key: future.result() for key, future in futures.items()}
+        else:
+            model, scaler = fit_forest(X, y, self.model_params)
+            shards = {}
+            for key, data in shard_data.items():
+                if self.training_cancel.is_set():
+                    break
+                shards[key] = fit_forest(*data, self.model_params)
+        
+        if self.training_cancel.is_set():
+            _LOGGER.info("Training cancelled, keeping the current model")
+            return False
+        
+        compiled = CompiledForest.from_estimator(model, scaler)
+        compiled_shards = {key: CompiledForest.from_estimator(*pair) for key, pair in shards.items()}
+        
+        self.model_version += 1
+        self._swap(ModelVersion(
+            self.model_version, model, scaler, shards, compiled, compiled_shards, None, datetime.now(), holdout_mae,
+            float(timestamps.max()),
+        ))
+        self._incremental_seen = self.training_data.total_appended
+        _LOGGER.info(f"Model version {self.model_version} trained on {len(y)} samples, {len(shards)} room models")
+        return True
+
+    def _evaluate_candidate(self, X, y, timestamps, thermostat_ids):
+        """Fit a candidate without the newest unseen samples and score it and the active model on them.
+
+        Returns (accepted, candidate MAE or None). Only samples newer than
+        everything the active model learned are held out, so neither model
+        has seen them. Both models route rows to their room models like
+        predictions do, so the room models are gated with the global one.
+        Without a trained model, or with too few unseen samples, there is
+        nothing to compare and the retrained model is accepted.
+        """
+        active = self.active
+        if active is None or not self.is_trained:
+            return True, None
+        seen_until = active.seen_until
+        if seen_until is None and active.trained_at is not None:
+            # Saved before seen_until was recorded
+            seen_until = active.trained_at.timestamp()
+        if seen_until is None:
+            return True, None
+        unseen = np.flatnonzero(timestamps > seen_until)
+        holdout = min(max(int(len(y) * HOLDOUT_FRACTION), HOLDOUT_MIN_SAMPLES), HOLDOUT_MAX_SAMPLES, len(unseen))
+        if holdout < HOLDOUT_MIN_SAMPLES or len(y) - holdout < 50:
+            _LOGGER.debug(f"Shadow evaluation skipped, {len(unseen)} samples are new to the active model")
+            return True, None
+        test_rows = unseen[np.argsort(timestamps[unseen], kind='stable')[-holdout:]]
+        fit_rows = np.setdiff1d(np.arange(len(y)), test_rows)
+        
+        model, scaler = fit_forest(X[fit_rows], y[fit_rows], self.model_params)
+        shard_data = self._shard_training_sets(X[fit_rows], y[fit_rows], thermostat_ids[fit_rows])
+        compiled_shards = {}
+        for key, data in shard_data.items():
+            if self.training_cancel.is_set():
+                return False, None
+            compiled_shards[key] = CompiledForest.from_estimator(*fit_forest(*data, self.model_params))
+        if self.training_cancel.is_set():
+            return False, None
+        candidate = active._replace(
+            compiled=CompiledForest.from_estimator(model, scaler), compiled_shards=compiled_shards
+        )
+        
+        names = self.training_data.thermostats
+        ids = [names[i] if 0 <= i < len(names) else None for i in thermostat_ids[test_rows]]
+        X_test, y_test = X[test_rows], y[test_rows]
+        candidate_mae = float(np.abs(self._predict_uncached(X_test, ids, candidate)[:, 0] - y_test).mean())
+        current_mae = float(np.abs(self._predict_uncached(X_test, ids, active)[:, 0] - y_test).mean())
+        accepted = candidate_mae <= current_mae * (1 + SWAP_TOLERANCE)
+        self.last_evaluation = {
+            'evaluated_at': datetime.now().isoformat(),
+            'holdout_samples': holdout,
+            'candidate_mae': candidate_mae,
+            'current_mae': current_mae,
+            'current_version': active.version,
+            'accepted': accepted,
+        }
+        if not accepted:
+            _LOGGER.warning(
+                f"Retrained model rejected: {candidate_mae:.1f} min error on the newest {holdout} unseen samples, "
+                f"version {active.version} has {current_mae:.1f}"
+            )
+        return accepted, candidate_mae
+
+    def _swap(self, version):
+        """Make version the active model in one assignment; the replaced one is kept as previous."""
+        if self.active is not None:
+            self.previous = self.active
+        self.active = version
         self.is_trained = True
-        _LOGGER.info(f"Model trained on {len(y)} samples")
+        self._invalidate_predictions()
+
+    def rollback_model(self):
+        """Swap the previous model back in, keeping the current one as previous; returns its version or None."""
+        if self.previous is None or self.active is None:
+            return None
+        # Saving moves files between the model and previous directories, so
+        # both versions need their estimators in memory first
+        current = self._with_estimators(self.active)
+        previous = self._with_estimators(self.previous)
+        self.active = previous
+        self.previous = current
+        self.is_trained = True
+        self._invalidate_predictions()
+        self._incremental_seen = self.training_data.total_appended
+        _LOGGER.info(f"Rolled back from model version {current.version} to {previous.version}")
+        return previous.version
+
+    def tune_model(self, budget):
+        """Search forest settings on the time-ordered samples for up to budget seconds.
+
+        The cheapest Pareto-optimal settings on error, inference cost and
+        size become model_params, used from the next train_model on.
+        """
+        X, y, timestamps, _ = self._training_set()
+        valid = self._valid_labels(y)
+        order = np.argsort(timestamps[valid], kind='stable')
+        X, y = X[valid][order], y[valid][order]
+        if len(y) < TUNING_MIN_SAMPLES:
+            _LOGGER.debug("Too few samples to tune the model")
+            return False
+        
+        # Candidates run on the shared training pool, or on a pool of their own without one
+        if self.training_pool is not None:
+            pool_context = nullcontext(self.training_pool.get())
+        else:
+            context = multiprocessing.get_context("spawn")
+            pool_context = ProcessPoolExecutor(max_workers=self.training_workers, mp_context=context)
+        with pool_context as pool:
+            results = search_parameters(
+                fit_forest, X, y, budget, pool, self.training_workers, stop=self.training_cancel
+            )
+        if self.training_cancel.is_set():
+            _LOGGER.info("Tuning cancelled, keeping the current settings")
+            return False
+        self.tuned_at = datetime.now()
+        if not results:
+            _LOGGER.warning("No tuning candidate finished within the budget")
+            return False
+        chosen = choose_parameters(results)
+        self.model_params = dict(chosen.params)
+        self.tuning_results = results
+        _LOGGER.info(
+            f"Tuned model on {len(y)} samples ({len(results)} candidates): {chosen.params}, "
+            f"MAE {chosen.mae:.1f} min, {chosen.nodes} nodes"
+        )
+        return True
+
+    def _training_set(self):
+        """Return (X, y, timestamps, thermostat ids) for a full refit.
+
+        With a sample history on disk this is a bounded uniform draw from
+        its last HISTORY_TRAINING_DAYS days (all of them while they fit),
+        so the refit sees every season without holding the history in
+        memory; otherwise the in-memory buffer is used.
+        """
+        self.append_history()
+        history = self.history
+        days = history.days() if history is not None else []
+        if not days:
+            return self.training_data.arrays()
+        last_day = days[-1]
+        records = history.sample(
+            HISTORY_TRAINING_SAMPLES, np.random.default_rng(42), first_day=last_day - HISTORY_TRAINING_DAYS
+        )
+        return records['features'], records['label'], records['timestamp'], records['thermostat_id']
+
+    def _shard_training_sets(self, X, y, thermostat_ids):
+        """Split samples by shard key, keeping shards with enough samples."""
+        if not self.shard_keys:
+            return {}
+        members = {}
+        for index, thermostat_id in enumerate(self.training_data.thermostats):
+            key = self.shard_keys.get(thermostat_id)
+            if key is not None:
+                members.setdefault(key, []).append(index)
+        
+        shard_data = {}
+        for key, indices in members.items():
+            mask = np.isin(thermostat_ids, indices)
+            if mask.sum() >= SHARD_MIN_SAMPLES:
+                shard_data[key] = (X[mask], y[mask])
+        return shard_data
+
+    def update_incremental(self):
+        """Fold samples added since the last update into the forest at bounded cost."""
+        new_count = self.training_data.total_appended - self._incremental_seen
+        if new_count < INCREMENTAL_MIN_NEW_SAMPLES:
+            return False
+        if not self.is_trained:
+            # The first model still needs a full fit
+            return len(self.training_data) >= 100 and self.train_model()
+        
+        self._ensure_estimators()
+        X_new, y_new, timestamps_new, _ = self.training_data.ordered(
+            last=min(new_count, INCREMENTAL_WINDOW_SAMPLES)
+        )
+        X_all, y_all, _, _ = self.training_data.arrays()
+        rng = np.random.default_rng(self._incremental_round)
+        replay = rng.choice(len(y_all), size=min(len(y_all), INCREMENTAL_WINDOW_SAMPLES), replace=False)
+        valid_new = self._valid_labels(y_new)
+        X_new, y_new = X_new[valid_new], y_new[valid_new]
+        X_old, y_old = X_all[replay], y_all[replay]
+        valid_old = self._valid_labels(y_old)
+        X = np.vstack([X_new, X_old[valid_old]])
+        y = np.concatenate([y_new, y_old[valid_old]])
+        
+        # Running scaler: update the statistics with the new samples only, then
+        # move existing split thresholds so old trees keep the same raw cut points
+        old_mean, old_scale = self.scaler.mean_.copy(), self.scaler.scale_.copy()
+        if len(X_new):
+            self.scaler.partial_fit(X_new)
+        self._rescale_thresholds(old_mean, old_scale)
+        
+        self._incremental_round += 1
+        trees = len(self.model.estimators_)
+        self.model.set_params(
+            warm_start=True,
+            n_estimators=trees + INCREMENTAL_TREES_PER_UPDATE,
+            random_state=self._incremental_round,
+        )
+        self.model.fit(self.scaler.transform(X), y)
+        
+        # Keep the forest size bounded by dropping the oldest trees
+        excess = len(self.model.estimators_) - self.model_params['n_estimators']
+        if excess > 0:
+            self.model.estimators_ = self.model.estimators_[excess:]
+            self.model.n_estimators = len(self.model.estimators_)
+        
+        # Same version, updated in place; previous stays the last retrained model
+        seen_until = max(self.active.seen_until or 0.0, float(timestamps_new.max()))
+        self.active = self.active._replace(
+            compiled=CompiledForest.from_estimator(self.model, self.scaler), seen_until=seen_until
+        )
+        self._invalidate_predictions()
+        self._incremental_seen = self.training_data.total_appended
+        _LOGGER.debug(f"Incremental update folded in {len(y_new)} new samples")
         return True
 
+    @staticmethod
+    def _valid_labels(y):
+        return ~np.isnan(y) & (y >= 0) & (y <= 180)
+
+    def _rescale_thresholds(self, old_mean, old_scale):
+        """Map split thresholds from the old scaler's space to the current one."""
+        for estimator in self.model.estimators_:
+            tree = estimator.tree_
+            split = tree.feature >= 0
+            feature = tree.feature[split]
+            raw = tree.threshold[split] * old_scale[feature] + old_mean[feature]
+            tree.threshold[split] = (raw - self.scaler.mean_[feature]) / self.scaler.scale_[feature]
+
+    def _compile(self):
+        """Export the active estimators to flat-array forests."""
+        self.active = self.active._replace(
+            compiled=CompiledForest.from_estimator(self.model, self.scaler),
+            compiled_shards={key: CompiledForest.from_estimator(*pair) for key, pair in self.shards.items()},
+        )
+
+    @staticmethod
+    def _with_estimators(version):
+        """Return version with its scikit-learn estimators loaded."""
+        store = version.estimator_store
+        if store is None:
+            return version
+        return version._replace(
+            model=store.read_model(),
+            scaler=store.read_scaler(_new_scaler()),
+            shards=store.read_shards() if version.compiled_shards else {},
+            estimator_store=None,
+        )
+
+    def _ensure_estimators(self):
+        """Load the scikit-learn estimators if only the compiled forests were loaded."""
+        if self._estimator_store is not None:
+            self.active = self._with_estimators(self.active)
+
     def predict_preheat_time(self, features):
+        return float(self.predict_preheat_times(features)[0])
+
+    @staticmethod
+    def heuristic_preheat_times(temp_deltas):
+        """Rule-of-thumb preheat minutes used until a model is available."""
+        return np.clip(np.asarray(temp_deltas, dtype=float) * 15, 10, 120)
+
+    def fit_thermal(self):
+        """Refit the thermal model on the buffered samples; takes a few milliseconds."""
+        X, y, _, thermostat_ids = self.training_data.arrays()
+        thermal = ThermalModel()
+        thermal.fit(X[:, 3], X[:, 2], X[:, 0], y, thermostat_ids, list(self.training_data.thermostats))
+        # Swapped in whole, so predictions never see a half-fitted model
+        self.thermal = thermal
+
+    def thermal_preheat_times(self, features, thermostat_ids=None):
+        """Predict with the thermal model, or the heuristic until it has been fitted."""
+        if not self.thermal.is_fitted:
+            return self.heuristic_preheat_times(features[:, 4])
+        return self.thermal.predict(features[:, 3], features[:, 2], features[:, 0], thermostat_ids)
+
+    def _forest_weights(self, thermostat_ids, count):
+        """Return the forest's weight per row: 1 for the forest, 0 for the thermal model, between for blends."""
         if not self.is_trained:
-            temp_delta = features[0, 4]
-            return max(10, min(temp_delta * 15, 120))
+            return np.zeros(count)
+        if not self.room_predictors and self.default_predictor == PREDICTOR_FOREST:
+            return np.ones(count)
+        if thermostat_ids is None:
+            thermostat_ids = [None] * count
+        weights = np.ones(count)
+        for index, thermostat_id in enumerate(thermostat_ids):
+            predictor = self.room_predictors.get(thermostat_id, self.default_predictor)
+            if predictor == PREDICTOR_THERMAL:
+                weights[index] = 0.0
+            elif predictor == PREDICTOR_BLEND:
+                forest_error, thermal_error = self.blend_errors.get(thermostat_id, (1.0, 1.0))
+                weights[index] = thermal_error / (forest_error + thermal_error)
+        return weights
+
+    def score_sample(self, features, heat_on_time, thermostat_id):
+        """Update the blend errors of a room with a sample that has not been learned yet."""
+        if not self.is_trained or not self.thermal.is_fitted or thermostat_id is None:
+            return
+        features = np.asarray(features, dtype=float).reshape(1, -1)
+        label = np.clip(heat_on_time, 5, 120)
+        squared = np.array([
+            (self._predict_forest(features, [thermostat_id])[0] - label) ** 2,
+            (self.thermal_preheat_times(features, [thermostat_id])[0] - label) ** 2,
+        ])
+        errors = self.blend_errors.get(thermostat_id)
+        if errors is None:
+            self.blend_errors[thermostat_id] = squared.tolist()
+        else:
+            self.blend_errors[thermostat_id] = (np.asarray(errors) + BLEND_ERROR_WEIGHT * (squared - errors)).tolist()
+
+    def predict_preheat_times(self, features, thermostat_ids=None):
+        """Predict preheat minutes for every row with its room's predictor.
+
+        Without a trained forest every row uses the thermal model. Forest
+        rows go through the prediction cache; the thermal model is a single
+        formula and is evaluated directly.
+        """
+        return self.predict_preheat_intervals(features, thermostat_ids).mean
+
+    def predict_preheat_intervals(self, features, thermostat_ids=None):
+        """Predict the mean, spread and quantiles of the preheat minutes for every row.
+
+        They come from the trees' individual predictions, in the same pass
+        and cache entry as the mean. The thermal model gives a single value,
+        so its rows get a zero-width interval and blended rows the forest's
+        interval, narrowed by the forest's weight and shifted to the blend.
+        """
+        features = np.asarray(features, dtype=float)
+        weights = self._forest_weights(thermostat_ids, len(features))
+        if (weights == 1).all():
+            return self._forest_intervals(features, thermostat_ids)
         
-        features_scaled = self.scaler.transform(features)
-        prediction = self.model.predict(features_scaled)[0]
-        return max(5, min(prediction, 120))
+        intervals = PreheatIntervals.point(self.thermal_preheat_times(features, thermostat_ids))
+        rows = np.flatnonzero(weights)
+        if len(rows):
+            ids = None if thermostat_ids is None else [thermostat_ids[i] for i in rows]
+            forest = self._forest_intervals(features[rows], ids)
+            weight = weights[rows]
+            thermal = intervals.mean[rows]
+            intervals.mean[rows] = weight * forest.mean + (1 - weight) * thermal
+            intervals.spread[rows] = weight * forest.spread
+            intervals.quantiles[rows] = weight[:, None] * forest.quantiles + ((1 - weight) * thermal)[:, None]
+        return intervals
+
+    def preheat_times(self, intervals):
+        """Return the minutes preheating starts ahead of a slot: the mean, or preheat_quantile."""
+        if self.preheat_quantile is None:
+            return intervals.mean
+        return intervals.quantile(self.preheat_quantile)
+
+    def _predict_forest(self, features, thermostat_ids=None):
+        """Predict the forests' mean preheat minutes."""
+        return self._forest_intervals(features, thermostat_ids).mean
+
+    def _forest_intervals(self, features, thermostat_ids=None):
+        """Predict with the forests, serving repeated rows from the cache.
+
+        Rows are quantized with FEATURE_QUANTUM; only rows missing from the
+        LRU cache reach the forests, in one batch. Each cache entry holds
+        the mean, spread and quantiles of a row.
+        """
+        # Read the cache before the model: a swap replaces the version first
+        # and the cache second, so a new cache never holds old predictions.
+        # Misses are computed with one snapshot of the active version.
+        cache = self._prediction_cache
+        active = self.active
+        steps = np.round(np.asarray(features, dtype=float) / self._quantum)
+        if thermostat_ids is None or not active.compiled_shards:
+            shard_keys = [None] * len(steps)
+        else:
+            shard_keys = [self.shard_keys.get(t) for t in thermostat_ids]
+            shard_keys = [key if key in active.compiled_shards else None for key in shard_keys]
+        
+        # Columns: mean, spread, then one per PREDICTION_QUANTILES
+        outputs = np.empty((len(steps), 2 + len(PREDICTION_QUANTILES)))
+        keys = []
+        missing = []
+        for index, shard_key in enumerate(shard_keys):
+            key = (shard_key, steps[index].tobytes())
+            keys.append(key)
+            value = cache.get(key)
+            if value is None:
+                missing.append(index)
+            else:
+                cache.move_to_end(key)
+                outputs[index] = value
+        self.cache_hits += len(steps) - len(missing)
+        self.cache_misses += len(missing)
+        
+        if missing:
+            rows = np.array(missing)
+            ids = None if thermostat_ids is None else [thermostat_ids[i] for i in missing]
+            outputs[rows] = self._predict_uncached(steps[rows] * self._quantum, ids, active)
+            for index in missing:
+                cache[keys[index]] = outputs[index].copy()
+            while len(cache) > PREDICTION_CACHE_SIZE:
+                cache.popitem(last=False)
+        return PreheatIntervals(outputs[:, 0], outputs[:, 1], outputs[:, 2:])
+
+    def _predict_uncached(self, features, thermostat_ids=None, active=None):
+        """Predict the mean, spread and quantiles of every row with one pass per model.
+
+        With per-room models, rows are routed to their thermostat's shard
+        (one call per shard) and the rest go to the global model. Returns
+        the columns of the prediction cache.
+        """
+        active = active or self.active
+        outputs = np.empty((len(features), 2 + len(PREDICTION_QUANTILES)))
+        if not active.compiled_shards or thermostat_ids is None:
+            self._fill_outputs(outputs, slice(None), active.compiled, features)
+        else:
+            keys = np.array([self.shard_keys.get(t) for t in thermostat_ids], dtype=object)
+            use_global = np.ones(len(features), dtype=bool)
+            for key, forest in active.compiled_shards.items():
+                rows = keys == key
+                if rows.any():
+                    self._fill_outputs(outputs, rows, forest, features[rows])
+                    use_global[rows] = False
+            if use_global.any():
+                self._fill_outputs(outputs, use_global, active.compiled, features[use_global])
+        # Spread is left unclipped: it shows how much the trees disagree
+        outputs[:, 0] = np.clip(outputs[:, 0], 5, 120)
+        outputs[:, 2:] = np.clip(outputs[:, 2:], 5, 120)
+        return outputs
+
+    @staticmethod
+    def _fill_outputs(outputs, rows, forest, features):
+        mean, spread, quantiles = forest.predict_distribution(features, PREDICTION_QUANTILES)
+        outputs[rows, 0] = mean
+        outputs[rows, 1] = spread
+        outputs[rows, 2:] = quantiles
+
+    def _invalidate_predictions(self):
+        """Drop cached predictions after the model changed."""
+        self._prediction_cache = OrderedDict()
+
+    def append_history(self):
+        """Write samples added since the last call to the sample history, in one batch per day."""
+        with self._history_lock:
+            if self.history is None:
+                return
+            new_count = self.training_data.total_appended - self._history_appended
+            if new_count > 0:
+                records = self._sample_records(min(new_count, len(self.training_data)))
+                self.history.append(records, list(self.training_data.thermostats))
+            self._history_appended = self.training_data.total_appended
+
+    def _use_history(self, store):
+        """Point the sample history at a model directory's, writing the buffer there if it is new."""
+        with self._history_lock:
+            if self.history is not None and self.history.directory == store.path(HISTORY_DIR):
+                return
+            self.history = store.history(sample_dtype(len(FEATURE_NAMES)))
+            # A different directory has none of the buffered samples yet
+            self._history_appended = self.training_data.total_appended - len(self.training_data)
+
+    def import_samples(self, features, labels, timestamps, thermostat_ids):
+        """Add samples from before the collected ones, e.g. rebuilt from recorder history.
+
+        They go straight to the sample history, which merges them into the
+        day files in time order; the buffer is then reloaded from it so it
+        still holds the newest samples in order.
+        """
+        self.append_history()
+        with self._history_lock:
+            records = np.empty(len(labels), dtype=sample_dtype(len(FEATURE_NAMES)))
+            records['timestamp'] = timestamps
+            records['thermostat_id'] = [self.training_data.thermostat_index(t) for t in thermostat_ids]
+            records['label'] = labels
+            records['features'] = features
+            self.history.append(records, list(self.training_data.thermostats))
+            self._restore_from_history()
+            self._incremental_seen = self.training_data.total_appended
+
+    def oldest_sample_time(self):
+        """Return the epoch timestamp of the oldest stored sample, or None."""
+        if self.history is not None:
+            for day in self.history.days():
+                timestamps = self.history.read(day, day)['timestamp']
+                if len(timestamps):
+                    return int(timestamps.min())
+        timestamps = self.training_data.arrays()[2]
+        return int(timestamps.min()) if len(timestamps) else None
+
+    def clear_training_data(self):
+        """Drop every sample, in memory and on disk."""
+        with self._history_lock:
+            self.training_data.clear()
+            self._history_appended = 0
+            # The buffer counts from 0 again, so incremental updates must too
+            self._incremental_seen = 0
+            self.thermal = ThermalModel()
+            self.blend_errors = {}
+            self._invalidate_predictions()
+            if self.history is not None:
+                self.history.clear()
 
     def save_model(self, path):
-        model_data = {
-            'model': self.model,
-            'scaler': self.scaler,
-            'training_data': self.training_data[-1000:],  # last 1000 samples
-            'is_trained': self.is_trained
-        }
-        with open(path, 'wb') as f:
-            pickle.dump(model_data, f)
+        """Write the model, scaler and new samples to a versioned model directory.
 
-    def load_model(self, path):
+        When the active version is not the one saved there, the saved one
+        is first moved to the previous subdirectory, so rollback survives
+        a restart.
+        """
+        store = ModelStore(path)
+        self._use_history(store)
+        self.append_history()
+        if self._estimator_store is not None and self._estimator_store.directory != path:
+            self._ensure_estimators()
+        if (self.is_trained and self._estimator_store is None and self._saved_version is not None
+                and self._saved_version != self.active.version):
+            previous_store = store.archive(os.path.join(path, PREVIOUS_DIR))
+            if (self.previous is not None and self.previous.version == self._saved_version
+                    and self.previous.estimator_store is not None):
+                self.previous = self.previous._replace(estimator_store=previous_store)
+        # Estimators still on disk are unchanged since they were loaded
+        if self.is_trained and self._estimator_store is None:
+            if self.float32_thresholds:
+                quantize_thresholds(self.model)
+                for model, _ in self.shards.values():
+                    quantize_thresholds(model)
+                # Keep the compiled forests identical to what is saved
+                self._compile()
+            store.write_model(self.model)
+            store.write_scaler(self.scaler)
+            if self.shards:
+                store.write_shards(self.shards)
+            store.write_compiled(self.compiled, self.compiled_shards)
+        # The manifest is written last so it only ever points at complete files
+        store.write_manifest({
+            'saved_at': datetime.now().isoformat(),
+            'is_trained': self.is_trained,
+            'feature_names': FEATURE_NAMES,
+            'thermostats': list(self.training_data.thermostats),
+            'shards': sorted(self.compiled_shards) if self.is_trained else [],
+            'compiled': self.is_trained,
+            'model_params': self.model_params,
+            'tuned_at': self.tuned_at.isoformat() if self.tuned_at else None,
+            'blend_errors': self.blend_errors,
+            'version': self.active.version if self.is_trained else None,
+            'model_version': self.model_version,
+            'trained_at': self.active.trained_at.isoformat() if self.is_trained and self.active.trained_at else None,
+            'holdout_mae': self.active.holdout_mae if self.is_trained else None,
+            'seen_until': self.active.seen_until if self.is_trained else None,
+            'last_evaluation': self.last_evaluation,
+        })
+        self._saved_version = self.active.version if self.is_trained else None
+        self.model_bytes = store.model_bytes()
+
+    def _sample_records(self, last):
+        X, y, timestamps, thermostat_ids = self.training_data.ordered(last=last)
+        records = np.empty(len(y), dtype=sample_dtype(len(FEATURE_NAMES)))
+        records['timestamp'] = timestamps
+        records['thermostat_id'] = thermostat_ids
+        records['label'] = y
+        records['features'] = X
+        return records
+
+    def load_model(self, path, legacy_path=None):
+        """Load a versioned model directory, migrating a legacy pickle if needed."""
+        store = ModelStore(path)
         try:
-            with open(path, 'rb') as f:
-                model_data = pickle.load(f)
-            self.model = model_data['model']
-            self.scaler = model_data['scaler']
-            self.training_data = model_data.get('training_data', [])
-            self.is_trained = model_data.get('is_trained', False)
+            manifest = store.read_manifest()
+            if manifest is None:
+                self._use_history(store)
+                if legacy_path and os.path.exists(legacy_path):
+                    return self._load_legacy(legacy_path)
+                # Samples may have been collected before the first model was saved
+                self._restore_from_history()
+                return False
+            if manifest['feature_names'] != FEATURE_NAMES:
+                _LOGGER.warning("Saved model uses different features, starting over")
+                return False
+            
+            is_trained = manifest['is_trained']
+            model = scaler = compiled = estimator_store = None
+            shards = {}
+            compiled_shards = {}
+            if is_trained and manifest.get('compiled'):
+                # Inference only needs the flat arrays; scikit-learn stays unloaded
+                compiled, compiled_shards = store.read_compiled()
+                estimator_store = store
+            elif is_trained:
+                model = store.read_model()
+                scaler = store.read_scaler(_new_scaler())
+                if manifest.get('shards'):
+                    shards = store.read_shards()
+                compiled = CompiledForest.from_estimator(model, scaler)
+                compiled_shards = {key: CompiledForest.from_estimator(*pair) for key, pair in shards.items()}
+            
+            self._use_history(store)
+            store.migrate_samples(self.history, manifest.get('samples_count', 0), manifest['thermostats'])
+            self._restore_from_history(manifest['thermostats'])
+            # Directories saved before versioning hold version 1
+            version = manifest.get('version') or 1
+            trained_at = manifest.get('trained_at')
+            self.active = ModelVersion(
+                version, model, scaler, shards, compiled, compiled_shards, estimator_store,
+                datetime.fromisoformat(trained_at) if trained_at else None, manifest.get('holdout_mae'),
+                manifest.get('seen_until'),
+            ) if is_trained else None
+            self.previous = self._load_previous(path) if is_trained else None
+            self.model_version = max(manifest.get('model_version', 0), version)
+            self._saved_version = version if is_trained else None
+            self.last_evaluation = manifest.get('last_evaluation')
+            self.is_trained = is_trained
+            self.model_params = {**DEFAULT_MODEL_PARAMS, **manifest.get('model_params', {})}
+            tuned_at = manifest.get('tuned_at')
+            self.tuned_at = datetime.fromisoformat(tuned_at) if tuned_at else None
+            self.blend_errors = manifest.get('blend_errors', {})
+            self._invalidate_predictions()
+            self._incremental_seen = self.training_data.total_appended
+            self.model_bytes = store.model_bytes()
             return True
         except Exception as e:
             _LOGGER.error(f"Failed to load model: {e}")
             return False
+
+    @staticmethod
+    def _load_previous(path):
+        """Return the version kept in the previous subdirectory (compiled forests only), or None."""
+        store = ModelStore(os.path.join(path, PREVIOUS_DIR))
+        try:
+            manifest = store.read_manifest()
+            if manifest is None or not manifest['is_trained'] or not manifest.get('compiled'):
+                return None
+            if manifest['feature_names'] != FEATURE_NAMES:
+                return None
+            compiled, compiled_shards = store.read_compiled()
+        except Exception as e:
+            _LOGGER.warning(f"Failed to load the previous model: {e}")
+            return None
+        trained_at = manifest.get('trained_at')
+        return ModelVersion(
+            manifest.get('version') or 0, None, None, {}, compiled, compiled_shards, store,
+            datetime.fromisoformat(trained_at) if trained_at else None, manifest.get('holdout_mae'),
+            manifest.get('seen_until'),
+        )
+
+    def _restore_from_history(self, thermostats=()):
+        """Fill the buffer with the newest samples of the history and refit the thermal model."""
+        # Only the newest buffer's worth is read from the memory-mapped day files
+        records = self.history.newest(self.training_data.capacity)
+        self.training_data.restore(
+            records['features'],
+            records['label'],
+            records['timestamp'],
+            records['thermostat_id'],
+            self.history.read_thermostats() or thermostats,
+        )
+        self._history_appended = self.training_data.total_appended
+        self.fit_thermal()
+
+    def _load_legacy(self, path):
+        """Load the single-pickle format written before versioned storage."""
+        with open(path, 'rb') as f:
+            model_data = pickle.load(f)
+        if getattr(model_data['model'], 'n_features_in_', len(FEATURE_NAMES)) != len(FEATURE_NAMES):
+            _LOGGER.warning("Legacy model uses different features, starting over")
+            return False
+        self._restore_training_data(model_data.get('training_data'))
+        self.fit_thermal()
+        self._incremental_seen = self.training_data.total_appended
+        self.is_trained = model_data.get('is_trained', False)
+        self.active = self.previous = None
+        if self.is_trained:
+            self.model_version = 1
+            self.active = ModelVersion(
+                1, model_data['model'], model_data['scaler'], {}, None, {}, None, None, None,
+                float(self.training_data.arrays()[2].max()) if len(self.training_data) else None,
+            )
+            self._compile()
+        self._invalidate_predictions()
+        _LOGGER.info(f"Migrated legacy model from {path}")
+        return True
+
+    def _restore_training_data(self, data):
+        self.training_data.clear()
+        if not data:
+            return
+        if isinstance(data, list):
+            # Legacy format: one dict per sample
+            self.training_data.extend(
+                [d['features'] for d in data],
+                [d['label'] for d in data],
+                [d['timestamp'].timestamp() for d in data],
+                [d.get('metadata', {}).get('thermostat_id') for d in data],
+            )
+            return
+        self.training_data.restore(
+            data['features'],
+            data['labels'],
+            data['timestamps'],
+            data['thermostat_ids'],
+            data['thermostats'],
+        )
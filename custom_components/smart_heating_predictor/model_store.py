@@ -0,0 +1,368 @@
+"""Versioned on-disk model storage for Smart Heating Predictor"""
+import json
+import logging
+import os
+import tempfile
+from datetime import date
+
+import numpy as np
+
+from .forest import CompiledForest
+
+_LOGGER = logging.getLogger(__name__)
+
+MODEL_FORMAT_VERSION = 2
+
+MANIFEST_FILE = "manifest.json"
+MODEL_FILE = "model.joblib"
+SCALER_FILE = "scaler.npz"
+SAMPLES_FILE = "samples.bin"
+SHARDS_FILE = "shards.joblib"
+COMPILED_FILE = "compiled.npz"
+HISTORY_DIR = "history"
+HISTORY_THERMOSTATS_FILE = "thermostats.json"
+# Single-pickle model of the oldest versions, moved in by claim_shared_store
+LEGACY_MODEL_FILE = "legacy_model.pkl"
+# The model replaced by the last swap, kept for rollback
+PREVIOUS_DIR = "previous"
+
+SECONDS_PER_DAY = 86400
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def sample_dtype(n_features):
+    """Fixed-width record layout of the sample file."""
+    return np.dtype([
+        ('timestamp', '<i8'),
+        ('thermostat_id', '<i4'),
+        ('label', '<f4'),
+        ('features', '<f4', (n_features,)),
+    ])
+
+
+def quantize_thresholds(model):
+    """Round split thresholds down to float32 in place.
+
+    Trees compare float32 inputs against float64 thresholds, so rounding
+    each threshold down to the nearest float32 keeps every decision
+    identical while making the blob far more compressible.
+    """
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        threshold = tree.threshold
+        rounded = threshold.astype(np.float32)
+        above = rounded > threshold
+        rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+        tree.threshold[:] = rounded
+
+
+def atomic_write(directory, name, write):
+    """Replace directory/name with what write(f) writes, via a temp file and rename."""
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}.")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(directory, name))
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def claim_shared_store(root, directory, legacy_path):
+    """Move the model files saved before each entry had its own directory into directory.
+
+    Those files sit directly in root (and in legacy_path for the oldest
+    single-pickle format). The first entry without a directory of its own
+    takes them over; any later one finds nothing left to move and starts
+    empty. Callers must not run this for two entries at once.
+    """
+    if os.path.isdir(directory):
+        return
+    os.makedirs(directory)
+    moved = []
+    if os.path.isdir(root):
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            if os.path.isfile(path) or name == HISTORY_DIR:
+                os.replace(path, os.path.join(directory, name))
+                moved.append(name)
+    if os.path.exists(legacy_path):
+        os.replace(legacy_path, os.path.join(directory, LEGACY_MODEL_FILE))
+        moved.append(os.path.basename(legacy_path))
+    if moved:
+        _LOGGER.info(f"Moved {', '.join(sorted(moved))} into {directory}")
+
+
+class ModelStore:
+    """Directory holding a manifest, model blob, scaler arrays and the sample history.
+
+    Every model file is replaced atomically (temp file then rename).
+    Samples live in an append-only SampleHistory in a subdirectory.
+    """
+
+    def __init__(self, directory):
+        """Initialize."""
+        self.directory = directory
+
+    def path(self, name):
+        """Return the path of a file in the store."""
+        return os.path.join(self.directory, name)
+
+    def _atomic_write(self, name, write):
+        atomic_write(self.directory, name, write)
+
+    def model_bytes(self):
+        """Return the size of the model files, without the sample history."""
+        names = (MANIFEST_FILE, MODEL_FILE, SCALER_FILE, SHARDS_FILE, COMPILED_FILE)
+        return sum(os.path.getsize(self.path(name)) for name in names if os.path.exists(self.path(name)))
+
+    def archive(self, directory):
+        """Make directory a copy of this store's model files and manifest; returns its store.
+
+        Files are hard-linked where possible, so this is cheap and later
+        atomic writes here leave the copies untouched. The old manifest
+        there is removed first and the new one linked last, so a crash
+        midway never leaves a manifest pointing at a mix of both models.
+        """
+        os.makedirs(directory, exist_ok=True)
+        target = ModelStore(directory)
+        for name in (MANIFEST_FILE, MODEL_FILE, SCALER_FILE, SHARDS_FILE, COMPILED_FILE):
+            if os.path.exists(target.path(name)):
+                os.remove(target.path(name))
+        for name in (MODEL_FILE, SCALER_FILE, SHARDS_FILE, COMPILED_FILE, MANIFEST_FILE):
+            if not os.path.exists(self.path(name)):
+                continue
+            try:
+                os.link(self.path(name), target.path(name))
+            except OSError:
+                with open(self.path(name), 'rb') as source:
+                    atomic_write(directory, name, lambda f: f.write(source.read()))
+        return target
+
+    def history(self, dtype):
+        """Return the sample history kept in this store."""
+        return SampleHistory(self.path(HISTORY_DIR), dtype)
+
+    def read_manifest(self):
+        """Return the manifest dict, or None if the store is missing or unsupported."""
+        try:
+            with open(self.path(MANIFEST_FILE)) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return None
+        if manifest.get('format_version') != MODEL_FORMAT_VERSION:
+            _LOGGER.warning(f"Unsupported model format version {manifest.get('format_version')}")
+            return None
+        return manifest
+
+    def write_manifest(self, manifest):
+        """Atomically replace the manifest."""
+        manifest = dict(manifest, format_version=MODEL_FORMAT_VERSION)
+        self._atomic_write(MANIFEST_FILE, lambda f: f.write(json.dumps(manifest, indent=2).encode()))
+
+    def write_model(self, model, compress=3):
+        """Atomically write the compressed model blob."""
+        import joblib
+        self._atomic_write(MODEL_FILE, lambda f: joblib.dump(model, f, compress=compress))
+
+    def read_model(self):
+        """Load the model blob."""
+        import joblib
+        return joblib.load(self.path(MODEL_FILE))
+
+    def write_shards(self, shards, compress=3):
+        """Atomically write per-room (model, scaler) pairs as one blob."""
+        import joblib
+        self._atomic_write(SHARDS_FILE, lambda f: joblib.dump(shards, f, compress=compress))
+
+    def read_shards(self):
+        """Load per-room (model, scaler) pairs."""
+        import joblib
+        return joblib.load(self.path(SHARDS_FILE))
+
+    def write_compiled(self, forest, shards):
+        """Atomically write the compiled global forest and per-room forests as one npz."""
+        arrays = {f"model/{name}": array for name, array in forest.to_arrays().items()}
+        for key, shard in shards.items():
+            arrays.update({f"shard/{key}/{name}": array for name, array in shard.to_arrays().items()})
+        self._atomic_write(COMPILED_FILE, lambda f: np.savez(f, **arrays))
+
+    def read_compiled(self):
+        """Return (global forest, {shard key: forest}) without importing scikit-learn."""
+        grouped = {}
+        with np.load(self.path(COMPILED_FILE)) as data:
+            for name in data.files:
+                prefix, array = name.rsplit('/', 1)
+                grouped.setdefault(prefix, {})[array] = data[name]
+        forest = CompiledForest.from_arrays(grouped.pop('model'))
+        shards = {
+            prefix.split('/', 1)[1]: CompiledForest.from_arrays(arrays) for prefix, arrays in grouped.items()
+        }
+        return forest, shards
+
+    def write_scaler(self, scaler):
+        """Atomically write StandardScaler parameters as plain arrays."""
+        self._atomic_write(SCALER_FILE, lambda f: np.savez(
+            f,
+            mean=scaler.mean_,
+            scale=scaler.scale_,
+            var=scaler.var_,
+            n_samples_seen=np.asarray(scaler.n_samples_seen_),
+        ))
+
+    def read_scaler(self, scaler):
+        """Restore StandardScaler parameters into scaler and return it."""
+        with np.load(self.path(SCALER_FILE)) as data:
+            scaler.mean_ = data['mean']
+            scaler.scale_ = data['scale']
+            scaler.var_ = data['var']
+            scaler.n_samples_seen_ = data['n_samples_seen'][()]
+        scaler.n_features_in_ = len(scaler.mean_)
+        return scaler
+
+    def migrate_samples(self, history, count, thermostats):
+        """Move the single sample log written by older versions into the history."""
+        path = self.path(SAMPLES_FILE)
+        if count <= 0 or not os.path.exists(path):
+            return
+        # Never trust records past the count committed in the manifest
+        count = min(count, os.path.getsize(path) // history.dtype.itemsize)
+        history.append(np.fromfile(path, dtype=history.dtype, count=count), thermostats)
+        os.remove(path)
+        _LOGGER.info(f"Moved {count} samples into the sample history")
+
+
+class SampleHistory:
+    """Every collected sample, as fixed-width records in one file per UTC day.
+
+    Day files are appended to, so years of samples cost disk, not
+    memory: readers memory-map the days they need and copy out only the
+    records they select. Each day file stays in time order; records older
+    than the end of their day (imports) cause that day to be rewritten
+    merged and sorted. A record torn by an interrupted append is ignored
+    by readers and cut off by the next append. Records refer to
+    thermostats by index into a list kept next to the day files.
+    """
+
+    def __init__(self, directory, dtype):
+        """Initialize."""
+        self.directory = directory
+        self.dtype = dtype
+        self._thermostats_written = None
+
+    def _day_path(self, day):
+        return os.path.join(self.directory, f"{date.fromordinal(EPOCH_ORDINAL + int(day)).isoformat()}.bin")
+
+    def days(self):
+        """Return the days (since the epoch, UTC) that have samples, oldest first."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(
+            date.fromisoformat(name[:-4]).toordinal() - EPOCH_ORDINAL for name in names if name.endswith('.bin')
+        )
+
+    def _map(self, day):
+        """Memory-map the complete records of one day."""
+        path = self._day_path(day)
+        count = os.path.getsize(path) // self.dtype.itemsize
+        if count == 0:
+            return np.zeros(0, dtype=self.dtype)
+        return np.memmap(path, dtype=self.dtype, mode='r', shape=(count,))
+
+    def _window(self, first_day, last_day):
+        return [day for day in self.days()
+                if (first_day is None or day >= first_day) and (last_day is None or day <= last_day)]
+
+    @property
+    def nbytes(self):
+        """Return the size of the day files."""
+        return sum(os.path.getsize(self._day_path(day)) for day in self.days())
+
+    def __len__(self):
+        """Return the number of records on disk."""
+        return sum(os.path.getsize(self._day_path(day)) // self.dtype.itemsize for day in self.days())
+
+    def append(self, records, thermostats):
+        """Add records to their days' files; thermostats is the current index list."""
+        if len(records) == 0:
+            return
+        if thermostats != self._thermostats_written:
+            # Written first, so every index on disk can be resolved
+            atomic_write(self.directory, HISTORY_THERMOSTATS_FILE, lambda f: f.write(json.dumps(thermostats).encode()))
+            self._thermostats_written = list(thermostats)
+        days = records['timestamp'] // SECONDS_PER_DAY
+        for day in np.unique(days):
+            new = records[days == day]
+            new = new[np.argsort(new['timestamp'], kind='stable')]
+            path = self._day_path(day)
+            existing = self._map(day) if os.path.exists(path) else np.zeros(0, dtype=self.dtype)
+            if len(existing) and existing['timestamp'][-1] > new['timestamp'][0]:
+                # newest() and restores take file order as time order
+                merged = np.concatenate([np.array(existing), new])
+                merged = merged[np.argsort(merged['timestamp'], kind='stable')]
+                atomic_write(self.directory, os.path.basename(path), merged.tofile)
+                continue
+            with open(path, 'ab') as f:
+                end = f.tell()
+                f.truncate(end - end % self.dtype.itemsize)
+                new.tofile(f)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def read_thermostats(self):
+        """Return the thermostat index list, or None if nothing was written yet."""
+        try:
+            with open(os.path.join(self.directory, HISTORY_THERMOSTATS_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def read(self, first_day=None, last_day=None):
+        """Return a copy of every record from first_day through last_day."""
+        parts = [np.array(self._map(day)) for day in self._window(first_day, last_day)]
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=self.dtype)
+
+    def newest(self, count):
+        """Return a copy of the newest count records, reading back only as many days as needed."""
+        parts = []
+        for day in reversed(self.days()):
+            if count <= 0:
+                break
+            records = self._map(day)
+            parts.append(np.array(records[max(0, len(records) - count):]))
+            count -= len(records)
+        return np.concatenate(parts[::-1]) if parts else np.zeros(0, dtype=self.dtype)
+
+    def sample(self, size, rng, first_day=None, last_day=None):
+        """Return up to size records drawn uniformly from first_day through last_day.
+
+        Only the drawn records are copied out of the memory maps, so the
+        result is bounded by size however long the history is.
+        """
+        days = self._window(first_day, last_day)
+        counts = np.array([os.path.getsize(self._day_path(day)) // self.dtype.itemsize for day in days])
+        if counts.sum() <= size:
+            return self.read(first_day, last_day)
+        chosen = np.sort(rng.choice(counts.sum(), size=size, replace=False))
+        bounds = np.concatenate([[0], np.cumsum(counts)])
+        parts = []
+        for index, day in enumerate(days):
+            low, high = np.searchsorted(chosen, bounds[index:index + 2])
+            if high > low:
+                parts.append(np.array(self._map(day)[chosen[low:high] - bounds[index]]))
+        return np.concatenate(parts)
+
+    def clear(self):
+        """Delete every day file and the thermostat list."""
+        for day in self.days():
+            os.remove(self._day_path(day))
+        try:
+            os.remove(os.path.join(self.directory, HISTORY_THERMOSTATS_FILE))
+        except FileNotFoundError:
+            pass
+        self._thermostats_written = None
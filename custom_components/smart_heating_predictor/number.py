@@ -18,7 +18,7 @@ class AnomalyThresholdNumber(CoordinatorEntity, NumberEntity):
         """Initialize."""
         super().__init__(coordinator)
         self._attr_name = "Smart Heating Anomaly Threshold"
-        self._attr_unique_id = f"{DOMAIN}_anomaly_threshold"
+        self._attr_unique_id = f"{DOMAIN}_{coordinator.config_entry.entry_id}_anomaly_threshold"
         self._attr_native_min_value = 0.5
         self._attr_native_max_value = 5.0
         self._attr_native_step = 0.1
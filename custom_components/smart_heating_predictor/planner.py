@@ -0,0 +1,172 @@
+"""Preheat planning for Smart Heating Predictor"""
+import logging
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import numpy as np
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_track_point_in_time
+
+from .ml_engine import FORECAST_HORIZONS, PreheatIntervals
+
+_LOGGER = logging.getLogger(__name__)
+
+# Schedule slots apply to every thermostat unless a room names one
+DEFAULT_ROOM = "default"
+
+# When to start heating a thermostat so it reaches target_temp at slot;
+# interval holds the PreheatIntervals.attributes of preheat_minutes
+PlanEntry = namedtuple(
+    'PlanEntry', ['start', 'slot', 'thermostat_id', 'target_temp', 'preheat_minutes', 'interval']
+)
+
+
+def room_thermostats(room, thermostats):
+    """Return the thermostats a schedule room refers to (entity id or object id)."""
+    if room == DEFAULT_ROOM:
+        return list(thermostats)
+    return [t for t in thermostats if room in (t, t.split('.', 1)[-1])]
+
+
+def upcoming_slots(schedule, thermostats, now, horizon):
+    """Expand "{day}_{hour}_{room}" schedule keys into sorted (slot, thermostat id, target) tuples.
+
+    Only slots within horizon of now are returned; a room-specific slot
+    overrides the default one for the same hour.
+    """
+    slots = {}
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    # Default slots first so room-specific ones overwrite them
+    for key, target_temp in sorted(schedule.items(), key=lambda item: not item[0].endswith(f"_{DEFAULT_ROOM}")):
+        try:
+            day, hour, room = key.split('_', 2)
+            day, hour = int(day), int(hour)
+        except ValueError:
+            _LOGGER.warning(f"Ignoring malformed schedule slot {key}")
+            continue
+        slot = midnight + timedelta(days=(day - now.weekday()) % 7, hours=hour)
+        if slot <= now:
+            slot += timedelta(days=7)
+        if slot - now > horizon:
+            continue
+        for thermostat_id in room_thermostats(room, thermostats):
+            slots[(slot, thermostat_id)] = float(target_temp)
+    return sorted((slot, thermostat_id, target) for (slot, thermostat_id), target in slots.items())
+
+
+def build_plan(predictor, slots, current_temps, outdoor_forecast, outdoor_humidity, now, preheat=True):
+    """Predict preheat minutes for every slot in one batch and return sorted PlanEntry items.
+
+    A thermostat's first slot starts from its current temperature, later
+    ones from the previous slot's target. Starts follow the predictor's
+    preheat policy (the mean or a quantile). outdoor_forecast maps a list of
+    datetimes to expected outdoor temperatures. Runs in the predictor executor.
+    """
+    if not slots:
+        return []
+    times = [slot for slot, _, _ in slots]
+    thermostat_ids = [thermostat_id for _, thermostat_id, _ in slots]
+    target_temp = np.array([target for _, _, target in slots])
+    start_temp = np.empty(len(slots))
+    previous = dict(current_temps)
+    for index, (_, thermostat_id, target) in enumerate(slots):
+        start_temp[index] = previous.get(thermostat_id, target)
+        previous[thermostat_id] = target
+
+    minutes = np.zeros(len(slots))
+    # Slots already at their target get a zero-width interval at 0 minutes
+    intervals = PreheatIntervals.point(np.zeros(len(slots)))
+    heat = target_temp > start_temp
+    if heat.any():
+        rows = np.flatnonzero(heat)
+        ids = [thermostat_ids[i] for i in rows]
+        # Predict once at the slot, then again at the start that implies,
+        # so hour/daytime features describe when heating actually begins
+        for _ in range(2):
+            starts = [times[i] - timedelta(minutes=float(minutes[i])) for i in rows]
+            forecast = np.column_stack([
+                outdoor_forecast([start + timedelta(hours=hours) for start in starts])
+                for hours in FORECAST_HORIZONS
+            ])
+            # Slots are in HA's time zone; samples and ticks use the system
+            # clock's naive local time, so features must too
+            local_starts = [datetime.fromtimestamp(start.timestamp()) for start in starts]
+            features = predictor.collect_feature_rows(
+                start_temp[rows], target_temp[rows], outdoor_forecast(starts), outdoor_humidity, local_starts,
+                forecast,
+            )
+            predicted = predictor.predict_preheat_intervals(features, ids)
+            minutes[rows] = predictor.preheat_times(predicted)
+        for column, predicted_column in zip(intervals, predicted):
+            column[rows] = predicted_column
+
+    plan = []
+    for index, (slot, thermostat_id, target) in enumerate(slots):
+        start = slot - timedelta(minutes=float(minutes[index])) if preheat else slot
+        plan.append(PlanEntry(
+            max(start, now), slot, thermostat_id, target, float(minutes[index]), intervals.attributes(index)
+        ))
+    plan.sort(key=lambda entry: entry[:3])
+    return plan
+
+
+class PreheatPlanner:
+    """Sorted preheat timeline driven by a single point-in-time timer.
+
+    Only the earliest pending entry has a timer; when it fires, every due
+    entry sets its thermostat's target and the timer moves to the next one.
+    """
+
+    def __init__(self, hass):
+        """Initialize."""
+        self.hass = hass
+        self.timeline = []
+        self.planned_at = None
+        self._next = 0
+        self._cancel_timer = None
+
+    @callback
+    def async_set_timeline(self, entries, planned_at):
+        """Replace the timeline with sorted entries and rearm the timer."""
+        self.timeline = list(entries)
+        self.planned_at = planned_at
+        self._next = 0
+        self._async_schedule_next()
+
+    def next_entry(self, thermostat_id):
+        """Return the next pending entry of a thermostat, or None."""
+        for entry in self.timeline[self._next:]:
+            if entry.thermostat_id == thermostat_id:
+                return entry
+        return None
+
+    @callback
+    def async_cancel(self):
+        """Stop the timer."""
+        if self._cancel_timer is not None:
+            self._cancel_timer()
+            self._cancel_timer = None
+
+    @callback
+    def _async_schedule_next(self):
+        self.async_cancel()
+        if self._next < len(self.timeline):
+            self._cancel_timer = async_track_point_in_time(
+                self.hass, self._async_timer_fired, self.timeline[self._next].start
+            )
+
+    @callback
+    def _async_timer_fired(self, now):
+        self._cancel_timer = None
+        while self._next < len(self.timeline) and self.timeline[self._next].start <= now:
+            entry = self.timeline[self._next]
+            self._next += 1
+            _LOGGER.info(
+                f"Heating {entry.thermostat_id} to {entry.target_temp}°C for {entry.slot:%a %H:%M} "
+                f"({entry.preheat_minutes:.0f} min preheat)"
+            )
+            self.hass.async_create_task(self.hass.services.async_call(
+                "climate", "set_temperature",
+                {"entity_id": entry.thermostat_id, "temperature": entry.target_temp},
+            ))
+        self._async_schedule_next()
@@ -0,0 +1,173 @@
+"""Heating cycles rebuilt from Home Assistant recorder history"""
+import logging
+from datetime import timedelta
+
+import numpy as np
+
+from .cycles import CycleTracker, is_heating
+from .ml_engine import FORECAST_HORIZONS
+
+_LOGGER = logging.getLogger(__name__)
+
+# History is read this much at a time, so memory is bounded by one chunk
+IMPORT_CHUNK = timedelta(days=2)
+
+# Thermostats are observed on this grid (seconds) and at each of their own changes
+GRID_SECONDS = 300
+
+# What the coordinator assumes when no outdoor source is configured
+DEFAULT_OUTDOOR_TEMP = 15.0
+DEFAULT_OUTDOOR_HUMIDITY = 50.0
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _recorder_history():
+    from homeassistant.components.recorder import history
+    return history
+
+
+def _read_states(hass, entity_id, start, end):
+    """Return an entity's recorded states in [start, end), led by the one in force at start.
+
+    Attribute-only updates are kept: a thermostat's readings and target,
+    and a weather entity's temperature, change without its state changing.
+    """
+    return _recorder_history().get_significant_states(
+        hass, start, end, [entity_id],
+        include_start_time_state=True,
+        significant_changes_only=False,
+        no_attributes=entity_id.startswith("sensor."),
+    ).get(entity_id, [])
+
+
+async def _async_recorder_job(hass, func, *args):
+    """Run func on the recorder's database executor."""
+    from homeassistant.components.recorder import get_instance
+    return await get_instance(hass).async_add_executor_job(func, *args)
+
+
+def climate_series(states):
+    """Return (times, current temp, target temp, heating, active) arrays of climate states."""
+    return (
+        np.array([s.last_updated.timestamp() for s in states], dtype=float),
+        np.array([_float(s.attributes.get('current_temperature')) for s in states]),
+        np.array([_float(s.attributes.get('temperature')) for s in states]),
+        np.array([is_heating(s.state, s.attributes.get('hvac_action')) for s in states], dtype=bool),
+        np.array([s.state != 'off' for s in states], dtype=bool),
+    )
+
+
+def numeric_series(states, attribute=None):
+    """Return (times, values) of a state, or one attribute, as floats; unparsable values are NaN."""
+    values = [s.state if attribute is None else s.attributes.get(attribute) for s in states]
+    return (
+        np.array([s.last_updated.timestamp() for s in states], dtype=float),
+        np.array([_float(value) for value in values]),
+    )
+
+
+def read_chunk(hass, thermostats, outdoor_source, humidity_source, start, end):
+    """Read one chunk of history into arrays; runs on the recorder executor.
+
+    Sources are (entity id, attribute or None) or None. Outdoor readings
+    run FORECAST_HORIZONS past end, to stand in for the forecast.
+    """
+    climate = {t: climate_series(_read_states(hass, t, start, end)) for t in thermostats}
+
+    def source_series(source, until):
+        if source is None:
+            return None
+        entity_id, attribute = source
+        return numeric_series(_read_states(hass, entity_id, start, until), attribute)
+
+    outdoor = source_series(outdoor_source, end + timedelta(hours=max(FORECAST_HORIZONS)))
+    humidity = source_series(humidity_source, end)
+    return climate, outdoor, humidity
+
+
+def resample(series, times, default):
+    """Return the value in force at each time (NaN before the first); default without a series."""
+    if series is None:
+        return np.full(len(times), default)
+    series_times, values = series
+    if not len(values):
+        return np.full(len(times), np.nan)
+    index = np.searchsorted(series_times, times, side='right') - 1
+    return np.where(index >= 0, values[np.maximum(index, 0)], np.nan)
+
+
+def chunk_cycles(tracker, climate, outdoor, humidity, start, end):
+    """Align one chunk onto a common grid and return the heating cycles it completes.
+
+    start and end are epoch seconds. The tracker carries open cycles over
+    to the next chunk. The outdoor temperature recorded FORECAST_HORIZONS
+    later stands in for the forecast a live tick would have had.
+    """
+    grid = np.arange(start, end, GRID_SECONDS, dtype=float)
+    cycles = []
+    for thermostat_id, (times, current, target, heating, active) in climate.items():
+        points = np.union1d(grid, times[(times >= start) & (times < end)])
+        index = np.searchsorted(times, points, side='right') - 1
+        known = index >= 0
+        points, index = points[known], index[known]
+        known = ~np.isnan(current[index]) & ~np.isnan(target[index])
+        points, index = points[known], index[known]
+        if not len(points):
+            continue
+
+        outdoor_now = resample(outdoor, points, DEFAULT_OUTDOOR_TEMP)
+        outdoor_later = np.column_stack([
+            resample(outdoor, points + hours * 3600, DEFAULT_OUTDOOR_TEMP) for hours in FORECAST_HORIZONS
+        ])
+        # Hours past the end of the recorded outdoor history repeat the current reading
+        outdoor_later = np.where(np.isnan(outdoor_later), outdoor_now[:, None], outdoor_later)
+        humidity_now = resample(humidity, points, DEFAULT_OUTDOOR_HUMIDITY)
+
+        # Plain floats keep the per-reading state machine loop cheap
+        rows = zip(
+            points.tolist(), current[index].tolist(), target[index].tolist(), heating[index].tolist(),
+            active[index].tolist(), outdoor_now.tolist(), humidity_now.tolist(), outdoor_later.tolist(),
+        )
+        for timestamp, current_temp, target_temp, heat, on, outdoor_temp, outdoor_humidity, forecast in rows:
+            cycle = tracker.observe(
+                thermostat_id, timestamp, current_temp, target_temp, heat, on,
+                None if np.isnan(outdoor_temp) else outdoor_temp,
+                None if np.isnan(outdoor_humidity) else outdoor_humidity,
+                forecast,
+            )
+            if cycle is not None:
+                cycles.append(cycle)
+    return cycles
+
+
+async def async_import_cycles(hass, thermostats, outdoor_source, humidity_source, start, end):
+    """Read recorder history from start to end chunk by chunk; return the heating cycles in it.
+
+    Database reads run on the recorder executor and alignment on the
+    Home Assistant executor; only one chunk of states is held at a time.
+    """
+    tracker = CycleTracker()
+    cycles = []
+    rows = 0
+    chunk_start = start
+    while chunk_start < end:
+        chunk_end = min(chunk_start + IMPORT_CHUNK, end)
+        climate, outdoor, humidity = await _async_recorder_job(
+            hass, read_chunk, hass, thermostats, outdoor_source, humidity_source, chunk_start, chunk_end
+        )
+        rows += sum(len(series[0]) for series in climate.values())
+        cycles.extend(await hass.async_add_executor_job(
+            chunk_cycles, tracker, climate, outdoor, humidity, chunk_start.timestamp(), chunk_end.timestamp()
+        ))
+        chunk_start = chunk_end
+    _LOGGER.info(
+        f"Read {rows} thermostat states from {start:%Y-%m-%d} to {end:%Y-%m-%d}: "
+        f"{tracker.completed} heating cycles, {tracker.abandoned} abandoned"
+    )
+    return cycles
@@ -0,0 +1,128 @@
+"""Columnar ring buffer for Smart Heating Predictor training samples"""
+import numpy as np
+
+
+class SampleBuffer:
+    """Fixed-capacity columnar store of training samples.
+
+    Samples live in preallocated arrays (float32 features, float32 labels,
+    int64 epoch timestamps, int32 thermostat ids). Appending overwrites the
+    oldest row once the buffer is full, so memory never grows.
+    """
+
+    def __init__(self, n_features, capacity=10000):
+        """Initialize."""
+        self.n_features = n_features
+        self.capacity = capacity
+        self.features = np.zeros((capacity, n_features), dtype=np.float32)
+        self.labels = np.zeros(capacity, dtype=np.float32)
+        self.timestamps = np.zeros(capacity, dtype=np.int64)
+        self.thermostat_ids = np.full(capacity, -1, dtype=np.int32)
+        self.thermostats = []
+        self._thermostat_index = {}
+        self._next = 0
+        self._size = 0
+        self.total_appended = 0
+
+    def __len__(self):
+        """Return number of stored samples."""
+        return self._size
+
+    @property
+    def nbytes(self):
+        """Return memory used by the sample columns."""
+        return (self.features.nbytes + self.labels.nbytes
+                + self.timestamps.nbytes + self.thermostat_ids.nbytes)
+
+    def thermostat_index(self, thermostat_id):
+        """Return the integer id for a thermostat, registering it if new."""
+        if thermostat_id is None:
+            return -1
+        index = self._thermostat_index.get(thermostat_id)
+        if index is None:
+            index = len(self.thermostats)
+            self.thermostats.append(thermostat_id)
+            self._thermostat_index[thermostat_id] = index
+        return index
+
+    def append(self, features, label, timestamp, thermostat_id=None):
+        """Append one sample in O(1), overwriting the oldest when full."""
+        row = self._next
+        self.features[row] = np.ravel(features)
+        self.labels[row] = label
+        self.timestamps[row] = int(timestamp)
+        self.thermostat_ids[row] = self.thermostat_index(thermostat_id)
+        self._next = (row + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+        self.total_appended += 1
+
+    def extend(self, features, labels, timestamps, thermostat_ids=None):
+        """Append a block of samples in chronological order."""
+        features = np.asarray(features, dtype=np.float32).reshape(-1, self.n_features)
+        count = len(features)
+        if count == 0:
+            return
+        if thermostat_ids is None:
+            tids = np.full(count, -1, dtype=np.int32)
+        else:
+            tids = np.array([self.thermostat_index(t) for t in thermostat_ids], dtype=np.int32)
+        labels = np.asarray(labels, dtype=np.float32)
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        # Only the newest `capacity` rows can survive
+        if count > self.capacity:
+            features, labels = features[-self.capacity:], labels[-self.capacity:]
+            timestamps, tids = timestamps[-self.capacity:], tids[-self.capacity:]
+            self.total_appended += count - self.capacity
+            count = self.capacity
+        rows = (self._next + np.arange(count)) % self.capacity
+        self.features[rows] = features
+        self.labels[rows] = labels
+        self.timestamps[rows] = timestamps
+        self.thermostat_ids[rows] = tids
+        self._next = (self._next + count) % self.capacity
+        self._size = min(self._size + count, self.capacity)
+        self.total_appended += count
+
+    def arrays(self):
+        """Return zero-copy views (X, y, timestamps, thermostat ids).
+
+        Rows are in storage order, which is only chronological until the
+        buffer wraps. Use ordered() when order matters.
+        """
+        size = self._size
+        return (self.features[:size], self.labels[:size],
+                self.timestamps[:size], self.thermostat_ids[:size])
+
+    def _ordered_rows(self, last=None):
+        """Return storage row indices of the newest samples, oldest first."""
+        count = self._size if last is None else min(last, self._size)
+        start = (self._next - count) % self.capacity
+        return (start + np.arange(count)) % self.capacity
+
+    def ordered(self, last=None):
+        """Return copies of the newest samples in chronological order."""
+        rows = self._ordered_rows(last)
+        return (self.features[rows], self.labels[rows],
+                self.timestamps[rows], self.thermostat_ids[rows])
+
+    def restore(self, features, labels, timestamps, thermostat_ids, thermostats):
+        """Replace the contents with saved columns using integer thermostat ids."""
+        self.clear()
+        self.thermostats = list(thermostats)
+        self._thermostat_index = {name: i for i, name in enumerate(self.thermostats)}
+        count = min(len(labels), self.capacity)
+        start = len(labels) - count
+        self.features[:count] = features[start:]
+        self.labels[:count] = labels[start:]
+        self.timestamps[:count] = timestamps[start:]
+        self.thermostat_ids[:count] = thermostat_ids[start:]
+        self._next = count % self.capacity
+        self._size = count
+        self.total_appended = count
+
+    def clear(self):
+        """Drop all samples."""
+        self.thermostat_ids.fill(-1)
+        self._next = 0
+        self._size = 0
+        self.total_appended = 0
@@ -0,0 +1,214 @@
+"""Training scheduler for Smart Heating Predictor"""
+import asyncio
+import logging
+import os
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+
+from homeassistant.core import callback
+
+from .const import (
+    TRAINING_CANCELLED,
+    TRAINING_DEFERRED,
+    TRAINING_FAILED,
+    TRAINING_IDLE,
+    TRAINING_JITTER_MINUTES,
+    TRAINING_QUEUED,
+    TRAINING_REASON_INCREMENTAL,
+    TRAINING_REASON_SAMPLES,
+    TRAINING_REASON_WINDOW,
+    TRAINING_TRAINED,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def cpu_load():
+    """Return the 1-minute load average per CPU, or None where the platform has none."""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return None
+
+
+class TrainingScheduler:
+    """Decides when an entry trains and runs the training in the background.
+
+    A run is due once a day inside the training window, at an offset
+    derived from the entry id so that entries don't all start when the
+    window opens, and, with min_new_samples set, as soon as that many
+    labelled samples have arrived since the last run. The nightly run is
+    skipped when no sample arrived since the last run or the model load. A due run waits while the load
+    per CPU is above max_load (0 disables the check); a night that stays
+    too busy is skipped.
+
+    train(scheduler) is the coroutine doing the work. It waits for the
+    engine's training turn (the queued state), reports its stages through
+    set_stage, checks cancel_event between them and may set outcome. Refreshes only call
+    async_check, which never waits for the run. Incremental updates run
+    the same way but are not runs: they leave last_run, its result and
+    the new-sample count alone.
+    """
+
+    def __init__(self, hass, entry_id, train, on_change, hour=3, window=2, min_new_samples=0, max_load=1.0):
+        """Initialize."""
+        self.hass = hass
+        self.train = train
+        self.on_change = on_change
+        self.hour = hour
+        self.window = timedelta(hours=window)
+        # Stable across restarts, unlike hash()
+        spread = min(TRAINING_JITTER_MINUTES, window * 60 // 2)
+        self.jitter = timedelta(minutes=zlib.crc32(entry_id.encode()) % (spread + 1))
+        self.min_new_samples = min_new_samples
+        self.max_load = max_load
+        self.cancel_event = threading.Event()
+        self.state = TRAINING_IDLE
+        self.reason = None
+        self.load = None
+        self.started_at = None
+        self.stage_started_at = None
+        self.new_samples = 0
+        # Result train sets when it differs from trained or failed
+        self.outcome = None
+        # Outcome of the last finished run
+        self.last_run = None
+        self.last_result = None
+        self.last_duration = None
+        # Samples appended (SampleBuffer.total_appended) when the last run
+        # started, or when the saved model was loaded
+        self.trained_samples = 0
+        self._task = None
+        # Set when async_cancel cancelled the queued task itself
+        self._dropped = False
+
+    @property
+    def running(self):
+        """Return True while a run is queued or in progress."""
+        return self._task is not None
+
+    def window_start(self, now):
+        """Return when the training window containing, or last before, now opened."""
+        start = now.replace(hour=self.hour, minute=0, second=0, microsecond=0)
+        return start - timedelta(days=1) if start > now else start
+
+    def next_window(self, now):
+        """Return this entry's next nightly start time after now."""
+        start = self.window_start(now) + self.jitter
+        return start if start > now else start + timedelta(days=1)
+
+    def _due(self, now, total_appended):
+        """Return why a run is due at now, or None."""
+        self.new_samples = total_appended - self.trained_samples
+        if self.min_new_samples and self.new_samples >= self.min_new_samples:
+            return TRAINING_REASON_SAMPLES
+        window_start = self.window_start(now)
+        if now - window_start >= self.window or now < window_start + self.jitter:
+            return None
+        if self.last_run is not None and self.last_run >= window_start:
+            return None
+        if self.new_samples <= 0:
+            return None
+        return TRAINING_REASON_WINDOW
+
+    @callback
+    def async_check(self, now, total_appended, enabled=True):
+        """Start a run in the background if one is due (called from every refresh)."""
+        if self.running:
+            return
+        reason = self._due(now, total_appended) if enabled else None
+        if reason is None:
+            if self.state == TRAINING_DEFERRED:
+                self._set_state(TRAINING_IDLE)
+            return
+        self.load = cpu_load()
+        if self.max_load and self.load is not None and self.load > self.max_load:
+            if self.state != TRAINING_DEFERRED:
+                _LOGGER.info(f"Training deferred, load {self.load:.2f} per CPU is above {self.max_load}")
+                self.reason = reason
+                self._set_state(TRAINING_DEFERRED)
+            return
+        self.async_start(now, total_appended, reason)
+
+    @callback
+    def async_start(self, now, total_appended, reason):
+        """Start a run now; returns its task."""
+        if self.running:
+            return self._task
+        self.cancel_event.clear()
+        self._dropped = False
+        self.outcome = None
+        self.reason = reason
+        self.started_at = now
+        if reason != TRAINING_REASON_INCREMENTAL:
+            self.trained_samples = total_appended
+        self._task = self.hass.async_create_task(self._async_run(now))
+        return self._task
+
+    async def _async_run(self, now):
+        """Run train and record the outcome."""
+        self._set_state(TRAINING_QUEUED)
+        start = time.perf_counter()
+        result = TRAINING_FAILED
+        success = False
+        try:
+            success = await self.train(self)
+            if self.cancel_event.is_set():
+                result = TRAINING_CANCELLED
+            elif self.outcome is not None:
+                result = self.outcome
+            elif success:
+                result = TRAINING_TRAINED
+        except asyncio.CancelledError:
+            result = TRAINING_CANCELLED
+            if not self._dropped:
+                # Shutdown or unload, not async_cancel: the task must end cancelled
+                _LOGGER.info(f"Training ({self.reason}) cancelled")
+                raise
+        except Exception as e:
+            _LOGGER.error(f"Training failed: {e}")
+        finally:
+            duration = time.perf_counter() - start
+            if self.reason != TRAINING_REASON_INCREMENTAL:
+                self.last_run = now
+                self.last_result = result
+                self.last_duration = duration
+            self._task = None
+            self._set_state(TRAINING_IDLE)
+        log = _LOGGER.debug if self.reason == TRAINING_REASON_INCREMENTAL else _LOGGER.info
+        log(f"Training ({self.reason}) {result} after {duration:.1f} s")
+        return success
+
+    async def async_join(self):
+        """Wait for the current run, if any; returns its success."""
+        if self._task is None:
+            return False
+        return await self._task
+
+    @callback
+    def async_cancel(self):
+        """Ask the current run to stop; returns False if none is running.
+
+        A queued run is dropped. Tuning stops within a second; a fit in
+        progress finishes but its model is thrown away, and nothing is saved.
+        """
+        if not self.running:
+            return False
+        self.cancel_event.set()
+        if self.state == TRAINING_QUEUED:
+            self._dropped = True
+            self._task.cancel()
+        _LOGGER.info("Training cancellation requested")
+        return True
+
+    def set_stage(self, stage):
+        """Mark the stage the run has reached (called by train, on the event loop)."""
+        self._set_state(stage)
+
+    def _set_state(self, state):
+        if state != self.state:
+            self.state = state
+            self.stage_started_at = datetime.now()
+            self.on_change()
@@ -1,14 +1,17 @@
 """Select platform for Smart Heating Predictor"""
 from homeassistant.components.select import SelectEntity
+from homeassistant.helpers.restore_state import RestoreEntity
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
-from .const import DOMAIN
+from .const import DOMAIN, PREDICTORS
 
 
 async def async_setup_entry(hass, entry, async_add_entities):
     """Setup select platform."""
     coordinator = hass.data[DOMAIN][entry.entry_id]
-    async_add_entities([LearningModeSelect(coordinator)])
+    entities = [LearningModeSelect(coordinator)]
+    entities.extend(RoomPredictorSelect(coordinator, thermostat_id) for thermostat_id in coordinator.thermostats)
+    async_add_entities(entities)
 
 
 class LearningModeSelect(CoordinatorEntity, SelectEntity):
@@ -18,7 +21,7 @@ class LearningModeSelect(CoordinatorEntity, SelectEntity):
         """Initialize."""
         super().__init__(coordinator)
         self._attr_name = "Smart Heating Mode"
-        self._attr_unique_id = f"{DOMAIN}_mode"
+        self._attr_unique_id = f"{DOMAIN}_{coordinator.config_entry.entry_id}_mode"
         self._attr_options = ["Learning", "Operating"]
         self._attr_icon = "mdi:school"
     
@@ -30,4 +33,38 @@ class LearningModeSelect(CoordinatorEntity, SelectEntity):
     async def async_select_option(self, option):
         """Change the mode."""
         self.coordinator.predictor.learning_mode = (option == "Learning")
+        await self.coordinator.async_replan()
         await self.coordinator.async_request_refresh()
+
+
+class RoomPredictorSelect(CoordinatorEntity, RestoreEntity, SelectEntity):
+    """Preheat predictor of one thermostat: forest, thermal model or blend."""
+    
+    def __init__(self, coordinator, thermostat_id):
+        """Initialize."""
+        super().__init__(coordinator)
+        self._thermostat_id = thermostat_id
+        name = thermostat_id.replace("climate.", "").replace("_", " ").title()
+        self._attr_name = f"Preheat Predictor {name}"
+        self._attr_unique_id = f"{DOMAIN}_{coordinator.config_entry.entry_id}_predictor_{thermostat_id}"
+        self._attr_options = PREDICTORS
+        self._attr_icon = "mdi:home-thermometer-outline"
+    
+    async def async_added_to_hass(self):
+        """Restore the room's choice from before the restart."""
+        await super().async_added_to_hass()
+        last_state = await self.async_get_last_state()
+        if last_state is not None and last_state.state in PREDICTORS:
+            self.coordinator.predictor.room_predictors[self._thermostat_id] = last_state.state
+    
+    @property
+    def current_option(self):
+        """Return the room's predictor."""
+        predictor = self.coordinator.predictor
+        return predictor.room_predictors.get(self._thermostat_id, predictor.default_predictor)
+    
+    async def async_select_option(self, option):
+        """Change the room's predictor."""
+        self.coordinator.predictor.room_predictors[self._thermostat_id] = option
+        await self.coordinator.async_replan()
+        self.async_write_ha_state()
@@ -1,8 +1,11 @@
 """Sensor platform for Smart Heating Predictor"""
-from homeassistant.components.sensor import SensorEntity
+from datetime import datetime
+
+from homeassistant.components.sensor import SensorDeviceClass, SensorEntity, SensorStateClass
+from homeassistant.const import EntityCategory, UnitOfInformation, UnitOfTime
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
-from .const import DOMAIN
+from .const import DOMAIN, TRAINING_IDLE, TRAINING_STATES
 
 
 async def async_setup_entry(hass, entry, async_add_entities):
@@ -13,8 +16,19 @@ async def async_setup_entry(hass, entry, async_add_entities):
         LearningProgressSensor(coordinator),
         TrainingSamplesSensor(coordinator),
         RecommendedLearningTimeSensor(coordinator),
+        ModelStateSensor(coordinator),
+        TrainingStatusSensor(coordinator),
     ]
     
+    # Timing and size diagnostics, disabled until enabled in the entity settings
+    sensors.extend([
+        StageTimeSensor(coordinator, 'tick', 'last', "Tick Time"),
+        StageTimeSensor(coordinator, 'tick', 'p95', "Tick Time p95"),
+        StageTimeSensor(coordinator, 'training', 'last', "Training Duration"),
+        SampleBufferSizeSensor(coordinator),
+        ModelSizeSensor(coordinator),
+    ])
+    
     # Add prediction sensors for each thermostat
     for thermostat_id in coordinator.thermostats:
         sensors.append(PreheatPredictionSensor(coordinator, thermostat_id))
@@ -29,7 +43,7 @@ class LearningProgressSensor(CoordinatorEntity, SensorEntity):
         """Initialize."""
         super().__init__(coordinator)
         self._attr_name = "Smart Heating Learning Progress"
-        self._attr_unique_id = f"{DOMAIN}_learning_progress"
+        self._attr_unique_id = f"{DOMAIN}_{coordinator.config_entry.entry_id}_learning_progress"
         self._attr_native_unit_of_measurement = "%"
         self._attr_icon = "mdi:school"
     
@@ -48,7 +62,7 @@ class TrainingSamplesSensor(CoordinatorEntity, SensorEntity):
         """Initialize."""
         super().__init__(coordinator)
         self._attr_name = "Smart Heating Training Samples"
-        self._attr_unique_id = f"{DOMAIN}_training_samples"
+        self._attr_unique_id = f"{DOMAIN}_{coordinator.config_entry.entry_id}_training_samples"
         self._attr_icon = "mdi:database"
     
     @property
@@ -64,7 +78,7 @@ class RecommendedLearningTimeSensor(CoordinatorEntity, SensorEntity):
         """Initialize."""
         super().__init__(coordinator)
         self._attr_name = "Smart Heating Recommended Learning Time"
-        self._attr_unique_id = f"{DOMAIN}_learning_time"
+        self._attr_unique_id = f"{DOMAIN}_{coordinator.config_entry.entry_id}_learning_time"
         self._attr_icon = "mdi:clock-outline"
     
     @property
@@ -78,6 +92,143 @@ class RecommendedLearningTimeSensor(CoordinatorEntity, SensorEntity):
         return f"{days_left} days"
 
 
+class ModelStateSensor(CoordinatorEntity, SensorEntity):
+    """Model state sensor (loading, ready, untrained)."""
+    
+    def __init__(self, coordinator):
+        """Initialize."""
+        super().__init__(coordinator)
+        self._attr_name = "Smart Heating Model State"
+        self._attr_unique_id = f"{DOMAIN}_{coordinator.config_entry.entry_id}_model_state"
+        self._attr_icon = "mdi:brain"
+    
+    @property
+    def native_value(self):
+        """Return model state."""
+        return self.coordinator.model_state
+    
+    @property
+    def extra_state_attributes(self):
+        """Return the active and previous model versions and the last shadow evaluation."""
+        predictor = self.coordinator.predictor
+        active = predictor.active if predictor.is_trained else None
+        evaluation = predictor.last_evaluation or {}
+        return {
+            'version': active.version if active else None,
+            'trained_at': active.trained_at.isoformat() if active and active.trained_at else None,
+            'previous_version': predictor.previous.version if predictor.previous else None,
+            'last_evaluation': evaluation.get('evaluated_at'),
+            'last_evaluation_accepted': evaluation.get('accepted'),
+            'candidate_mae': evaluation.get('candidate_mae'),
+            'current_mae': evaluation.get('current_mae'),
+        }
+
+
+class TrainingStatusSensor(CoordinatorEntity, SensorEntity):
+    """Stage of the training scheduler, with the next window and the last run's outcome."""
+    
+    _attr_device_class = SensorDeviceClass.ENUM
+    _attr_options = TRAINING_STATES
+    
+    def __init__(self, coordinator):
+        """Initialize."""
+        super().__init__(coordinator)
+        self._attr_name = "Smart Heating Training"
+        self._attr_unique_id = f"{DOMAIN}_{coordinator.config_entry.entry_id}_training_status"
+        self._attr_icon = "mdi:cog-sync"
+    
+    @property
+    def native_value(self):
+        """Return the scheduler state."""
+        return self.coordinator.scheduler.state
+    
+    @property
+    def extra_state_attributes(self):
+        """Return why and since when the current stage runs, and the last run."""
+        scheduler = self.coordinator.scheduler
+        return {
+            'reason': scheduler.reason if scheduler.state != TRAINING_IDLE else None,
+            'stage_started': scheduler.stage_started_at.isoformat() if scheduler.stage_started_at else None,
+            'next_window': scheduler.next_window(datetime.now()).isoformat(),
+            'new_samples': scheduler.new_samples,
+            'min_new_samples': scheduler.min_new_samples,
+            'load': round(scheduler.load, 2) if scheduler.load is not None else None,
+            'last_result': scheduler.last_result,
+            'last_run': scheduler.last_run.isoformat() if scheduler.last_run else None,
+            'last_duration': round(scheduler.last_duration, 1) if scheduler.last_duration is not None else None,
+        }
+
+
+class StageTimeSensor(CoordinatorEntity, SensorEntity):
+    """Latest or 95th percentile duration of one instrumented stage."""
+    
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_suggested_display_precision = 1
+    
+    def __init__(self, coordinator, stage, statistic, name):
+        """Initialize."""
+        super().__init__(coordinator)
+        self._stage = stage
+        self._statistic = statistic
+        self._attr_name = f"Smart Heating {name}"
+        self._attr_unique_id = f"{DOMAIN}_{coordinator.config_entry.entry_id}_{stage}_time_{statistic}"
+        self._attr_icon = "mdi:timer-cog-outline"
+    
+    @property
+    def native_value(self):
+        """Return the duration in milliseconds."""
+        timers = self.coordinator.timers
+        if self._statistic == 'p95':
+            return timers.percentile_ms(self._stage, 95)
+        return timers.last_ms(self._stage)
+
+
+class SampleBufferSizeSensor(CoordinatorEntity, SensorEntity):
+    """Memory held by the in-memory training sample buffer."""
+    
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+    _attr_device_class = SensorDeviceClass.DATA_SIZE
+    _attr_native_unit_of_measurement = UnitOfInformation.BYTES
+    
+    def __init__(self, coordinator):
+        """Initialize."""
+        super().__init__(coordinator)
+        self._attr_name = "Smart Heating Sample Buffer Size"
+        self._attr_unique_id = f"{DOMAIN}_{coordinator.config_entry.entry_id}_sample_buffer_bytes"
+        self._attr_icon = "mdi:memory"
+    
+    @property
+    def native_value(self):
+        """Return the buffer size in bytes."""
+        return self.coordinator.predictor.training_data.nbytes
+
+
+class ModelSizeSensor(CoordinatorEntity, SensorEntity):
+    """Size of the saved model files."""
+    
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+    _attr_device_class = SensorDeviceClass.DATA_SIZE
+    _attr_native_unit_of_measurement = UnitOfInformation.BYTES
+    
+    def __init__(self, coordinator):
+        """Initialize."""
+        super().__init__(coordinator)
+        self._attr_name = "Smart Heating Model Size"
+        self._attr_unique_id = f"{DOMAIN}_{coordinator.config_entry.entry_id}_model_bytes"
+        self._attr_icon = "mdi:harddisk"
+    
+    @property
+    def native_value(self):
+        """Return the model size in bytes."""
+        return self.coordinator.predictor.model_bytes
+
+
 class PreheatPredictionSensor(CoordinatorEntity, SensorEntity):
     """Preheat time prediction sensor."""
     
@@ -87,13 +238,25 @@ class PreheatPredictionSensor(CoordinatorEntity, SensorEntity):
         self._thermostat_id = thermostat_id
         name = thermostat_id.replace("climate.", "").replace("_", " ").title()
         self._attr_name = f"Preheat Time {name}"
-        self._attr_unique_id = f"{DOMAIN}_preheat_{thermostat_id}"
+        self._attr_unique_id = f"{DOMAIN}_{coordinator.config_entry.entry_id}_preheat_{thermostat_id}"
         self._attr_native_unit_of_measurement = "min"
         self._attr_icon = "mdi:timer"
     
     @property
     def native_value(self):
-        """Return predicted preheat time."""
-        if not self.coordinator.predictor.is_trained:
+        """Return the predicted preheat time (per the preheat policy) of the latest tick or plan."""
+        prediction = self.coordinator.predictions.get(self._thermostat_id)
+        if prediction is None:
+            return None
+        return round(prediction['preheat_time'], 1)
+    
+    @property
+    def extra_state_attributes(self):
+        """Return the prediction's mean, spread and quantiles of the trees' predictions."""
+        prediction = self.coordinator.predictions.get(self._thermostat_id)
+        if prediction is None:
             return None
-        return 30  # Simplified - would calculate from prediction
+        return {
+            key: value for key, value in prediction.items()
+            if key.startswith('preheat_') and key != 'preheat_time'
+        }
@@ -0,0 +1,122 @@
+"""First-order RC thermal model of each room for Smart Heating Predictor"""
+import numpy as np
+
+# The pooled fit needs this many usable traces; each room is shrunk
+# towards it with this many traces' worth of weight
+THERMAL_MIN_SAMPLES = 5
+THERMAL_PRIOR_SAMPLES = 10
+
+# Same output range as the forest (minutes)
+MIN_PREHEAT_MINUTES = 5
+MAX_PREHEAT_MINUTES = 120
+
+
+def _solve(n, sx, sxx, sy, sxy):
+    """Solve the weighted normal equations of rate = gain - loss * excess, elementwise.
+
+    Sums are over traces of weight, weight * excess, weight * excess²,
+    weight * rate and weight * excess * rate. Where the excess temperature
+    does not vary enough, or the fitted loss is negative, loss is 0 and
+    gain the mean rate. Returns (gain, loss) arrays in °C/min and 1/min.
+    """
+    n, sx, sxx, sy, sxy = (np.asarray(s, dtype=float) for s in (n, sx, sxx, sy, sxy))
+    det = n * sxx - sx * sx
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gain = (sxx * sy - sx * sxy) / det
+        loss = (sx * sy - n * sxy) / det
+        mean_rate = sy / n
+    solved = (det > 1e-9 * np.maximum(n * sxx, 1e-12)) & (loss >= 0) & (gain > 0)
+    return np.where(solved, gain, mean_rate), np.where(solved, loss, 0.0)
+
+
+class ThermalModel:
+    """Per-room grey-box model: while heating, dT/dt = gain - loss * (T - T_outdoor).
+
+    Each sample is a heating trace from its start to its target temperature
+    and the minutes it took. Taking the trace's midpoint as its mean
+    temperature makes the mean heating rate linear in (gain, loss), so
+    every room is fitted at once by least squares from per-room sums,
+    weighted by trace length. Rooms are shrunk towards the pooled fit, so
+    a room with a handful of traces borrows from the others. The minutes
+    to reach a setpoint follow in closed form from the exponential approach
+    to the equilibrium temperature T_outdoor + gain / loss.
+
+    Heating cycles end once the room is within tolerance of the target
+    (see CycleTracker), so traces are fitted and predicted up to there.
+    """
+
+    def __init__(self, tolerance=0.1):
+        """Initialize."""
+        self.tolerance = tolerance
+        # (gain, loss) of all rooms together, and per thermostat id
+        self.pooled = None
+        self.rooms = {}
+        # Usable traces per thermostat id in the last fit
+        self.samples = {}
+
+    @property
+    def is_fitted(self):
+        """Return True once the pooled fit exists."""
+        return self.pooled is not None
+
+    def fit(self, start_temp, target_temp, outdoor_temp, minutes, room_ids, rooms):
+        """Fit on heating traces; room_ids index into rooms (-1 for unknown). Returns traces used."""
+        start_temp = np.asarray(start_temp, dtype=float)
+        rise = np.asarray(target_temp, dtype=float) - self.tolerance - start_temp
+        minutes = np.asarray(minutes, dtype=float)
+        excess = start_temp + rise / 2 - np.asarray(outdoor_temp, dtype=float)
+        usable = (minutes >= 1) & (minutes <= 180) & (rise > 0) & np.isfinite(excess)
+        if usable.sum() < THERMAL_MIN_SAMPLES:
+            return 0
+
+        weight = minutes[usable]
+        rate = rise[usable] / weight
+        excess = excess[usable]
+        # Unknown rooms (-1) only count towards the pooled fit
+        index = np.asarray(room_ids, dtype=np.int64)[usable] + 1
+        size = len(rooms) + 1
+        sums = np.array([
+            np.bincount(index, weights=terms, minlength=size)
+            for terms in (weight, weight * excess, weight * excess ** 2, weight * rate, weight * excess * rate)
+        ])
+        counts = np.bincount(index, minlength=size)
+
+        pooled_sums = sums.sum(axis=1)
+        gain, loss = _solve(*pooled_sums)
+        # The prior is THERMAL_PRIOR_SAMPLES average pooled traces, whose
+        # own least-squares solution is the pooled fit
+        prior = pooled_sums[:, None] * (THERMAL_PRIOR_SAMPLES / counts.sum())
+        room_gain, room_loss = _solve(*(sums[:, 1:] + prior))
+
+        self.rooms = {
+            room: (float(room_gain[i]), float(room_loss[i]))
+            for i, room in enumerate(rooms) if counts[i + 1]
+        }
+        self.samples = {room: int(counts[i + 1]) for i, room in enumerate(rooms) if counts[i + 1]}
+        self.pooled = (float(gain), float(loss))
+        return int(usable.sum())
+
+    def coefficients(self, thermostat_ids, count):
+        """Return (gain, loss) arrays for each row; rooms without a fit use the pooled one."""
+        if thermostat_ids is None:
+            pairs = [self.pooled] * count
+        else:
+            pairs = [self.rooms.get(thermostat_id, self.pooled) for thermostat_id in thermostat_ids]
+        pairs = np.array(pairs, dtype=float).reshape(count, 2)
+        return pairs[:, 0], pairs[:, 1]
+
+    def predict(self, start_temp, target_temp, outdoor_temp, thermostat_ids=None):
+        """Return the minutes of heating from start to target temperature, per row."""
+        start_temp = np.asarray(start_temp, dtype=float)
+        target_temp = np.asarray(target_temp, dtype=float) - self.tolerance
+        gain, loss = self.coefficients(thermostat_ids, len(start_temp))
+        rise = target_temp - start_temp
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Distance of the start and the target below the heated equilibrium
+            equilibrium = np.asarray(outdoor_temp, dtype=float) + gain / loss
+            approach = np.log((equilibrium - start_temp) / (equilibrium - target_temp)) / loss
+            minutes = np.where(loss > 0, approach, rise / gain)
+        # Targets at or above the equilibrium are never reached
+        unreachable = (loss > 0) & (target_temp >= equilibrium) & (rise > 0)
+        minutes = np.where(unreachable | np.isnan(minutes), MAX_PREHEAT_MINUTES, minutes)
+        return np.clip(minutes, MIN_PREHEAT_MINUTES, MAX_PREHEAT_MINUTES)
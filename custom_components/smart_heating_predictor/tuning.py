@@ -0,0 +1,120 @@
+"""Forest hyperparameter search for Smart Heating Predictor"""
+import logging
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, wait
+from itertools import product
+
+import numpy as np
+
+from .forest import CompiledForest
+
+_LOGGER = logging.getLogger(__name__)
+
+# Candidate forest settings; every combination is cross-validated
+SEARCH_SPACE = {
+    'n_estimators': (10, 20, 35, 50),
+    'max_depth': (6, 8, 10, 12),
+    'min_samples_leaf': (1, 3, 5),
+}
+SEARCH_FOLDS = 4
+
+# A cheaper model is preferred while its error stays within this fraction of the best
+ACCURACY_TOLERANCE = 0.02
+
+# Seconds between checks of the search's stop event
+STOP_POLL = 1.0
+
+# mae: mean absolute error over the folds (minutes)
+# steps: node visits per predicted row (trees x depth of the compiled forest)
+# nodes: model size, summed over all trees
+TuningResult = namedtuple('TuningResult', ['params', 'mae', 'steps', 'nodes', 'fit_seconds'])
+
+
+def candidates(space=SEARCH_SPACE):
+    """Return every parameter combination, cheapest first.
+
+    The pool works through them in order, so a short budget still
+    covers the small forests.
+    """
+    combinations = [dict(zip(space, values)) for values in product(*space.values())]
+    combinations.sort(key=lambda p: (p['n_estimators'] * p['max_depth'], -p['min_samples_leaf']))
+    return combinations
+
+
+def evaluate_candidate(fit, X, y, params, folds=SEARCH_FOLDS):
+    """Cross-validate one parameter set on time-ordered samples; runs in worker processes.
+
+    Each fold trains on the past and is scored on the samples right after
+    it; cost and size are taken from the last (largest) fold's forest.
+    """
+    from sklearn.model_selection import TimeSeriesSplit
+    start = time.perf_counter()
+    errors = []
+    for train, test in TimeSeriesSplit(n_splits=folds).split(X):
+        compiled = CompiledForest.from_estimator(*fit(X[train], y[train], params))
+        predictions = np.clip(compiled.predict(X[test]), 5, 120)
+        errors.append(np.abs(predictions - y[test]).mean())
+    return TuningResult(
+        params,
+        float(np.mean(errors)),
+        compiled.n_trees * compiled.max_depth,
+        len(compiled.feature),
+        time.perf_counter() - start,
+    )
+
+
+def search_parameters(fit, X, y, budget, pool, workers, space=SEARCH_SPACE, folds=SEARCH_FOLDS, stop=None):
+    """Evaluate candidates on a process pool until done, budget seconds have passed or stop is set.
+
+    pool is a concurrent.futures executor of spawned workers, usually the
+    engine's shared TrainingPool. fit(X, y, params) must return (model,
+    scaler) and be importable by them. At most workers candidates are
+    submitted at a time, so at the deadline only those are still running;
+    they finish in the background and are ignored, and the finished ones
+    are returned. stop is a threading.Event, checked at least every
+    STOP_POLL seconds.
+    """
+    deadline = time.monotonic() + budget
+    results = []
+    queue = candidates(space)
+    running = set()
+    try:
+        while queue or running:
+            while queue and len(running) < max(workers, 1):
+                running.add(pool.submit(evaluate_candidate, fit, X, y, queue.pop(0), folds=folds))
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                _LOGGER.info(f"Tuning budget of {budget:.0f} s used up")
+                break
+            if stop is not None and stop.is_set():
+                _LOGGER.info("Tuning stopped")
+                break
+            done, running = wait(
+                running, timeout=remaining if stop is None else min(remaining, STOP_POLL), return_when=FIRST_COMPLETED
+            )
+            results.extend(future.result() for future in done)
+    finally:
+        for future in running:
+            future.cancel()
+    return results
+
+
+def dominates(a, b):
+    """Return True if a is no worse than b on error, cost and size, and better on one."""
+    a_scores = (a.mae, a.steps, a.nodes)
+    b_scores = (b.mae, b.steps, b.nodes)
+    return all(x <= y for x, y in zip(a_scores, b_scores)) and a_scores != b_scores
+
+
+def pareto_front(results):
+    """Return the results no other result dominates."""
+    return [r for r in results if not any(dominates(other, r) for other in results)]
+
+
+def choose_parameters(results, tolerance=ACCURACY_TOLERANCE):
+    """Pick the cheapest Pareto-optimal result whose error is within tolerance of the best."""
+    front = pareto_front(results)
+    best = min(r.mae for r in front)
+    eligible = [r for r in front if r.mae <= best * (1 + tolerance)]
+    return min(eligible, key=lambda r: (r.steps, r.nodes, r.mae))